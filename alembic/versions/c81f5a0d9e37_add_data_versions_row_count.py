@@ -0,0 +1,28 @@
+"""add data versions row count
+
+Revision ID: c81f5a0d9e37
+Revises: 9b3e7d2c41a5
+Create Date: 2026-10-19 14:40:08.912774
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c81f5a0d9e37'
+down_revision: Union[str, None] = '9b3e7d2c41a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('data_versions', sa.Column('row_count', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('data_versions', 'row_count')
@@ -0,0 +1,58 @@
+"""add extraction checkpoints and staging
+
+Revision ID: d4a7e91c3b20
+Revises: c81f5a0d9e37
+Create Date: 2026-10-19 18:05:31.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a7e91c3b20'
+down_revision: Union[str, None] = 'c81f5a0d9e37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('extraction_checkpoints',
+    sa.Column('job_id', sa.String(length=64), nullable=False),
+    sa.Column('source', sa.String(length=1024), nullable=False),
+    sa.Column('header', sa.Text(), nullable=True),
+    sa.Column('offset', sa.BigInteger(), nullable=False),
+    sa.Column('chunks', sa.BigInteger(), nullable=False),
+    sa.Column('records', sa.BigInteger(), nullable=False),
+    sa.Column('failed_ranges', sa.Text(), nullable=True),
+    sa.Column('status', sa.String(length=32), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('job_id')
+    )
+    op.create_table('extraction_staging',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('job_id', sa.String(length=64), nullable=False),
+    sa.Column('chunk_offset', sa.BigInteger(), nullable=False),
+    sa.Column('sales_revenue', sa.Float(), nullable=True),
+    sa.Column('sales_units', sa.Float(), nullable=True),
+    sa.Column('sales_date', sa.String(length=64), nullable=True),
+    sa.Column('sales_region', sa.String(length=255), nullable=True),
+    sa.Column('product_segment', sa.String(length=255), nullable=True),
+    sa.Column('inventory_level', sa.Float(), nullable=True),
+    sa.Column('source_country', sa.String(length=255), nullable=True),
+    sa.Column('source_origin', sa.String(length=1024), nullable=True),
+    sa.Column('source_table', sa.String(length=255), nullable=True),
+    sa.Column('extra', sa.Text(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_extraction_staging_job_id'), 'extraction_staging', ['job_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_extraction_staging_job_id'), table_name='extraction_staging')
+    op.drop_table('extraction_staging')
+    op.drop_table('extraction_checkpoints')
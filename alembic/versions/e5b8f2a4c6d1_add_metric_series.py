@@ -0,0 +1,45 @@
+"""add metric dictionary and series
+
+Revision ID: e5b8f2a4c6d1
+Revises: d4a7e91c3b20
+Create Date: 2026-10-19 19:12:08.517734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b8f2a4c6d1'
+down_revision: Union[str, None] = 'd4a7e91c3b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('metric_dictionary',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('kind', sa.String(length=16), nullable=False),
+    sa.Column('value', sa.String(length=1024), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('kind', 'value')
+    )
+    op.create_table('metric_series',
+    sa.Column('dataset', sa.String(length=255), nullable=False),
+    sa.Column('metric_id', sa.Integer(), nullable=False),
+    sa.Column('brand_id', sa.Integer(), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('country_id', sa.Integer(), nullable=False),
+    sa.Column('value', sa.Float(), nullable=True),
+    sa.Column('source_id', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('dataset', 'metric_id', 'brand_id', 'year', 'country_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('metric_series')
+    op.drop_table('metric_dictionary')
@@ -0,0 +1,30 @@
+"""add dashboard tab snapshot version
+
+Revision ID: f7c3d9a1b2e4
+Revises: e5b8f2a4c6d1
+Create Date: 2026-10-19 20:03:44.129806
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7c3d9a1b2e4'
+down_revision: Union[str, None] = 'e5b8f2a4c6d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('dashboard_tabs', sa.Column('data_version', sa.String(length=255), nullable=True))
+    op.create_index('ix_dashboard_tabs_dashboard_id_tab_name', 'dashboard_tabs', ['dashboard_id', 'tab_name'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_dashboard_tabs_dashboard_id_tab_name', table_name='dashboard_tabs')
+    op.drop_column('dashboard_tabs', 'data_version')
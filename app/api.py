@@ -1,14 +1,35 @@
 
 from fastapi import FastAPI
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 from .database import  engine , Base # Assuming get_db is sync
 from app.routers.upload_data import router as upload_data_router
 from app.routers.shared_dashboard import router as shared_dashboard_router
-Base.metadata.create_all(bind=engine)  # Use only for development/testing if not using Alembic
 from app.routers.fmcgrouters import router as fmcg_router
+from app.utils.aggregation import shutdown_executor
 
 app = FastAPI()
 
 
+@app.on_event("startup")
+def create_tables():
+    # Use only for development/testing if not using Alembic
+    Base.metadata.create_all(bind=engine)
+
+
+@app.on_event("shutdown")
+def shutdown_aggregation_pool():
+    shutdown_executor()
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """
+    Prometheus scrape endpoint (dashboard/upload phase histograms, DB pool stats).
+    """
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 app.include_router(shared_dashboard_router, tags=["Shared Dashboard"])
 app.include_router(upload_data_router, prefix="/upload-data", tags=["Upload Data"])
\ No newline at end of file
@@ -1,12 +1,74 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 from urllib.parse import quote_plus
 
 class Settings(BaseSettings):
-    DB_SERVER: str
-    DB_PORT: int
-    DB_NAME: str
-    DB_USER: str
-    DB_PASSWORD: str
+    # Full SQLAlchemy URL, e.g. sqlite:///dev.db or duckdb:///dev.duckdb (needs
+    # duckdb-engine); when unset the SQL Server settings below are used
+    DATABASE_URL: Optional[str] = None
+    DB_SERVER: Optional[str] = None
+    DB_PORT: int = 1433
+    DB_NAME: Optional[str] = None
+    DB_USER: Optional[str] = None
+    DB_PASSWORD: Optional[str] = None
+    # Case-insensitive collation for filters on SQL Server, if the columns'
+    # own collation is case-sensitive (e.g. SQL_Latin1_General_CP1_CI_AS)
+    DB_CI_COLLATION: Optional[str] = None
+    # Rows fetched per round trip when aggregation queries are streamed
+    DB_FETCH_SIZE: int = 1000
+    # Processes used to aggregate large scans (0 = in-process, -1 = one per core)
+    AGGREGATION_WORKERS: int = 0
+    # Rows aggregated in-process before the rest of a scan is sharded
+    AGGREGATION_PARALLEL_MIN_ROWS: int = 100000
+    # Dashboard computations allowed to run at once (keep below the DB pool size)
+    ADMISSION_MAX_RUNNING: int = 8
+    # Of those, heavy ones (estimated rows scanned >= ADMISSION_HEAVY_ROWS)
+    ADMISSION_MAX_HEAVY: int = 2
+    ADMISSION_HEAVY_ROWS: int = 100000
+    # Computations waiting for a slot before new ones are refused with 429
+    ADMISSION_MAX_QUEUED: int = 32
+    # Default latency budget of a dashboard request in ms (0 = no deadline)
+    DASHBOARD_BUDGET_MS: int = 0
+    # Fraction of dashboard requests profiled per chart for /debug/chart-profiles
+    CHART_PROFILE_SAMPLE_RATE: float = 0.0
+    # Connection pool: persistent connections, extra ones allowed under bursts,
+    # seconds to wait for a free connection, liveness check on checkout and
+    # max connection age in seconds (recycled before server-side idle timeouts)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800
+    # LLM extraction (app/extractdata.py): concurrent requests, API rate limits
+    # (0 = unlimited) and retries of transient failures
+    EXTRACTION_MAX_IN_FLIGHT: int = 8
+    EXTRACTION_REQUESTS_PER_MINUTE: int = 0
+    EXTRACTION_TOKENS_PER_MINUTE: int = 0
+    EXTRACTION_MAX_RETRIES: int = 5
+    # Estimated tokens per extraction chunk (fixed, so re-runs cut the same
+    # chunks), and the request latency (seconds) the number of concurrent
+    # requests is adapted towards
+    EXTRACTION_CHUNK_TOKENS: int = 1500
+    EXTRACTION_TARGET_LATENCY_S: float = 20.0
+    # On-disk cache of extraction results ("" disables it) and its size cap
+    EXTRACTION_CACHE_DIR: str = "extraction_cache"
+    EXTRACTION_CACHE_MAX_MB: int = 512
+    # Extracted records are written to the staging table (and the job's
+    # checkpoint advanced) every this many records
+    EXTRACTION_FLUSH_ROWS: int = 500
+    # USD per million prompt / completion tokens, for the cost of extraction jobs
+    EXTRACTION_PROMPT_COST_PER_MTOK: float = 0.27
+    EXTRACTION_COMPLETION_COST_PER_MTOK: float = 1.10
+    # Log every SQL statement (very noisy; the slow-query log is the usual tool)
+    DB_ECHO: bool = False
+    # Statements slower than this (execute + fetch) go to the slow-query log
+    SLOW_QUERY_MS: int = 500
+    # Slow queries kept in memory for /debug/slow-queries
+    SLOW_QUERY_LOG_SIZE: int = 200
+    # Serve the /debug/* endpoints (profiles, pool state, slow queries and
+    # their plans, which re-run captured SQL); they answer 404 when off
+    DEBUG_ENDPOINTS: bool = False
 
     class Config:
         env_file = ".env"
@@ -14,6 +76,11 @@ class Settings(BaseSettings):
 
     @property
     def sqlalchemy_database_uri(self):
+        if self.DATABASE_URL:
+            return self.DATABASE_URL
+        missing = [name for name in ("DB_SERVER", "DB_NAME", "DB_USER", "DB_PASSWORD") if not getattr(self, name)]
+        if missing:
+            raise ValueError(f"Set DATABASE_URL or {', '.join(missing)}")
         encoded_password = quote_plus(self.DB_PASSWORD)
         return (
             f"mssql+pyodbc://{self.DB_USER}:{encoded_password}@{self.DB_SERVER}:{self.DB_PORT}/"
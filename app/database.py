@@ -1,8 +1,58 @@
+import threading
+import time
+
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.config import settings
+from app.utils.dialects import engine_options
+from app.utils.pool_stats import InstrumentedQueuePool, watch_engine
+from app.utils.query_log import finish_streamed, install_query_log, row_bytes
+from app.utils.timing import phase
+
+
+def build_engine(url: str, name: str = "main"):
+    """
+    Creates an engine with the configured pool settings, the slow-query log
+    and pool statistics. Engines are meant to live for the whole process;
+    use get_engine() rather than building one per task.
+    """
+    options = {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+    dialect_options = engine_options(url)
+    if "poolclass" in dialect_options:
+        options = {}  # a dedicated pool class takes no sizing arguments
+    engine = create_engine(
+        url,
+        echo=settings.DB_ECHO,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        **options,
+        **dialect_options,
+    )
+    install_query_log(engine)
+    watch_engine(name, engine)
+    return engine
+
+
+engine = build_engine(settings.sqlalchemy_database_uri)
+_engines = {settings.sqlalchemy_database_uri: engine}
+_engines_lock = threading.Lock()
+
+
+def get_engine(url: str):
+    """
+    Shared pooled engine for `url`; the application database URL maps to
+    the main engine.
+    """
+    with _engines_lock:
+        if url not in _engines:
+            _engines[url] = build_engine(url, name=f"engine{len(_engines)}")
+        return _engines[url]
 
-engine = create_engine(settings.sqlalchemy_database_uri, echo=True)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -14,4 +64,34 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def stream_partitions(db, query, fetch_size=None):
+    """
+    Executes a select with yield_per so rows come back through a streaming
+    cursor, and yields them as lists of row mappings of at most fetch_size.
+    Only one partition is held in memory at a time. Time to execute counts
+    as the request's "sql" phase, fetching rows as "materialization"; rows,
+    bytes and fetch time are reported to the query log when the scan ends.
+    """
+    fetch_size = fetch_size or settings.DB_FETCH_SIZE
+    with phase("sql"):
+        result = db.execute(query.execution_options(yield_per=fetch_size))
+    rows = nbytes = 0
+    fetching = 0.0
+    try:
+        partitions = result.mappings().partitions(fetch_size)
+        while True:
+            start = time.perf_counter()
+            with phase("materialization"):
+                partition = next(partitions, None)
+            fetching += time.perf_counter() - start
+            if partition is None:
+                break
+            rows += len(partition)
+            nbytes += row_bytes(partition[0].values()) * len(partition)
+            yield partition
+    finally:
+        result.close()
+        finish_streamed(result, rows, nbytes, fetching)
@@ -1,38 +1,69 @@
 import pandas as pd
 # Import the OpenAI library, which will be used to interact with the DeepSeek API
 try:
-    from openai import OpenAI
+    from openai import (
+        APIConnectionError, APITimeoutError, AsyncOpenAI, InternalServerError, OpenAI, RateLimitError,
+    )
 except ImportError:
-    print("Error: The 'openai' library is not found.")
-    print("Please install it using: pip install openai")
+    # Reported by extraction_configured(); install it with: pip install openai
     OpenAI = None # Set to None if the library isn't available
+    AsyncOpenAI = None
 
 
+import asyncio
+import datetime
+import hashlib
+import itertools
 import json
 import os
-import math
+import random
+import re
+import time
+from collections import deque
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import engine as default_engine
+from app.models.datapoints import ExtractedRecord, ExtractionCheckpoint
+from app.utils.chunking import TokenChunker, TokenEstimator, detect_header, iter_lines
+from app.utils.extraction_cache import ExtractionCache
+from app.utils.rate_limit import AdaptiveConcurrency, RateLimiter
 
 # --- Configuration ---
 # Your DeepSeek API key.
 # It's recommended to store API keys securely, e.g., in environment variables.
 API_KEY = os.environ.get("DEEPSEEK_API_KEY", "YOUR_DEEPSEEK_API_KEY")
-if API_KEY == "YOUR_DEEPSEEK_API_KEY":
-    print("WARNING: Replace 'YOUR_DEEPSEEK_API_KEY' with your actual DeepSeek API key or set the DEEPSEEK_API_KEY environment variable.")
-    # Consider exiting or raising an error here in production
+
+# Any OpenAI-compatible endpoint works, e.g. a local mock server for load tests
+DEEPSEEK_BASE_URL = os.environ.get("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
+# The model name you want to use (e.g., "deepseek-chat" or another "top model" name)
+DEEPSEEK_MODEL_NAME = os.environ.get("DEEPSEEK_MODEL_NAME", "deepseek-chat")
 
 # Configure the OpenAI client to point to the DeepSeek API
 deepseek_client = None
 if OpenAI and API_KEY != "YOUR_DEEPSEEK_API_KEY":
     try:
-        deepseek_client = OpenAI(api_key=API_KEY, base_url="https://api.deepseek.com")
-        # The model name you want to use (e.g., "deepseek-chat" or another "top model" name)
-        DEEPSEEK_MODEL_NAME = 'deepseek-chat' # Or the specific model name you need
+        deepseek_client = OpenAI(api_key=API_KEY, base_url=DEEPSEEK_BASE_URL)
     except Exception as e:
         print(f"Error initializing DeepSeek client using OpenAI SDK: {e}")
         print("Please ensure your API key is correct and the base_url is accurate.")
         deepseek_client = None
-elif OpenAI:
-     print("DeepSeek API key not set. DeepSeek client not initialized.")
+
+
+def extraction_configured():
+    """
+    None when LLM extraction can run, else the reason it cannot.
+    """
+    if AsyncOpenAI is None:
+        return "The 'openai' library is not found. Please install it using: pip install openai"
+    if API_KEY == "YOUR_DEEPSEEK_API_KEY":
+        return "DeepSeek API key not set: set the DEEPSEEK_API_KEY environment variable."
+    return None
+
+# Failures worth retrying: network errors, timeouts, 429s and 5xx responses
+TRANSIENT_ERRORS = (APIConnectionError, APITimeoutError, RateLimitError, InternalServerError) if OpenAI else ()
 
 
 # --- Extraction Prompt Template for Chunks ---
@@ -67,10 +98,62 @@ JSON Array Output:
 ]
 
 
-# Define a rough chunk size (number of lines).
-# This needs tuning based on the DeepSeek model's context window limits and performance.
-# Start small, test with your data, and increase if possible while monitoring accuracy and cost.
-LINES_PER_CHUNK = 20 # Example size, adjust as needed
+# Chunks are packed up to EXTRACTION_CHUNK_TOKENS estimated tokens; see
+# app/utils/chunking.py. Token counts are estimated locally: chunking uses
+# the plain estimate so chunk boundaries never change between runs, while
+# the rate limiter's reservations use one calibrated on reported usage.
+chunk_estimator = TokenEstimator()
+token_estimator = TokenEstimator()
+
+
+def make_chunker():
+    return TokenChunker(chunk_estimator, settings.EXTRACTION_CHUNK_TOKENS)
+
+def chunk_messages(text_chunk):
+    """
+    Chat messages asking the model to extract the records of `text_chunk`.
+    """
+    return [
+        {"role": msg["role"], "content": msg["content"].format(text_chunk=text_chunk) if "{text_chunk}" in msg["content"] else msg["content"]}
+        for msg in CHUNK_EXTRACTION_MESSAGES_TEMPLATE
+    ]
+
+
+def parse_records(response, text_chunk):
+    """
+    The list of records in a chat completion response, or None when the
+    response is empty or not a JSON array.
+    """
+    # Assuming the response structure is standard chat completion response
+    if not response or not response.choices:
+         print(f"API response is empty or invalid for chunk: {text_chunk[:100]}...")
+         return None
+
+    # The model's text output should contain the JSON string
+    json_string = (response.choices[0].message.content or "").strip()
+
+    # Attempt to parse the JSON string returned by the API
+    try:
+        extracted_data_list = json.loads(json_string)
+        # Ensure it's a list as expected from the prompt
+        if isinstance(extracted_data_list, list):
+            return extracted_data_list
+        else:
+             print(f"API did not return a JSON list for chunk: {text_chunk[:100]}... Response text: {json_string[:100]}...")
+             # If it's not a list but is valid JSON (e.g., a single object), you might decide how to handle it
+             return None # Or return [extracted_data_list] if a single object is expected sometimes
+    except json.JSONDecodeError:
+        print(f"Failed to parse JSON from API response for chunk: {text_chunk[:100]}... Response text: {json_string[:100]}...")
+        return None # Or try more robust JSON parsing/error recovery
+
+
+def estimate_tokens(text):
+    """
+    Local token count estimate, used to reserve the tokens-per-minute budget
+    before a request.
+    """
+    return token_estimator.estimate(text)
+
 
 def extract_records_from_chunk_with_deepseek(text_chunk, client, model_name):
     """
@@ -87,50 +170,168 @@ def extract_records_from_chunk_with_deepseek(text_chunk, client, model_name):
     if client is None:
         return None
 
-    # Prepare the messages for the chat completion API call
-    messages = [
-        {"role": msg["role"], "content": msg["content"].format(text_chunk=text_chunk) if "{text_chunk}" in msg["content"] else msg["content"]}
-        for msg in CHUNK_EXTRACTION_MESSAGES_TEMPLATE
-    ]
-
-
     try:
         # --- THIS IS THE PART USING THE OPENAI SDK TO CALL DEEPSEEK ---
         response = client.chat.completions.create(
             model=model_name,
-            messages=messages,
+            messages=chunk_messages(text_chunk),
             # Use response_format if the model supports it for reliable JSON output
             # Check DeepSeek's documentation if their models support this parameter
             # response_format={"type": "json_object"},
             temperature=0 # Use low temperature for extraction tasks
         )
+    except Exception as e:
+        print(f"DeepSeek API call failed for chunk: {text_chunk[:100]}... Error: {e}")
+        return None
+    return parse_records(response, text_chunk)
+
 
-        # Assuming the response structure is standard chat completion response
-        if not response or not response.choices:
-             print(f"API response is empty or invalid for chunk: {text_chunk[:100]}...")
-             return None
+class ChunkExtractor:
+    """
+    Extracts records from many chunks concurrently with an async client: at
+    most `max_in_flight` requests at once, within the requests/tokens per
+    minute limits, retrying transient failures (connection errors, timeouts,
+    429, 5xx) with exponential backoff and jitter, or the server's
+    Retry-After when it sends one. extract_ordered() returns the results in
+    chunk order. Chunks found in `cache` are not sent again, and successful
+    results are added to it. The number of requests in flight adapts to
+    their latency and parse failures (see AdaptiveConcurrency), and reported
+    prompt sizes calibrate the token estimate.
+    Must be used from a single event loop.
+    """
 
-        # The model's text output should contain the JSON string
-        json_string = response.choices[0].message.content.strip()
+    def __init__(
+        self,
+        client,
+        model_name,
+        max_in_flight=None,
+        requests_per_minute=None,
+        tokens_per_minute=None,
+        max_retries=None,
+        cache=None,
+    ):
+        self.client = client
+        self.cache = cache
+        self.model_name = model_name
+        self.max_in_flight = max_in_flight or settings.EXTRACTION_MAX_IN_FLIGHT
+        self.max_retries = settings.EXTRACTION_MAX_RETRIES if max_retries is None else max_retries
+        self.limiter = RateLimiter(
+            settings.EXTRACTION_REQUESTS_PER_MINUTE if requests_per_minute is None else requests_per_minute,
+            settings.EXTRACTION_TOKENS_PER_MINUTE if tokens_per_minute is None else tokens_per_minute,
+        )
+        self.concurrency = AdaptiveConcurrency(self.max_in_flight, settings.EXTRACTION_TARGET_LATENCY_S)
+        self.stats = {
+            "requests": 0, "retries": 0, "failed_chunks": 0,
+            "prompt_tokens": 0, "completion_tokens": 0,
+        }
+
+    def _retry_delay(self, error, attempt):
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return random.uniform(0, min(60, 2 ** attempt))
+
+    async def extract(self, text_chunk):
+        """
+        Records of one chunk, or None when the request or the parsing failed.
+        """
+        key = None
+        if self.cache is not None:
+            key = ExtractionCache.key(CHUNK_EXTRACTION_MESSAGES_TEMPLATE, self.model_name, text_chunk)
+            records = self.cache.get(key)
+            if records is not None:
+                return records
+        messages = chunk_messages(text_chunk)
+        prompt = "".join(m["content"] for m in messages)
+        # Prompt plus a completion of about the chunk's size
+        reserved = estimate_tokens(prompt) + estimate_tokens(text_chunk)
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire(reserved)
+            async with self.concurrency:
+                self.stats["requests"] += 1
+                started = time.perf_counter()
+                try:
+                    response = await self.client.chat.completions.create(
+                        model=self.model_name,
+                        messages=messages,
+                        temperature=0
+                    )
+                except TRANSIENT_ERRORS as e:
+                    self.limiter.settle(reserved, 0)
+                    error = e
+                except Exception as e:
+                    self.limiter.settle(reserved, 0)
+                    print(f"DeepSeek API call failed for chunk: {text_chunk[:100]}... Error: {e}")
+                    self.stats["failed_chunks"] += 1
+                    return None
+                else:
+                    elapsed = time.perf_counter() - started
+                    usage = getattr(response, "usage", None)
+                    if usage is not None:
+                        self.stats["prompt_tokens"] += usage.prompt_tokens or 0
+                        self.stats["completion_tokens"] += usage.completion_tokens or 0
+                        self.limiter.settle(reserved, usage.total_tokens or reserved)
+                        token_estimator.calibrate(TokenEstimator.raw(prompt), usage.prompt_tokens)
+                    records = parse_records(response, text_chunk)
+                    self.concurrency.observe(elapsed, records is not None)
+                    if records is None:
+                        self.stats["failed_chunks"] += 1
+                    elif key is not None:
+                        self.cache.put(key, records)
+                    return records
+            if attempt < self.max_retries:
+                self.stats["retries"] += 1
+                await asyncio.sleep(self._retry_delay(error, attempt))
+        print(f"DeepSeek API call failed after {self.max_retries + 1} attempts for chunk: {text_chunk[:100]}... Error: {error}")
+        self.stats["failed_chunks"] += 1
+        return None
 
-        # Attempt to parse the JSON string returned by the API
+    async def extract_ordered(self, chunks):
+        """
+        Async generator of (chunk, records) in the order of `chunks` (text or
+        Chunk objects), which
+        is consumed lazily: up to twice `max_in_flight` chunks are scheduled
+        ahead of the one being yielded, so a slow chunk does not stall the
+        others while memory stays bounded.
+        """
+        pending = deque()
         try:
-            extracted_data_list = json.loads(json_string)
-            # Ensure it's a list as expected from the prompt
-            if isinstance(extracted_data_list, list):
-                return extracted_data_list
-            else:
-                 print(f"API did not return a JSON list for chunk: {text_chunk[:100]}... Response text: {json_string[:100]}...")
-                 # If it's not a list but is valid JSON (e.g., a single object), you might decide how to handle it
-                 return None # Or return [extracted_data_list] if a single object is expected sometimes
-        except json.JSONDecodeError:
-            print(f"Failed to parse JSON from API response for chunk: {text_chunk[:100]}... Response text: {json_string[:100]}...")
-            return None # Or try more robust JSON parsing/error recovery
+            for chunk in chunks:
+                # Plain text, or a Chunk that also carries its file offsets
+                text = getattr(chunk, "text", chunk)
+                pending.append((chunk, asyncio.ensure_future(self.extract(text))))
+                if len(pending) >= 2 * self.max_in_flight:
+                    chunk, task = pending.popleft()
+                    yield chunk, await task
+            while pending:
+                chunk, task = pending.popleft()
+                yield chunk, await task
+        finally:
+            for _, task in pending:
+                task.cancel()
+
+
+def default_cache():
+    """
+    The extraction cache configured in settings, or None when disabled.
+    """
+    if not settings.EXTRACTION_CACHE_DIR:
+        return None
+    return ExtractionCache(settings.EXTRACTION_CACHE_DIR, settings.EXTRACTION_CACHE_MAX_MB * 1024 * 1024)
 
 
-    except Exception as e:
-        print(f"DeepSeek API call failed for chunk: {text_chunk[:100]}... Error: {e}")
+def make_async_client():
+    """
+    Async client for the configured endpoint; retries are done by
+    ChunkExtractor, so the SDK's own are turned off.
+    """
+    if AsyncOpenAI is None or API_KEY == "YOUR_DEEPSEEK_API_KEY":
         return None
+    return AsyncOpenAI(api_key=API_KEY, base_url=DEEPSEEK_BASE_URL, max_retries=0)
 
 
 def process_csv_in_chunks_with_deepseek(file_path):
@@ -152,89 +353,267 @@ def process_csv_in_chunks_with_deepseek(file_path):
         return []
 
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
+        header, start = read_header(file_path)
+        chunker = make_chunker()
+        print(f"Processing {os.path.getsize(file_path)} bytes in chunks of about {chunker.budget} tokens{' with the CSV header' if header else ''}...")
 
-        # Filter out potentially empty or pure header lines if necessary
-        # Keep lines that contain some characters, potentially refine this filter
-        lines = [line for line in lines if line.strip()]
-        # Optional: Filter out lines that look like the header row if it might appear multiple times
-        # lines = [line for line in lines if not line.startswith('sales_revenue,sales_units')]
+        # Lines are read and chunked lazily and the chunks sent concurrently;
+        # results come back in chunk order
+        all_extracted_records = asyncio.run(_extract_all(chunker.spans(iter_lines(file_path, start), header), chunker))
 
+    except FileNotFoundError:
+        print(f"Error: File not found at {file_path}")
+        return []
+    except Exception as e:
+        print(f"An unexpected error occurred during file reading or chunk processing: {e}")
+        return []
 
-        num_lines = len(lines)
-        if num_lines == 0:
-            print("No significant lines found in the file after basic filtering.")
-            return []
+    return all_extracted_records
 
-        num_chunks = math.ceil(num_lines / LINES_PER_CHUNK)
 
-        print(f"Total lines to process: {num_lines}")
-        print(f"Processing in {num_chunks} chunks of approx {LINES_PER_CHUNK} lines...")
+async def _extract_all(chunks, chunker):
+    extractor = ChunkExtractor(make_async_client(), DEEPSEEK_MODEL_NAME, cache=default_cache())
+    records = []
+    i = 0
+    async for _, extracted_records_in_chunk in extractor.extract_ordered(chunks):
+        i += 1
+        if extracted_records_in_chunk:
+            records.extend(extracted_records_in_chunk) # Add found records to the main list
+            print(f"Extracted {len(extracted_records_in_chunk)} records from chunk {i}")
+    await extractor.client.close()
+    print(f"Extraction stats: {extractor.stats}, chunking: {chunker.stats}, "
+          f"concurrency: {extractor.concurrency.stats}, final limit {extractor.concurrency.limit} requests")
+    if extractor.cache is not None:
+        print(f"Extraction cache: {extractor.cache.snapshot()}")
+    return records
+
+
+def read_header(file_path):
+    """
+    The CSV header line of the file (None if it has none), and the byte
+    offset where its data lines start. Only the first lines are read; a
+    CSV header is repeated at the top of every chunk instead.
+    """
+    sample = [(end, line) for _, end, line in itertools.islice(
+        ((s, e, line) for s, e, line in iter_lines(file_path) if line.strip()), 20)]
+    header = detect_header([line for _, line in sample])
+    return header, (sample[0][0] if header is not None else 0)
 
-        for i in range(num_chunks):
-            start_index = i * LINES_PER_CHUNK
-            end_index = min((i + 1) * LINES_PER_CHUNK, num_lines)
-            current_chunk_lines = lines[start_index:end_index]
-            text_chunk = "".join(current_chunk_lines) # Join lines into a single string chunk
 
-            if not text_chunk.strip(): # Skip completely empty chunks
-                continue
+# --- Streaming extraction into the staging table ---
+# Records are validated, buffered and written to extraction_staging in
+# batches of EXTRACTION_FLUSH_ROWS. Each flush also moves the job's
+# checkpoint to the end of the last chunk flushed, in the same transaction,
+# so a job restarted after a crash resumes from the first chunk whose
+# records are not in staging yet, and memory stays bounded whatever the
+# size of the file.
 
-            print(f"\nProcessing Chunk {i+1}/{num_chunks} (Lines {start_index+1}-{end_index})...") # Use 1-based indexing for display
+NUMERIC_FIELDS = ("sales_revenue", "sales_units", "inventory_level")
+TEXT_FIELDS = ("sales_date", "sales_region", "product_segment", "source_country", "source_origin", "source_table")
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
 
-            # Use the function that calls the DeepSeek API
-            extracted_records_in_chunk = extract_records_from_chunk_with_deepseek(
-                text_chunk,
-                deepseek_client,
-                DEEPSEEK_MODEL_NAME # Pass the model name
-            )
 
-            if extracted_records_in_chunk:
-                all_extracted_records.extend(extracted_records_in_chunk) # Add found records to the main list
-                print(f"Extracted {len(extracted_records_in_chunk)} records from chunk {i+1}")
+def _to_number(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = _NUMBER.search(value.replace(",", ""))
+        return float(match.group()) if match else None
+    return None
 
 
-    except FileNotFoundError:
-        print(f"Error: File not found at {file_path}")
-        return []
-    except Exception as e:
-        print(f"An unexpected error occurred during file reading or chunk processing: {e}")
-        return []
+def validate_record(record):
+    """
+    The staging row of an extracted record: numbers coerced, text fields
+    trimmed to their column sizes, unknown fields kept as JSON in `extra`.
+    None when the record has none of the expected fields.
+    """
+    if not isinstance(record, dict):
+        return None
+    row = {field: _to_number(record.get(field)) for field in NUMERIC_FIELDS}
+    for field in TEXT_FIELDS:
+        value = record.get(field)
+        row[field] = str(value).strip()[:ExtractedRecord.__table__.c[field].type.length] if value not in (None, "") else None
+    if all(value is None for value in row.values()):
+        return None
+    extra = {k: v for k, v in record.items() if k not in NUMERIC_FIELDS and k not in TEXT_FIELDS}
+    row["extra"] = json.dumps(extra, ensure_ascii=False, default=str) if extra else None
+    return row
+
+
+def extraction_job_id(file_path):
+    """
+    Identifies an extraction of this file (path, size and modification time)
+    with the current prompt and model, so a re-run resumes it; a changed
+    file or prompt starts a new job.
+    """
+    stat = os.stat(file_path)
+    payload = json.dumps([os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns,
+                          CHUNK_EXTRACTION_MESSAGES_TEMPLATE, DEEPSEEK_MODEL_NAME])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def _checkpoint_dict(checkpoint):
+    return {
+        "job_id": checkpoint.job_id,
+        "source": checkpoint.source,
+        "offset": checkpoint.offset,
+        "chunks": checkpoint.chunks,
+        "records": checkpoint.records,
+        "failed_ranges": json.loads(checkpoint.failed_ranges or "[]"),
+        "status": checkpoint.status,
+    }
+
+
+def extraction_checkpoint(job_id, bind=None):
+    """
+    The stored checkpoint of an extraction job, or None if it never ran.
+    """
+    with Session(bind if bind is not None else default_engine) as session:
+        checkpoint = session.get(ExtractionCheckpoint, job_id)
+        return _checkpoint_dict(checkpoint) if checkpoint is not None else None
+
+
+def _load_checkpoint(bind, job_id, file_path):
+    with Session(bind) as session:
+        checkpoint = session.get(ExtractionCheckpoint, job_id)
+        if checkpoint is None:
+            header, offset = read_header(file_path)
+            checkpoint = ExtractionCheckpoint(
+                job_id=job_id, source=os.path.abspath(file_path)[:1024], header=header, offset=offset,
+                chunks=0, records=0, failed_ranges="[]", status="running",
+                updated_at=datetime.datetime.utcnow(),
+            )
+            session.add(checkpoint)
+            session.commit()
+        return _checkpoint_dict(checkpoint), checkpoint.header
 
-    return all_extracted_records
+
+def _flush(bind, job_id, rows, offset, chunks, failed_ranges, status):
+    """
+    Writes the buffered rows and advances the checkpoint in one transaction.
+    """
+    with Session(bind) as session, session.begin():
+        if rows:
+            session.execute(insert(ExtractedRecord), rows)
+        checkpoint = session.get(ExtractionCheckpoint, job_id)
+        checkpoint.offset = offset
+        checkpoint.chunks += chunks
+        checkpoint.records += len(rows)
+        checkpoint.failed_ranges = json.dumps(failed_ranges)
+        checkpoint.status = status
+        checkpoint.updated_at = datetime.datetime.utcnow()
+        return _checkpoint_dict(checkpoint)
+
+
+def extract_file_to_staging(file_path, job_id=None, bind=None, on_progress=None):
+    """
+    Extracts the records of a file into extraction_staging, resuming the job
+    from its checkpoint when it ran before; the byte ranges of chunks that
+    failed in earlier runs are retried first, and those that fail again stay
+    in the checkpoint's failed_ranges. `on_progress` is called with the
+    checkpoint and the extractor's request/token stats after every flush.
+    Returns the final checkpoint.
+    """
+    job_id = job_id or extraction_job_id(file_path)
+    bind = bind if bind is not None else default_engine
+    checkpoint, header = _load_checkpoint(bind, job_id, file_path)
+    if checkpoint["status"] == "completed" and not checkpoint["failed_ranges"]:
+        print(f"Extraction job {job_id} already completed: {checkpoint['records']} records")
+        return checkpoint
+    if checkpoint["chunks"]:
+        print(f"Resuming extraction job {job_id} at byte {checkpoint['offset']} ({checkpoint['records']} records staged, "
+              f"{len(checkpoint['failed_ranges'])} failed chunks to retry)")
+    return asyncio.run(_extract_to_staging(file_path, job_id, bind, checkpoint, header, on_progress))
+
+
+async def _extract_to_staging(file_path, job_id, bind, checkpoint, header, on_progress):
+    chunker = make_chunker()
+    extractor = ChunkExtractor(make_async_client(), DEEPSEEK_MODEL_NAME, cache=default_cache())
+    failed_ranges = checkpoint["failed_ranges"]
+    rows, chunks, offset = [], 0, checkpoint["offset"]
+    resume_offset = offset
+    status = "failed"
+    try:
+        # Chunk boundaries are fixed, so a failed range is cut into the same
+        # chunk again
+        retries = [chunker.spans(iter_lines(file_path, start, end), header) for start, end in list(failed_ranges)]
+        chunk_stream = itertools.chain(*retries, chunker.spans(iter_lines(file_path, offset), header))
+        async for chunk, records in extractor.extract_ordered(chunk_stream):
+            if chunk.start < resume_offset:
+                # A retried chunk: its bytes leave the failed range it came from
+                failed = next(r for r in failed_ranges if r[0] <= chunk.start < r[1])
+                failed_ranges.remove(failed)
+                if chunk.end < failed[1]:
+                    failed_ranges.append([chunk.end, failed[1]])
+            else:
+                chunks += 1
+                offset = chunk.end
+            if records is None:
+                # Skipped, and kept for a later retry of just these bytes
+                failed_ranges.append([chunk.start, chunk.end])
+            for record in records or ():
+                row = validate_record(record)
+                if row is not None:
+                    row["job_id"] = job_id
+                    row["chunk_offset"] = chunk.start
+                    rows.append(row)
+            if len(rows) >= settings.EXTRACTION_FLUSH_ROWS:
+                checkpoint = await asyncio.to_thread(_flush, bind, job_id, rows, offset, chunks, failed_ranges, "running")
+                rows, chunks = [], 0
+                if on_progress is not None:
+                    on_progress(checkpoint, extractor.stats)
+        status = "completed"
+    finally:
+        # The final flush also runs when the job fails or is cancelled, so
+        # everything extracted so far is kept
+        checkpoint = await asyncio.to_thread(_flush, bind, job_id, rows, offset, chunks, failed_ranges, status)
+        if on_progress is not None:
+            on_progress(checkpoint, extractor.stats)
+        if extractor.client is not None:
+            await extractor.client.close()
+    print(f"Extraction job {job_id} {status}: {checkpoint['records']} records, {len(failed_ranges)} failed chunks, "
+          f"stats: {extractor.stats}, chunking: {chunker.stats}, concurrency: {extractor.concurrency.stats}")
+    return checkpoint
 
 # --- How to use the script ---
-file_name = 'your_unstructured_data.csv' # Replace with the actual name of your file
+if __name__ == "__main__":
+    reason = extraction_configured()
+    if reason:
+        print(f"WARNING: {reason}")
+
+    file_name = 'your_unstructured_data.csv' # Replace with the actual name of your file
 
-# Ensure your DeepSeek API key is set (e.g., via environment variable DEEPSEEK_API_KEY)
-# or replace "YOUR_DEEPSEEK_API_KEY" directly in the script (less secure).
+    # Ensure your DeepSeek API key is set (e.g., via environment variable DEEPSEEK_API_KEY)
+    # or replace "YOUR_DEEPSEEK_API_KEY" directly in the script (less secure).
 
-extracted_data_records = process_csv_in_chunks_with_deepseek(file_name)
+    extracted_data_records = process_csv_in_chunks_with_deepseek(file_name)
 
-# Now 'extracted_data_records' is a list of dictionaries, where each dictionary is a structured record
-if extracted_data_records:
-    structured_df = pd.DataFrame(extracted_data_records)
-    print("\n--- Extracted Data (First 5 records) ---")
-    print(structured_df.head())
-    print(f"\nTotal records extracted: {len(structured_df)}")
+    # Now 'extracted_data_records' is a list of dictionaries, where each dictionary is a structured record
+    if extracted_data_records:
+        structured_df = pd.DataFrame(extracted_data_records)
+        print("\n--- Extracted Data (First 5 records) ---")
+        print(structured_df.head())
+        print(f"\nTotal records extracted: {len(structured_df)}")
 
-    # --- Next Steps: Data Cleaning and KPI Calculation ---
-    # The extracted data is now in a DataFrame, but values might still be strings.
-    # You need to clean columns (e.g., convert 'sales_revenue' to numbers, 'sales_date' to datetime).
+        # --- Next Steps: Data Cleaning and KPI Calculation ---
+        # The extracted data is now in a DataFrame, but values might still be strings.
+        # You need to clean columns (e.g., convert 'sales_revenue' to numbers, 'sales_date' to datetime).
 
-    # Example Cleaning (requires careful handling of potential None/missing values from extraction):
-    # structured_df['sales_revenue'] = pd.to_numeric(structured_df['sales_revenue'], errors='coerce')
-    # structured_df['sales_units'] = pd.to_numeric(structured_df['sales_units'], errors='coerce')
-    # Try converting date (needs robust parsing based on your date formats)
-    # structured_df['sales_date'] = pd.to_datetime(structured_df['sales_date'], errors='coerce')
+        # Example Cleaning (requires careful handling of potential None/missing values from extraction):
+        # structured_df['sales_revenue'] = pd.to_numeric(structured_df['sales_revenue'], errors='coerce')
+        # structured_df['sales_units'] = pd.to_numeric(structured_df['sales_units'], errors='coerce')
+        # Try converting date (needs robust parsing based on your date formats)
+        # structured_df['sales_date'] = pd.to_datetime(structured_df['sales_date'], errors='coerce')
 
 
-    # Once columns are cleaned and correctly typed, you can calculate KPIs:
-    # total_revenue = structured_df['sales_revenue'].sum()
-    # sales_by_region = structured_df.groupby('sales_region')['sales_revenue'].sum()
-    # (Requires date cleaning first) YOY_growth = ...
+        # Once columns are cleaned and correctly typed, you can calculate KPIs:
+        # total_revenue = structured_df['sales_revenue'].sum()
+        # sales_by_region = structured_df.groupby('sales_region')['sales_revenue'].sum()
+        # (Requires date cleaning first) YOY_growth = ...
 
 
-else:
-    print("\nNo records were extracted.")
\ No newline at end of file
+    else:
+        print("\nNo records were extracted.")
@@ -1,4 +1,4 @@
-from sqlalchemy import UUID, Column, String, Float, DateTime, BigInteger, Integer, ForeignKey, Text
+from sqlalchemy import UUID, Column, String, Float, DateTime, BigInteger, Integer, ForeignKey, Text, UniqueConstraint, Index
 from app.database import Base
 import uuid
 
@@ -10,12 +10,15 @@ class Dashboard(Base):
 # NEW MODEL - Add this to your existing models
 class DashboardTab(Base):
     __tablename__ = 'dashboard_tabs'
-    
+    __table_args__ = (Index('ix_dashboard_tabs_dashboard_id_tab_name', 'dashboard_id', 'tab_name'),)
+
     id = Column(String(36), primary_key=True, default=str(uuid.uuid4()))
     dashboard_id = Column(String(36), ForeignKey('dashboards.id'), nullable=False)
     tab_name = Column(String(255), nullable=False)
     tab_data = Column(Text, nullable=True)  # Will store JSON string
     created_at = Column(DateTime, nullable=True)
+    # data versions of the dashboard's tables the snapshot in tab_data was rendered from
+    data_version = Column(String(255), nullable=True)
 class AutoMobileData(Base):
     __tablename__ = 'auto_mobile_data'
     __table_args__ = {"extend_existing": True}
@@ -67,3 +70,73 @@ class AutoMobileData(Base):
     complaint_registered_yn      = Column(String,     nullable=True)
     delivery_rating_15           = Column(BigInteger, nullable=True)
     dashboard_id                 = Column(String(36), ForeignKey('dashboards.id'), nullable=True)
+
+
+class DataVersion(Base):
+    __tablename__ = 'data_versions'
+
+    # one row per ingested table, bumped every time the table is (re)loaded
+    table_name = Column(String(255), primary_key=True)
+    version    = Column(BigInteger, nullable=False, default=1)
+    updated_at = Column(DateTime, nullable=False)
+    row_count  = Column(BigInteger, nullable=True)
+
+
+class ExtractionCheckpoint(Base):
+    __tablename__ = 'extraction_checkpoints'
+
+    # one row per LLM extraction job; offset is the byte position in the
+    # source file up to which records have been flushed to staging
+    job_id        = Column(String(64), primary_key=True)
+    source        = Column(String(1024), nullable=False)
+    header        = Column(Text, nullable=True)
+    offset        = Column(BigInteger, nullable=False, default=0)
+    chunks        = Column(BigInteger, nullable=False, default=0)
+    records       = Column(BigInteger, nullable=False, default=0)
+    failed_ranges = Column(Text, nullable=True)  # JSON list of [start, end] byte ranges
+    status        = Column(String(32), nullable=False)
+    updated_at    = Column(DateTime, nullable=False)
+
+
+class ExtractedRecord(Base):
+    __tablename__ = 'extraction_staging'
+
+    # validated records of the extraction jobs, before they are published
+    id              = Column(Integer, primary_key=True, autoincrement=True)
+    job_id          = Column(String(64), nullable=False, index=True)
+    chunk_offset    = Column(BigInteger, nullable=False)
+    sales_revenue   = Column(Float, nullable=True)
+    sales_units     = Column(Float, nullable=True)
+    sales_date      = Column(String(64), nullable=True)
+    sales_region    = Column(String(255), nullable=True)
+    product_segment = Column(String(255), nullable=True)
+    inventory_level = Column(Float, nullable=True)
+    source_country  = Column(String(255), nullable=True)
+    source_origin   = Column(String(1024), nullable=True)
+    source_table    = Column(String(255), nullable=True)
+    extra           = Column(Text, nullable=True)  # JSON of any other fields the model returned
+
+
+class MetricDictionary(Base):
+    __tablename__ = 'metric_dictionary'
+    __table_args__ = (UniqueConstraint('kind', 'value'),)
+
+    # integer codes of the metric, brand, country and source values of
+    # long-format metric files
+    id    = Column(Integer, primary_key=True, autoincrement=True)
+    kind  = Column(String(16), nullable=False)
+    value = Column(String(1024), nullable=False)
+
+
+class MetricSeries(Base):
+    __tablename__ = 'metric_series'
+
+    # one value per (dataset, metric, brand, year, country); the primary key
+    # order serves multi-brand, multi-year lookups of a metric
+    dataset    = Column(String(255), primary_key=True)
+    metric_id  = Column(Integer, primary_key=True)
+    brand_id   = Column(Integer, primary_key=True)
+    year       = Column(Integer, primary_key=True)
+    country_id = Column(Integer, primary_key=True)
+    value      = Column(Float, nullable=True)
+    source_id  = Column(Integer, nullable=True)
@@ -1,72 +1,236 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import gzip
+import itertools
+import random
+import time
+from contextlib import nullcontext
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import Optional
-from app.database import get_db
+from typing import Dict, List, Optional
+from app.config import settings
+from app.database import SessionLocal, get_db
 from app.routers.upload_data import (
+    AUTO_MOBILE_TAB_FILTERS,
     get_sales_performance_kpis,
     get_supply_aftersales_kpis,
     get_customer_sustainability_kpis,
     descriptive_data_api,
+    auto_mobile_dashboard_kpis,
 )
-from app.routers.fmcgrouters import fmcg_dashboard_tab_kpis
+from app.routers.fmcgrouters import fmcg_dashboard_tab_kpis, fmcg_dashboard_kpis
+from app.utils.admission import AdmissionController, AdmissionRejected
+from app.utils.charts import UnknownChartError, chart_columns, tab_charts
+from app.utils.data_versions import cache_validators, get_data_versions, is_not_modified
+from app.utils.metric_series import has_dataset, query_series
+from app.utils.serialization import ChartJSONResponse, STREAM_MEDIA_TYPES, dumps, json_array_chunks, ndjson_lines
+from app.utils.pool_stats import pool_snapshot
+from app.utils.profiling import profile_report, profiling
+from app.utils.query_log import capture_plan, query_report
+from app.utils.single_flight import SingleFlight
+from app.utils.tab_snapshots import accepts_gzip, load_snapshot, store_snapshot, version_key
+from app.utils.timing import phase, start_timings
 
-router = APIRouter()
+router = APIRouter(default_response_class=ChartJSONResponse)
 
-@router.get("/dashboard-tabs/")
-async def get_dashboard_tabs(dashboard_id: str):
+# Identical concurrent dashboard computations run once and share the result
+dashboard_flights = SingleFlight()
+# Headers of responses that must not be cached or revalidated
+NO_STORE = {"Cache-Control": "no-store"}
+
+# Caps concurrent computations (and heavy ones among them); cheap jobs first
+dashboard_admission = AdmissionController(
+    max_running=settings.ADMISSION_MAX_RUNNING,
+    max_heavy=settings.ADMISSION_MAX_HEAVY,
+    max_queued=settings.ADMISSION_MAX_QUEUED,
+    heavy_cost=settings.ADMISSION_HEAVY_ROWS,
+)
+
+# Tabs served for each dashboard, in display order
+DASHBOARD_TABS = {
+    "auto_mobile": ["sales", "supply", "customer", "descriptive"],
+    "fmcg": [
+        "global_regional_sales",
+        "supply_chain",
+        "marketing_brand",
+        "financial_profitability",
+        "consumer_insights",
+        "sustainability_compliance"
+    ],
+    # Add more dashboards here as you add them
+}
+
+# Tables each dashboard reads; their data versions validate cached responses
+DASHBOARD_TABLES = {
+    "auto_mobile": ["auto_mobile_data"],
+    "fmcg": ["table_fmcg"],
+}
+
+# Filters pushed into SQL for each dashboard (descriptive filters are applied
+# to the streamed rows, so they do not shrink the scan)
+SQL_FILTERS = {
+    "auto_mobile": AUTO_MOBILE_TAB_FILTERS,
+    "fmcg": ("region", "country", "brand", "category"),
+}
+# Rough fraction of the rows a SQL filter keeps, for cost estimates
+FILTER_SELECTIVITY = 0.1
+
+def _chart_ids(charts: Optional[List[str]]):
     """
-    Returns the list of available tabs for a given dashboard.
+    Accepts both ?charts=a&charts=b and ?charts=a,b.
     """
-    if dashboard_id == "auto_mobile":
-        return {"tabs": ["sales", "supply", "customer", "descriptive"]}
-    if dashboard_id == "fmcg":
-        return {
-            "tabs": [
-                "global_regional_sales",
-                "supply_chain",
-                "marketing_brand",
-                "financial_profitability",
-                "consumer_insights",
-                "sustainability_compliance"
-            ]
-        }
-    # Add more dashboard_id checks as you add more dashboards
-    return {"tabs": []}
+    if charts is None:
+        return None
+    return [chart_id.strip() for value in charts for chart_id in value.split(",") if chart_id.strip()]
 
-@router.get("/dashboard-tab-kpis/{dashboard_id}/{tab}")
-async def dashboard_tab_kpis_dynamic(
-    dashboard_id: str,
-    tab: str,
-    db: Session = Depends(get_db),
-    country: Optional[str] = None,
-    region: Optional[str] = None,
-    oem_name: Optional[str] = None,
-    dealer_name: Optional[str] = None,
-    city: Optional[str] = None,
-    customer_type: Optional[str] = None,
-    brand: Optional[str] = None,
-    category: Optional[str] = None,
-):
+def _data_versions(db: Session, dashboard_id: str):
     """
-    Dynamic endpoint: /dashboard-tab-kpis/{dashboard_id}/{tab}
-    Supports both auto_mobile and fmcg dashboards.
+    {table: (version, updated_at)} for the dashboard's tables, or None when a
+    table has no data version yet (e.g. it was loaded outside the upload path)
+    and responses cannot be validated.
+    """
+    tables = DASHBOARD_TABLES.get(dashboard_id, [])
+    versions = get_data_versions(db, tables)
+    if not tables or len(versions) < len(tables):
+        return None
+    return versions
+
+def _flight_key(*parts, filters: Dict[str, Optional[str]], charts, limits, versions):
+    """
+    Identity of a computation: filters are matched case-insensitively, so
+    they are normalized the same way; unset filters are dropped.
+    """
+    normalized = tuple(sorted(
+        (name, value.strip().lower()) for name, value in filters.items() if value and value.strip()
+    ))
+    chart_key = tuple(sorted(set(charts))) if charts is not None else None
+    version_key = tuple(sorted((name, v[0]) for name, v in versions.items())) if versions else None
+    return parts + (normalized, chart_key, tuple(sorted(limits.items())), version_key)
+
+def _estimated_cost(dashboard_id: str, tabs: List[str], filters: Dict[str, Optional[str]], versions):
+    """
+    Estimated rows scanned: the table size recorded at ingestion (or the
+    heavy threshold when unknown), shrunk by each filter applied in SQL.
+    Tabs that apply the same filters share a scan; tabs reading no columns
+    cost nothing.
+    """
+    if versions and all(v[2] is not None for v in versions.values()):
+        rows = sum(v[2] for v in versions.values())
+    else:
+        rows = settings.ADMISSION_HEAVY_ROWS
+    sql_filters = SQL_FILTERS.get(dashboard_id, ())
+    scans = set()
+    for tab in tabs:
+        if not chart_columns(tab_charts.get((dashboard_id, tab), [])):
+            continue
+        names = sql_filters.get(tab, ()) if isinstance(sql_filters, dict) else sql_filters
+        scans.add(tuple(name for name in names if filters.get(name)))
+    return sum(rows * FILTER_SELECTIVITY ** len(applied) for applied in scans)
+
+async def _admitted(cost: float, func, *args):
+    """
+    Runs `func(*args)` in a worker thread once the admission controller
+    grants a slot for a job of the given cost.
+    """
+    with phase("admission"):
+        token = await dashboard_admission.acquire(cost)
+    try:
+        return await asyncio.to_thread(func, *args)
+    finally:
+        dashboard_admission.release(token)
+
+def _run_encoded(kpis, dashboard_id: str, tabs, *args):
+    """
+    Computes a payload in a worker thread and encodes it once for every
+    coalesced request. The tab functions do blocking database work without
+    awaiting anything, so each run gets its own short-lived event loop. The
+    run opens its own Session: the request that started it may disconnect
+    (and close its Session) while the others still wait for the result.
+    Returns the body and whether any chart timed out.
+    """
+    with SessionLocal() as db:
+        payload = asyncio.run(kpis(dashboard_id, tabs, db, *args))
+    return dumps(payload), _has_timeouts(payload)
+
+def _has_timeouts(payload) -> bool:
+    """
+    Whether a tab payload (a chart list) or a batch payload ({tab: charts})
+    holds a timeout placeholder.
+    """
+    charts = itertools.chain.from_iterable(payload.values()) if isinstance(payload, dict) else payload
+    return any(chart.get("status") == "timeout" for chart in charts)
+
+def _response_headers(headers, timed_out: bool, profile: bool):
+    """
+    Validators are only sent with complete, reusable payloads: responses
+    with timed-out charts or per-run profiles must not be revalidated into
+    a 304, so they go out uncached instead.
+    """
+    return NO_STORE if timed_out or profile else headers
+
+async def _first_chart(charts, cost: float):
+    """
+    Pulls the first chart of a lazy chart iterator under an admission slot;
+    that is when the scan runs. Returns an iterator over all the charts.
     """
+    charts = iter(charts)
+    with phase("admission"):
+        token = await dashboard_admission.acquire(cost)
+    try:
+        first = await asyncio.to_thread(next, charts, None)
+    finally:
+        dashboard_admission.release(token)
+    return charts if first is None else itertools.chain([first], charts)
+
+def _timed_stream(chunks, timings, dashboard_id: str, tab: str):
+    """
+    Streams the encoded chunks and records the request's phase timings once
+    the last one is sent (Server-Timing only covers the work before it).
+    """
+    yield from chunks
+    timings.observe(dashboard_id, tab)
+
+def _with_timing(headers, timings):
+    return {**(headers or {}), "Server-Timing": timings.server_timing()}
+
+def _profiling(profile: bool):
+    """
+    Per-chart profiling for requests that ask for it (profiles attached to
+    the charts) and for a CHART_PROFILE_SAMPLE_RATE sample of the others.
+    """
+    if profile:
+        return profiling(attach=True)
+    if settings.CHART_PROFILE_SAMPLE_RATE and random.random() < settings.CHART_PROFILE_SAMPLE_RATE:
+        return profiling()
+    return nullcontext()
+
+def _deadline(budget_ms: Optional[int]):
+    """
+    time.monotonic() deadline for a request's latency budget, falling back
+    to DASHBOARD_BUDGET_MS; None when there is no budget.
+    """
+    budget_ms = budget_ms or settings.DASHBOARD_BUDGET_MS
+    return time.monotonic() + budget_ms / 1000 if budget_ms else None
+
+async def _tab_kpis(dashboard_id: str, tab: str, db: Session, filters: Dict[str, Optional[str]], charts, limits, stream: bool = False, deadline: Optional[float] = None):
     if dashboard_id == "auto_mobile":
+        options = {"charts": charts, "limits": limits, "stream": stream, "deadline": deadline}
         if tab == "sales":
             return await get_sales_performance_kpis(
-                db=db, country=country, region=region, oem_name=oem_name
+                db=db, country=filters["country"], region=filters["region"], oem_name=filters["oem_name"], **options
             )
         elif tab == "supply":
             return await get_supply_aftersales_kpis(
-                db=db, region=region, country=country, dealer_name=dealer_name
+                db=db, region=filters["region"], country=filters["country"], dealer_name=filters["dealer_name"], **options
             )
         elif tab == "customer":
             return await get_customer_sustainability_kpis(
-                db=db, city=city, customer_type=customer_type
+                db=db, city=filters["city"], customer_type=filters["customer_type"], **options
             )
         elif tab == "descriptive":
             return await descriptive_data_api(
-                db=db, country=country, brand=oem_name
+                db=db, country=filters["country"], brand=filters["oem_name"], **options
             )
         else:
             raise HTTPException(404, "Tab not found for this dashboard.")
@@ -74,10 +238,323 @@ async def dashboard_tab_kpis_dynamic(
         return await fmcg_dashboard_tab_kpis(
             tab=tab,
             db=db,
-            region=region,
-            country=country,
-            brand=brand,
-            category=category
+            region=filters["region"],
+            country=filters["country"],
+            brand=filters["brand"],
+            category=filters["category"],
+            charts=charts,
+            limits=limits,
+            stream=stream,
+            deadline=deadline
         )
     else:
         raise HTTPException(404, "Dashboard not found or not supported.")
+
+async def _batch_kpis(dashboard_id: str, tabs: List[str], db: Session, filters: Dict[str, Optional[str]], charts, limits, deadline: Optional[float] = None):
+    if dashboard_id == "auto_mobile":
+        return await auto_mobile_dashboard_kpis(
+            db=db,
+            tabs=tabs,
+            country=filters["country"],
+            region=filters["region"],
+            oem_name=filters["oem_name"],
+            dealer_name=filters["dealer_name"],
+            city=filters["city"],
+            customer_type=filters["customer_type"],
+            charts=charts,
+            limits=limits,
+            deadline=deadline
+        )
+    return await fmcg_dashboard_kpis(
+        db=db,
+        tabs=tabs,
+        region=filters["region"],
+        country=filters["country"],
+        brand=filters["brand"],
+        category=filters["category"],
+        charts=charts,
+        limits=limits,
+        deadline=deadline
+    )
+
+def _no_filters():
+    return dict.fromkeys(("country", "region", "oem_name", "dealer_name", "city", "customer_type", "brand", "category"))
+
+def render_tab_snapshots(db: Session, table_name: str):
+    """
+    Renders the default (unfiltered) payload of every tab of the dashboards
+    reading `table_name` from one shared scan, and stores each as the tab's
+    snapshot for the current data versions. Called by ingestion after the
+    table is loaded; dashboards whose tables are not all versioned are skipped.
+    """
+    for dashboard_id, tables in DASHBOARD_TABLES.items():
+        if table_name not in tables:
+            continue
+        versions = _data_versions(db, dashboard_id)
+        if versions is None:
+            continue
+        tabs = DASHBOARD_TABS[dashboard_id]
+        limits = {"top_n": None, "max_points": None}
+        payloads = asyncio.run(_batch_kpis(dashboard_id, tabs, db, _no_filters(), None, limits))
+        for tab in tabs:
+            store_snapshot(db, dashboard_id, tab, dumps(payloads[tab]), version_key(versions))
+        db.commit()
+        print(f"Stored default snapshots of the {dashboard_id} tabs ({version_key(versions)})")
+
+def _snapshot_response(request: Request, db: Session, dashboard_id: str, tab: str, versions, headers, timings):
+    """
+    The stored snapshot of a tab for the current data versions, sent still
+    gzipped to clients that accept it; None when there is none.
+    """
+    with phase("snapshot"):
+        body = load_snapshot(db, dashboard_id, tab, version_key(versions))
+    if body is None:
+        return None
+    headers = {**_with_timing(headers, timings), "Vary": "Accept-Encoding"}
+    if accepts_gzip(request.headers.get("accept-encoding", "")):
+        headers["Content-Encoding"] = "gzip"
+    else:
+        body = gzip.decompress(body)
+    timings.observe(dashboard_id, tab)
+    return ChartJSONResponse(body, headers=headers)
+
+@router.get("/dashboard-tabs/")
+async def get_dashboard_tabs(dashboard_id: str):
+    """
+    Returns the list of available tabs for a given dashboard.
+    """
+    return {"tabs": DASHBOARD_TABS.get(dashboard_id, [])}
+
+@router.get("/dashboard-coalescing-stats/")
+async def get_dashboard_coalescing_stats():
+    """
+    Dashboard computations started vs. joined by identical concurrent
+    requests ("coalesced" is the number of scans saved).
+    """
+    return dashboard_flights.snapshot()
+
+@router.get("/dashboard-admission-stats/")
+async def get_dashboard_admission_stats():
+    """
+    Running / queued dashboard computations and how many were refused.
+    """
+    return dashboard_admission.snapshot()
+
+def _debug_enabled():
+    """
+    Dependency of the /debug/* endpoints: they only exist with DEBUG_ENDPOINTS.
+    """
+    if not settings.DEBUG_ENDPOINTS:
+        raise HTTPException(404, "Not Found")
+
+@router.get("/debug/chart-profiles", dependencies=[Depends(_debug_enabled)])
+async def get_chart_profiles():
+    """
+    Per-chart wall/CPU time, rows, points and peak allocation accumulated
+    over profiled requests, most expensive charts first.
+    """
+    return profile_report()
+
+@router.get("/debug/db-pool", dependencies=[Depends(_debug_enabled)])
+async def get_db_pool_stats():
+    """
+    Live connection pool state; waits and timeouts are in /metrics.
+    """
+    return pool_snapshot()
+
+@router.get("/debug/slow-queries", dependencies=[Depends(_debug_enabled)])
+async def get_slow_queries():
+    """
+    Per-fingerprint SQL totals (most time-consuming first) and the recent
+    statements over SLOW_QUERY_MS.
+    """
+    return query_report()
+
+@router.get("/debug/slow-queries/{fingerprint}/plan", dependencies=[Depends(_debug_enabled)])
+def get_slow_query_plan(fingerprint: str):
+    """
+    Estimated plan of the latest slow run of a statement fingerprint.
+    """
+    try:
+        plan = capture_plan(fingerprint)
+    except NotImplementedError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if plan is None:
+        raise HTTPException(status_code=404, detail=f"No slow query recorded for fingerprint '{fingerprint}'")
+    return plan
+
+@router.get("/metrics-series")
+def get_metrics_series(
+    request: Request,
+    dataset: str,
+    metric: List[str] = Query(...),
+    brand: Optional[List[str]] = Query(None),
+    country: Optional[List[str]] = Query(None),
+    year_from: Optional[int] = None,
+    year_to: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Per-brand, per-country yearly series of the given metrics from a
+    long-format upload (`dataset` is the table name the upload returned).
+    `metric`, `brand` and `country` take several values (repeated or comma
+    separated) and match exactly, as uploaded; `year_from` / `year_to` bound
+    the years. Answered from the (dataset, metric, brand, year) index, with
+    ETag / Last-Modified from the dataset's data version.
+    """
+    versions = get_data_versions(db, [dataset])
+    if not versions or not has_dataset(db, dataset):
+        raise HTTPException(404, f"Metric dataset '{dataset}' not found.")
+    headers = cache_validators(versions, str(sorted(request.query_params.multi_items())))
+    if is_not_modified(request.headers, headers):
+        return Response(status_code=304, headers=headers)
+    series = query_series(
+        db, dataset, _chart_ids(metric), _chart_ids(brand), _chart_ids(country), year_from, year_to
+    )
+    return ChartJSONResponse({"dataset": dataset, "series": series}, headers=headers)
+
+@router.get("/dashboard-tab-kpis/{dashboard_id}/{tab}")
+async def dashboard_tab_kpis_dynamic(
+    dashboard_id: str,
+    tab: str,
+    request: Request,
+    db: Session = Depends(get_db),
+    country: Optional[str] = None,
+    region: Optional[str] = None,
+    oem_name: Optional[str] = None,
+    dealer_name: Optional[str] = None,
+    city: Optional[str] = None,
+    customer_type: Optional[str] = None,
+    brand: Optional[str] = None,
+    category: Optional[str] = None,
+    charts: Optional[List[str]] = Query(None),
+    top_n: Optional[int] = Query(None, ge=1),
+    max_points: Optional[int] = Query(None, ge=1),
+    stream: Optional[str] = Query(None, pattern="^(ndjson|array)$"),
+    budget_ms: Optional[int] = Query(None, ge=1),
+    profile: bool = False,
+):
+    """
+    Dynamic endpoint: /dashboard-tab-kpis/{dashboard_id}/{tab}
+    Supports both auto_mobile and fmcg dashboards.
+    `charts` limits the response to the given chart ids; only those charts
+    are computed and only the columns they read are fetched.
+    `top_n` caps categorical charts (the rest is folded into "Other") and
+    `max_points` caps the sampled points of row-level scatter charts.
+    `stream=ndjson` (one chart per line) or `stream=array` (a chunked JSON
+    array) sends each chart as soon as it is built instead of one payload.
+    Responses carry an ETag / Last-Modified derived from the data version of
+    the dashboard's table; a matching If-None-Match is answered with 304
+    before any chart is computed. Streamed and profiled responses, and
+    responses with timed-out charts, carry no validators and are sent with
+    Cache-Control: no-store. Identical concurrent requests share one
+    computation. Computations are admitted by estimated cost; when too many
+    are queued the request is refused with 429 and Retry-After.
+    `budget_ms` is the latency budget: charts not finished in time come back
+    as {"id": ..., "status": "timeout"} and the rest of the scan is dropped.
+    Phase timings are sent as Server-Timing and recorded for /metrics.
+    `profile=true` adds each chart's cost ("profile": wall/CPU ms, rows,
+    points, peak allocation) to its payload; it is ignored when streaming.
+    Requests without filters, charts, limits, streaming or profiling are
+    served from the tab's snapshot rendered at ingestion when it matches
+    the current data versions.
+    """
+    timings = start_timings()
+    deadline = _deadline(budget_ms)
+    versions = _data_versions(db, dashboard_id)
+    cacheable = versions and stream is None and not profile
+    headers = cache_validators(versions, str(sorted(request.query_params.multi_items()))) if cacheable else None
+    if headers and is_not_modified(request.headers, headers):
+        return Response(status_code=304, headers=headers)
+    filters = {
+        "country": country, "region": region, "oem_name": oem_name, "dealer_name": dealer_name,
+        "city": city, "customer_type": customer_type, "brand": brand, "category": category,
+    }
+    charts = _chart_ids(charts)
+    limits = {"top_n": top_n, "max_points": max_points}
+    default_view = not any(filters.values()) and charts is None and top_n is None and max_points is None
+    if versions and default_view and stream is None and not profile:
+        response = _snapshot_response(request, db, dashboard_id, tab, versions, headers, timings)
+        if response is not None:
+            return response
+    cost = _estimated_cost(dashboard_id, [tab], filters, versions)
+    try:
+        if stream is not None:
+            payload = await _tab_kpis(dashboard_id, tab, db, filters, charts, limits, True, deadline)
+            payload = await _first_chart(payload, cost)
+            encode = ndjson_lines if stream == "ndjson" else json_array_chunks
+            return StreamingResponse(
+                _timed_stream(encode(payload), timings, dashboard_id, tab),
+                media_type=STREAM_MEDIA_TYPES[stream],
+                headers=_with_timing(NO_STORE, timings)
+            )
+        key = _flight_key(dashboard_id, tab, budget_ms, profile, filters=filters, charts=charts, limits=limits, versions=versions)
+        with _profiling(profile):
+            body, timed_out = await dashboard_flights.run(key, _admitted, cost, _run_encoded, _tab_kpis, dashboard_id, tab, filters, charts, limits, False, deadline)
+    except UnknownChartError as e:
+        raise HTTPException(400, str(e))
+    except AdmissionRejected as e:
+        raise HTTPException(429, str(e), headers={"Retry-After": str(e.retry_after)})
+    timings.observe(dashboard_id, tab)
+    return ChartJSONResponse(body, headers=_with_timing(_response_headers(headers, timed_out, profile), timings))
+
+@router.get("/dashboard-kpis/{dashboard_id}")
+async def dashboard_kpis_batch(
+    dashboard_id: str,
+    request: Request,
+    tabs: Optional[List[str]] = Query(None),
+    db: Session = Depends(get_db),
+    country: Optional[str] = None,
+    region: Optional[str] = None,
+    oem_name: Optional[str] = None,
+    dealer_name: Optional[str] = None,
+    city: Optional[str] = None,
+    customer_type: Optional[str] = None,
+    brand: Optional[str] = None,
+    category: Optional[str] = None,
+    charts: Optional[List[str]] = Query(None),
+    top_n: Optional[int] = Query(None, ge=1),
+    max_points: Optional[int] = Query(None, ge=1),
+    budget_ms: Optional[int] = Query(None, ge=1),
+    profile: bool = False,
+):
+    """
+    Batch endpoint: /dashboard-kpis/{dashboard_id}?tabs=sales&tabs=supply
+    Returns {tab: charts} for the requested tabs, or for every tab of the
+    dashboard when `tabs` is omitted. Tabs that apply the same filters are
+    computed from one shared scan instead of one scan per tab. `charts`
+    limits every tab to the given chart ids. `top_n`, `max_points`,
+    `budget_ms` and `profile` work as on /dashboard-tab-kpis, as do
+    conditional requests, coalescing, admission, Server-Timing and /metrics
+    (tab label: the sorted tabs joined with ",").
+    """
+    timings = start_timings()
+    deadline = _deadline(budget_ms)
+    if dashboard_id not in DASHBOARD_TABS:
+        raise HTTPException(404, "Dashboard not found or not supported.")
+    tabs = list(dict.fromkeys(tabs)) if tabs else DASHBOARD_TABS[dashboard_id]
+    unknown = [tab for tab in tabs if tab not in DASHBOARD_TABS[dashboard_id]]
+    if unknown:
+        raise HTTPException(404, f"Tab not found for this dashboard: {', '.join(unknown)}")
+    versions = _data_versions(db, dashboard_id)
+    headers = cache_validators(versions, str(sorted(request.query_params.multi_items()))) if versions and not profile else None
+    if headers and is_not_modified(request.headers, headers):
+        return Response(status_code=304, headers=headers)
+
+    filters = {
+        "country": country, "region": region, "oem_name": oem_name, "dealer_name": dealer_name,
+        "city": city, "customer_type": customer_type, "brand": brand, "category": category,
+    }
+    charts = _chart_ids(charts)
+    limits = {"top_n": top_n, "max_points": max_points}
+    key = _flight_key(dashboard_id, tuple(tabs), budget_ms, profile, filters=filters, charts=charts, limits=limits, versions=versions)
+    cost = _estimated_cost(dashboard_id, tabs, filters, versions)
+    try:
+        with _profiling(profile):
+            body, timed_out = await dashboard_flights.run(key, _admitted, cost, _run_encoded, _batch_kpis, dashboard_id, tabs, filters, charts, limits, deadline)
+    except UnknownChartError as e:
+        raise HTTPException(400, str(e))
+    except AdmissionRejected as e:
+        raise HTTPException(429, str(e), headers={"Retry-After": str(e.retry_after)})
+    timings.observe(dashboard_id, ",".join(sorted(tabs)))
+    return ChartJSONResponse(body, headers=_with_timing(_response_headers(headers, timed_out, profile), timings))
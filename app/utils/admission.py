@@ -0,0 +1,121 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import deque
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when the wait queue is full; `retry_after` is a hint in seconds.
+    """
+    def __init__(self, retry_after: int):
+        super().__init__(f"Too many dashboard computations queued; retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Limits how many computations run at once and how many of them are heavy.
+    Jobs that cannot start yet wait in a priority queue where cheap jobs go
+    before heavy ones (FIFO within each class), so a burst of full scans
+    cannot hold back filtered requests. A heavy job blocked by the heavy cap
+    does not block cheap jobs queued behind it. When the queue is full new
+    jobs are rejected right away with a Retry-After hint.
+    Must be used from a single event loop.
+    """
+
+    def __init__(self, max_running: int, max_heavy: int, max_queued: int, heavy_cost: float):
+        self.max_running = max_running
+        self.max_heavy = max_heavy
+        self.max_queued = max_queued
+        self.heavy_cost = heavy_cost
+        self.running = 0
+        self.running_heavy = 0
+        self._waiting = []
+        self._seq = itertools.count()
+        # Recent run times, used to estimate Retry-After
+        self._durations = deque(maxlen=50)
+        self.stats = {"admitted": 0, "queued": 0, "rejected": 0}
+
+    def is_heavy(self, cost: float) -> bool:
+        return cost >= self.heavy_cost
+
+    def _can_start(self, heavy: bool) -> bool:
+        return self.running < self.max_running and (not heavy or self.running_heavy < self.max_heavy)
+
+    def _start(self, heavy: bool):
+        self.running += 1
+        if heavy:
+            self.running_heavy += 1
+        self.stats["admitted"] += 1
+
+    def _dispatch(self):
+        blocked = []
+        while self._waiting and self.running < self.max_running:
+            entry = heapq.heappop(self._waiting)
+            heavy, _, future = entry
+            if future.done():
+                continue  # the caller gave up while waiting
+            if not self._can_start(heavy):
+                blocked.append(entry)
+                continue
+            self._start(heavy)
+            future.set_result(None)
+        for entry in blocked:
+            heapq.heappush(self._waiting, entry)
+
+    def retry_after(self) -> int:
+        """
+        Seconds until a queue slot is likely to free up: the queued work
+        spread over the running slots, at the recent average run time.
+        """
+        average = sum(self._durations) / len(self._durations) if self._durations else 1.0
+        return max(1, math.ceil(average * (len(self._waiting) + 1) / self.max_running))
+
+    async def acquire(self, cost: float):
+        """
+        Waits for a slot for a job of the given estimated cost and returns a
+        token for release(). Raises AdmissionRejected when the queue is full.
+        """
+        heavy = self.is_heavy(cost)
+        if not self._waiting and self._can_start(heavy):
+            self._start(heavy)
+            return heavy, time.monotonic()
+        if len(self._waiting) >= self.max_queued:
+            self.stats["rejected"] += 1
+            raise AdmissionRejected(self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (heavy, next(self._seq), future)
+        heapq.heappush(self._waiting, entry)
+        self.stats["queued"] += 1
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just as the caller went away: hand the slot back
+                self.release((heavy, time.monotonic()))
+            elif entry in self._waiting:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+            raise
+        return heavy, time.monotonic()
+
+    def release(self, token):
+        heavy, started = token
+        self.running -= 1
+        if heavy:
+            self.running_heavy -= 1
+        self._durations.append(time.monotonic() - started)
+        self._dispatch()
+
+    def snapshot(self):
+        return {
+            **self.stats,
+            "running": self.running,
+            "running_heavy": self.running_heavy,
+            "waiting": len(self._waiting),
+        }
@@ -0,0 +1,227 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import stream_partitions
+from app.utils.profiling import current_session
+from app.utils.timing import phase
+from app.utils.charts import TIMED_OUT, chart_columns, collect_results, deadline_passed, feed_rows, feed_rows_profiled, iter_results
+
+# Process pool shared by every request; created on first parallel aggregation
+_executor = None
+
+
+def _worker_count():
+    workers = settings.AGGREGATION_WORKERS
+    if workers < 0:
+        workers = os.cpu_count() or 1
+    return workers
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=_worker_count())
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def select_chart_columns(table, chart_classes, extra_columns=()):
+    """
+    Builds a select projected to the columns the given charts read.
+    Columns the table does not have are skipped, so charts fall back to their
+    .get() defaults exactly as they did with a full-row select.
+    Returns None when the charts read no columns at all.
+    """
+    names = chart_columns(chart_classes)
+    if not names:
+        return None
+    names += [c for c in extra_columns if c not in names]
+    columns = [table.c[name] for name in names if name in table.c]
+    if not columns:
+        return select(table)
+    return select(*columns)
+
+
+def _aggregate_shard(chart_classes, keys, values, start=0):
+    """
+    Worker entry point: runs fresh accumulators over one shard of rows, the
+    first at position `start` of the scan, and returns the partial
+    aggregates for merging in the parent process.
+    """
+    accumulators = [cls() for cls in chart_classes]
+    rows = (dict(zip(keys, row)) for row in values)
+    errors = feed_rows(accumulators, rows, start=start)
+    return accumulators, errors
+
+
+def _filter_partitions(partitions, row_filter):
+    for partition in partitions:
+        yield [r for r in partition if row_filter(r)]
+
+
+def _time_out(accumulators, errors, partitions, pending=()):
+    """
+    Abandons a scan that ran past its deadline: pending shards are cancelled,
+    the source cursor is closed and every chart reading from the scan is
+    marked as timed out.
+    """
+    for future in pending:
+        future.cancel()
+    close = getattr(partitions, "close", None)
+    if close is not None:
+        close()
+    for i, acc in enumerate(accumulators):
+        if acc.columns:
+            errors.setdefault(i, TIMED_OUT)
+    return accumulators, errors
+
+
+def run_accumulators(chart_classes, partitions, row_filter=None, deadline=None):
+    """
+    Feeds a stream of row partitions to fresh accumulators for chart_classes
+    and returns (accumulators, errors).
+
+    Partitions are aggregated in-process until AGGREGATION_PARALLEL_MIN_ROWS
+    rows have been seen. If the scan is larger and AGGREGATION_WORKERS is set,
+    the remaining partitions are shipped to a process pool as shards (column
+    keys plus row tuples), aggregated there, and the partial aggregates merged
+    back in submission order, so the output matches the single-process result.
+
+    With a `deadline` (time.monotonic() value) the scan is checked between
+    partitions and abandoned once it is passed; its charts come back as
+    TIMED_OUT in `errors`.
+
+    Profiled requests (see app.utils.profiling) are aggregated in-process,
+    chart by chart, so each chart's cost can be measured.
+    """
+    source = partitions
+    if row_filter is not None:
+        partitions = _filter_partitions(partitions, row_filter)
+    partitions = iter(partitions)
+
+    accumulators = [cls() for cls in chart_classes]
+    errors = {}
+    session = current_session()
+    workers = 0 if session is not None else _worker_count()
+    seen = 0
+    for partition in partitions:
+        with phase("aggregation"):
+            if session is None:
+                feed_rows(accumulators, partition, errors, seen)
+            else:
+                feed_rows_profiled(accumulators, partition, errors, session, seen)
+        seen += len(partition)
+        if deadline_passed(deadline):
+            return _time_out(accumulators, errors, source)
+        if workers and seen >= settings.AGGREGATION_PARALLEL_MIN_ROWS:
+            break
+    else:
+        return accumulators, errors
+
+    executor = get_executor()
+    # Bound the shards in flight so memory stays proportional to the pool size
+    max_pending = workers * 2
+    pending = deque()
+
+    def merge_oldest():
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        with phase("aggregation"):
+            partials, shard_errors = pending[0].result(timeout)
+            pending.popleft()
+            for acc, partial in zip(accumulators, partials):
+                acc.merge(partial)
+            errors.update(shard_errors)
+
+    try:
+        for partition in partitions:
+            if deadline_passed(deadline):
+                return _time_out(accumulators, errors, source, pending)
+            if not partition:
+                continue
+            keys = list(partition[0].keys())
+            values = [tuple(r.values()) for r in partition]
+            pending.append(executor.submit(_aggregate_shard, chart_classes, keys, values, seen))
+            seen += len(partition)
+            if len(pending) >= max_pending:
+                merge_oldest()
+        while pending:
+            merge_oldest()
+    except FutureTimeout:
+        return _time_out(accumulators, errors, source, pending)
+    return accumulators, errors
+
+
+def _scan(db, table, chart_classes, where=(), row_filter=None, extra_columns=(), deadline=None):
+    if deadline_passed(deadline):
+        # Out of time before the query started (e.g. while queued for admission)
+        return _time_out([cls() for cls in chart_classes], {}, None)
+    query = select_chart_columns(table, chart_classes, extra_columns)
+    if query is None:
+        partitions = []
+    else:
+        for clause in where:
+            query = query.where(clause)
+        partitions = stream_partitions(db, query)
+    return run_accumulators(chart_classes, partitions, row_filter, deadline)
+
+
+def aggregate_table(db, table, chart_classes, where=(), row_filter=None, extra_columns=(), limits=None, stream=False, deadline=None):
+    """
+    Streams the rows of `table` matching the `where` clauses, projected to the
+    columns the charts read, through the chart accumulators. Charts that read
+    no columns are served without touching the database.
+    With `stream` a lazy iterator of charts is returned instead of a list
+    (see iter_table). Charts not finished by `deadline` are returned as
+    {id, status: "timeout"} placeholders and the rest of the scan is dropped.
+    """
+    if stream:
+        return iter_table(db, table, chart_classes, where, row_filter, extra_columns, limits, deadline)
+    return aggregate_tabs(db, table, {None: chart_classes}, where, row_filter, extra_columns, limits, deadline)[None]
+
+
+def iter_table(db, table, chart_classes, where=(), row_filter=None, extra_columns=(), limits=None, deadline=None):
+    """
+    Lazy form of aggregate_table for streamed responses. Nothing is queried
+    until the first chart is requested; charts that read no columns are
+    yielded before the scan, the rest are built and yielded one at a time
+    once it completes, so no full payload is ever held in memory.
+    """
+    scanned = [i for i, cls in enumerate(chart_classes) if cls.columns]
+    for i, cls in enumerate(chart_classes):
+        if not cls.columns:
+            yield from iter_results([cls()], {}, i, limits, deadline)
+    if not scanned:
+        return
+    accumulators, errors = _scan(db, table, [chart_classes[i] for i in scanned], where, row_filter, extra_columns, deadline)
+    yield from iter_results(accumulators, errors, 0, limits, deadline)
+
+
+def aggregate_tabs(db, table, tabs, where=(), row_filter=None, extra_columns=(), limits=None, deadline=None):
+    """
+    Serves several tabs from one projected scan: the charts of every tab in
+    `tabs` (tab -> chart classes) are fed from a single query over the union
+    of their columns, then split back into per-tab payloads.
+    `limits` ({"top_n": ..., "max_points": ...}) bounds the chart outputs and
+    `deadline` bounds the time spent (see aggregate_table).
+    """
+    chart_classes = [cls for classes in tabs.values() for cls in classes]
+    accumulators, errors = _scan(db, table, chart_classes, where, row_filter, extra_columns, deadline)
+
+    payloads = {}
+    offset = 0
+    with phase("aggregation"):
+        for tab, classes in tabs.items():
+            payloads[tab] = collect_results(accumulators[offset:offset + len(classes)], errors, offset, limits, deadline)
+            offset += len(classes)
+    return payloads
@@ -0,0 +1,497 @@
+from collections import defaultdict
+from datetime import datetime
+
+from app.utils.charts import ChartAccumulator, fold_top_n, tab_chart
+
+# Charts behind the fixed auto_mobile tabs (sales, supply, customer).
+# Each chart is its own accumulator so the tabs can be streamed, merged
+# across worker processes and projected down to the columns they read.
+
+sales_chart = tab_chart("auto_mobile", "sales")
+supply_chart = tab_chart("auto_mobile", "supply")
+customer_chart = tab_chart("auto_mobile", "customer")
+
+
+def _final_price(r):
+    final_price_str = r.get("final_price_after_discount")
+    try:
+        return float(final_price_str) if final_price_str is not None else 0.0
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def _sale_date(r):
+    sale_date_str = r.get("sale_date")
+    if not sale_date_str:
+        return None
+    try:
+        if isinstance(sale_date_str, str):
+            return datetime.strptime(sale_date_str.split(" ")[0], "%Y-%m-%d")
+        elif isinstance(sale_date_str, datetime):
+            return sale_date_str
+    except ValueError:
+        pass
+    return None  # Handle cases where it's not a string or datetime
+
+
+# --- Sales performance ---
+
+@sales_chart
+class chart_total_units_sold(ChartAccumulator):
+    id = "total_units_sold"
+    columns = ("units_sold",)
+
+    def __init__(self):
+        self.total_units_sold = 0
+
+    def add(self, r):
+        self.total_units_sold += r.get("units_sold", 0)
+
+    def result(self):
+        return {"id": "total_units_sold", "xKey": "total_units_sold", "x-axis": ["value"], "y-axis": [{"metric": "Total Units Sold", "value": self.total_units_sold}]}
+
+@sales_chart
+class chart_average_selling_price(ChartAccumulator):
+    id = "average_selling_price"
+    columns = ("units_sold", "final_price_after_discount")
+
+    def __init__(self):
+        self.total_units_sold = 0
+        self.total_revenue = 0
+
+    def add(self, r):
+        units = r.get("units_sold", 0)
+        self.total_units_sold += units
+        self.total_revenue += (_final_price(r) * units)
+
+    def result(self):
+        average_selling_price = self.total_revenue / self.total_units_sold if self.total_units_sold > 0 else 0.0
+        return {"id": "average_selling_price", "xKey": "average_selling_price", "x-axis": ["value"], "y-axis": [{"metric": "Average Selling Price", "value": round(average_selling_price, 2)}]}
+
+@sales_chart
+class chart_market_share_by_oem(ChartAccumulator):
+    id = "market_share_by_oem"
+    columns = ("units_sold", "oem_name")
+
+    def __init__(self):
+        self.total_units_sold = 0
+        self.oem_units_sold = defaultdict(int)
+
+    def add(self, r):
+        units = r.get("units_sold", 0)
+        oem = r.get("oem_name")
+        self.total_units_sold += units
+        if oem:
+            self.oem_units_sold[oem] += units
+
+    def result(self):
+        oem_units_sold, = fold_top_n(self.top_n, self.oem_units_sold)
+        market_share_by_oem = []
+        if self.total_units_sold > 0:
+            for oem, units in oem_units_sold.items():
+                market_share_by_oem.append({
+                    "oem": oem,
+                    "units_sold": units,
+                    "market_share_percent": round((units / self.total_units_sold) * 100, 2)
+                })
+        market_share_by_oem = sorted(market_share_by_oem, key=lambda x: x["market_share_percent"], reverse=True)
+        return {"id": "market_share_by_oem", "xKey": "oem", "x-axis": ["market_share_percent"], "y-axis": market_share_by_oem}
+
+@sales_chart
+class chart_market_share_by_competitor_oem(ChartAccumulator):
+    id = "market_share_by_competitor_oem"
+    columns = ("units_sold", "competitor_oem")
+
+    def __init__(self):
+        self.competitor_units_sold = defaultdict(int)
+
+    def add(self, r):
+        units = r.get("units_sold", 0)
+        competitor = r.get("competitor_oem")
+        if competitor:
+            self.competitor_units_sold[competitor] += units
+
+    def result(self):
+        total_competitor_units_sold = sum(self.competitor_units_sold.values())
+        competitor_units_sold, = fold_top_n(self.top_n, self.competitor_units_sold)
+        market_share_by_competitor_oem = []
+        if total_competitor_units_sold > 0:
+            for comp, units in competitor_units_sold.items():
+                market_share_by_competitor_oem.append({
+                    "competitor_oem": comp,
+                    "units_sold": units,
+                    "market_share_percent": round((units / total_competitor_units_sold) * 100, 2)
+                })
+        market_share_by_competitor_oem = sorted(market_share_by_competitor_oem, key=lambda x: x["market_share_percent"], reverse=True)
+        return {"id": "market_share_by_competitor_oem", "xKey": "competitor_oem", "x-axis": ["market_share_percent"], "y-axis": market_share_by_competitor_oem}
+
+@sales_chart
+class chart_yoy_sales_units(ChartAccumulator):
+    id = "yoy_sales_units"
+    columns = ("units_sold", "sale_date")
+
+    def __init__(self):
+        self.sales_by_year = defaultdict(int)
+
+    def add(self, r):
+        units = r.get("units_sold", 0)
+        date_obj = _sale_date(r)
+        if date_obj:
+            self.sales_by_year[date_obj.year] += units
+
+    def result(self):
+        return {"id": "yoy_sales_units", "xKey": "year", "x-axis": ["units"], "y-axis": [{"year": str(k), "units": v} for k, v in self.sales_by_year.items()]}
+
+@sales_chart
+class chart_customer_type_sales(ChartAccumulator):
+    id = "customer_type_sales"
+    columns = ("units_sold", "exchange_vehicle_offered")
+
+    def __init__(self):
+        self.customer_type_sales = defaultdict(int)
+
+    def add(self, r):
+        units = r.get("units_sold", 0)
+        exchange_offered = str(r.get("exchange_vehicle_offered", "")).strip().lower()
+        if exchange_offered == "yes":
+            self.customer_type_sales["returning"] += units
+        elif exchange_offered == "no":
+            self.customer_type_sales["new"] += units
+
+    def result(self):
+        return {"id": "customer_type_sales", "xKey": "customer_type", "x-axis": ["units_sold"], "y-axis": [{"customer_type": k, "units_sold": v} for k, v in self.customer_type_sales.items()]}
+
+@sales_chart
+class chart_channel_sales(ChartAccumulator):
+    id = "channel_sales"
+    columns = ("units_sold", "lead_source", "customer_type")
+
+    def __init__(self):
+        self.channel_sales = defaultdict(int)
+
+    def add(self, r):
+        units = r.get("units_sold", 0)
+        lead_source = str(r.get("lead_source", "")).strip().lower()
+        cust_type_raw = str(r.get("customer_type", "")).strip().lower()
+        if cust_type_raw == "fleet":
+            self.channel_sales["fleet"] += units
+        elif lead_source in {"digital", "website", "online"}:
+            self.channel_sales["online"] += units
+        else:
+            self.channel_sales["dealership"] += units
+
+    def result(self):
+        return {"id": self.id, "xKey": "channel", "x-axis": ["units_sold"], "y-axis": [{"channel": k, "units_sold": v} for k, v in self.channel_sales.items()]}
+
+@sales_chart
+class chart_asp_by_vehicle_segment(ChartAccumulator):
+    id = "asp_by_vehicle_segment"
+    columns = ("units_sold", "final_price_after_discount", "vehicle_segment")
+
+    def __init__(self):
+        self.total_price = defaultdict(float)
+        self.units = defaultdict(int)
+
+    def add(self, r):
+        units = r.get("units_sold", 0)
+        vehicle_segment = r.get("vehicle_segment")
+        if vehicle_segment:
+            self.total_price[vehicle_segment] += _final_price(r) * units
+            self.units[vehicle_segment] += units
+
+    def result(self):
+        units_by_segment, total_price = fold_top_n(self.top_n, self.units, self.total_price)
+        asp_by_segment_data = []
+        for segment, units in units_by_segment.items():
+            avg_price = total_price[segment] / units if units > 0 else 0.0
+            asp_by_segment_data.append({"segment": segment, "average_price": round(avg_price, 2)})
+        return {"id": "asp_by_vehicle_segment", "xKey": "segment", "x-axis": ["average_price"], "y-axis": asp_by_segment_data}
+
+@sales_chart
+class chart_yoy_sales_growth_percent(ChartAccumulator):
+    id = "yoy_sales_growth_percent"
+    columns = ("units_sold", "sale_date")
+
+    def __init__(self):
+        self.sales_by_month_year = defaultdict(int)
+
+    def add(self, r):
+        date_obj = _sale_date(r)
+        if date_obj:
+            self.sales_by_month_year[date_obj.strftime("%Y-%m")] += r.get("units_sold", 0)
+
+    def result(self):
+        sales_by_month_year = self.sales_by_month_year
+        sorted_month_years = sorted(sales_by_month_year.keys())
+        yoy_growth_data = []
+        if len(sorted_month_years) > 12: # Need at least two years of data for YoY comparison
+            for i in range(12, len(sorted_month_years)):
+                prev_year_month = sorted_month_years[i-12]
+                current_year_month = sorted_month_years[i]
+                prev_sales = sales_by_month_year.get(prev_year_month, 0)
+                current_sales = sales_by_month_year.get(current_year_month, 0)
+                growth_percent = round(((current_sales - prev_sales) / prev_sales) * 100, 2) if prev_sales else 0.0
+                year = current_year_month[:4]
+                month = current_year_month[5:]
+                yoy_growth_data.append({"period": f"{year}-{month}", "growth_percent": growth_percent})
+        if not yoy_growth_data:
+            return None
+        return {"id": "yoy_sales_growth_percent", "xKey": "period", "x-axis": ["growth_percent"], "y-axis": yoy_growth_data}
+
+@sales_chart
+class chart_channel_contribution(chart_channel_sales):
+    id = "channel_contribution"
+
+    def result(self):
+        if not self.channel_sales:
+            return None
+        return super().result()
+
+@sales_chart
+class chart_sales_trend_by_oem(ChartAccumulator):
+    id = "sales_trend_by_oem"
+    columns = ("units_sold", "sale_date", "oem_name")
+
+    def __init__(self):
+        self.sales_by_oem_year_month = defaultdict(int)
+
+    def add(self, r):
+        oem = r.get("oem_name")
+        date_obj = _sale_date(r)
+        if date_obj and oem:
+            self.sales_by_oem_year_month[(oem, date_obj.strftime("%Y-%m"))] += r.get("units_sold", 0)
+
+    def result(self):
+        oem_sales = defaultdict(int)
+        for (oem, _), units in self.sales_by_oem_year_month.items():
+            oem_sales[oem] += units
+        _, sales_by_oem_year_month = fold_top_n(self.top_n, oem_sales, self.sales_by_oem_year_month, at=0)
+        sales_trend_by_oem_data = []
+        oems = dict.fromkeys(oem for oem, _ in sales_by_oem_year_month)
+        all_months = sorted({month for _, month in sales_by_oem_year_month})
+        for oem in oems:
+            series_data = [{"month": m, "sales": sales_by_oem_year_month.get((oem, m), 0)} for m in all_months]
+            sales_trend_by_oem_data.append({"oem": oem, "series": series_data})
+        if not sales_trend_by_oem_data:
+            return None
+        return {"id": "sales_trend_by_oem", "xKey": "month", "y-axis": "sales", "seriesKey": "oem", "data": sales_trend_by_oem_data}
+
+
+# --- Supply chain & after-sales ---
+
+@supply_chart
+class chart_average_delivery_time_days(ChartAccumulator):
+    id = "average_delivery_time_days"
+    columns = ("booking_date", "delivery_date")
+
+    def __init__(self):
+        self.delay_total = 0
+        self.delay_count = 0
+
+    def add(self, r):
+        booking_date = r.get("booking_date")
+        delivery_date = r.get("delivery_date")
+        if booking_date and delivery_date and isinstance(booking_date, datetime) and isinstance(delivery_date, datetime):
+            self.delay_total += (delivery_date - booking_date).days
+            self.delay_count += 1
+
+    def result(self):
+        avg_delivery_time_days = round(self.delay_total / self.delay_count, 2) if self.delay_count else 0
+        return {
+            "id": "average_delivery_time_days",
+            "xKey": "average_delivery_time_days",
+            "x-axis": ["average_delivery_time_days"],
+            "y-axis": [{"average_delivery_time_days": avg_delivery_time_days}]
+        }
+
+@supply_chart
+class chart_average_delivery_rating_by_dealer(ChartAccumulator):
+    id = "average_delivery_rating_by_dealer"
+    columns = ("dealer_name", "delivery_rating_15")
+
+    def __init__(self):
+        self.rating_total = defaultdict(int)
+        self.rating_count = defaultdict(int)
+
+    def add(self, r):
+        dealer = r.get("dealer_name")
+        delivery_rating = r.get("delivery_rating_15")
+        if dealer and delivery_rating is not None:
+            self.rating_total[dealer] += delivery_rating
+            self.rating_count[dealer] += 1
+
+    def result(self):
+        rating_count, rating_total = fold_top_n(self.top_n, self.rating_count, self.rating_total)
+        avg_delivery_rating_by_dealer = [
+            {"dealer_name": dealer, "avg_rating": round(rating_total[dealer] / count, 2)}
+            for dealer, count in rating_count.items() if count
+        ]
+        return {
+            "id": "average_delivery_rating_by_dealer",
+            "xKey": "dealer_name",
+            "x-axis": ["avg_rating"],
+            "y-axis": avg_delivery_rating_by_dealer
+        }
+
+@supply_chart
+class chart_complaint_count_by_dealer(ChartAccumulator):
+    id = "complaint_count_by_dealer"
+    columns = ("dealer_name", "complaint_registered_yn")
+
+    def __init__(self):
+        self.dealer_complaints = defaultdict(int)
+
+    def add(self, r):
+        dealer = r.get("dealer_name")
+        complaint_registered = r.get("complaint_registered_yn", "").lower()
+        if dealer and complaint_registered == "yes":
+            self.dealer_complaints[dealer] += 1
+
+    def result(self):
+        dealer_complaints, = fold_top_n(self.top_n, self.dealer_complaints)
+        complaint_count_by_dealer = [
+            {"dealer_name": dealer, "complaint_count": count}
+            for dealer, count in dealer_complaints.items()
+        ]
+        return {
+            "id": "complaint_count_by_dealer",
+            "xKey": "dealer_name",
+            "x-axis": ["complaint_count"],
+            "y-axis": complaint_count_by_dealer
+        }
+
+
+# --- Customer insights & sustainability ---
+
+@customer_chart
+class chart_average_nps_by_city(ChartAccumulator):
+    id = "average_nps_by_city"
+    columns = ("city", "nps_customer_feedback")
+
+    def __init__(self):
+        self.nps_total = defaultdict(int)
+        self.nps_count = defaultdict(int)
+
+    def add(self, r):
+        nps = r.get("nps_customer_feedback")
+        city_name = r.get("city")
+        if city_name and nps is not None:
+            self.nps_total[city_name] += nps
+            self.nps_count[city_name] += 1
+
+    def result(self):
+        nps_count, nps_total = fold_top_n(self.top_n, self.nps_count, self.nps_total)
+        avg_nps_by_city = [
+            {"city": city_name, "average_nps": round(nps_total[city_name] / count, 2)}
+            for city_name, count in nps_count.items() if count
+        ]
+        return {
+            "id": "average_nps_by_city",
+            "xKey": "city",
+            "x-axis": ["average_nps"],
+            "y-axis": avg_nps_by_city
+        }
+
+@customer_chart
+class chart_electric_vehicle_share_percent(ChartAccumulator):
+    id = "electric_vehicle_share_percent"
+    columns = ("fuel_type", "units_sold")
+
+    def __init__(self):
+        self.electric_vehicle_units = 0
+        self.total_units_overall = 0
+
+    def add(self, r):
+        fuel_type = r.get("fuel_type", "").lower()
+        units = r.get("units_sold", 0)
+        self.total_units_overall += units
+        if "electric" in fuel_type:
+            self.electric_vehicle_units += units
+
+    def result(self):
+        ev_share_percent = round((self.electric_vehicle_units / self.total_units_overall * 100), 2) if self.total_units_overall > 0 else 0.0
+        return {
+            "id": "electric_vehicle_share_percent",
+            "xKey": "electric_vehicle_share_percent",
+            "x-axis": ["electric_vehicle_share_percent"],
+            "y-axis": [{"electric_vehicle_share_percent": ev_share_percent}]
+        }
+
+@customer_chart
+class chart_average_ev_metrics_by_oem(ChartAccumulator):
+    id = "average_ev_metrics_by_oem"
+    columns = ("fuel_type", "oem_name", "range_km", "battery_capacity_kwh", "charging_time_hours")
+
+    def __init__(self):
+        # (oem, metric) -> running sum / count
+        self.metric_total = defaultdict(float)
+        self.metric_count = defaultdict(int)
+
+    def add(self, r):
+        fuel_type = r.get("fuel_type", "").lower()
+        oem = r.get("oem_name")
+        if "electric" in fuel_type and oem:
+            for metric, column in (("range_km", "range_km"), ("battery_kwh", "battery_capacity_kwh"), ("charging_time_hours", "charging_time_hours")):
+                value = r.get(column)
+                if value is not None:
+                    self.metric_total[(oem, metric)] += value
+                    self.metric_count[(oem, metric)] += 1
+
+    @staticmethod
+    def _avg(metric_total, metric_count, oem, metric):
+        count = metric_count.get((oem, metric), 0)
+        return round(metric_total[(oem, metric)] / count, 2) if count else 0
+
+    def result(self):
+        oem_count = defaultdict(int)
+        for (oem, _), count in self.metric_count.items():
+            oem_count[oem] += count
+        _, metric_total, metric_count = fold_top_n(self.top_n, oem_count, self.metric_total, self.metric_count, at=0)
+        avg_ev_metrics = []
+        for oem in dict.fromkeys(oem for oem, _ in metric_count):
+            avg_ev_metrics.append({
+                "oem": oem,
+                "avg_range_km": self._avg(metric_total, metric_count, oem, "range_km"),
+                "avg_battery_kwh": self._avg(metric_total, metric_count, oem, "battery_kwh"),
+                "avg_charging_time_hours": self._avg(metric_total, metric_count, oem, "charging_time_hours")
+            })
+        return {
+            "id": "average_ev_metrics_by_oem",
+            "xKey": "oem",
+            "x-axis": ["avg_range_km", "avg_battery_kwh", "avg_charging_time_hours"],
+            "y-axis": avg_ev_metrics
+        }
+
+@customer_chart
+class chart_finance_opted_ratio_by_customer_type(ChartAccumulator):
+    id = "finance_opted_ratio_by_customer_type"
+    columns = ("customer_type", "finance_opted_yesno")
+
+    def __init__(self):
+        self.finance_yes = defaultdict(int)
+        self.total = defaultdict(int)
+
+    def add(self, r):
+        cust_type = r.get("customer_type")
+        finance_opted_yn = r.get("finance_opted_yesno", "").lower()
+        if cust_type:
+            self.total[cust_type] += 1
+            if finance_opted_yn == "yes":
+                self.finance_yes[cust_type] += 1
+
+    def result(self):
+        totals, finance_yes = fold_top_n(self.top_n, self.total, self.finance_yes)
+        finance_opted_ratio_by_customer_type = []
+        for cust_type, total in totals.items():
+            yes = finance_yes.get(cust_type, 0)
+            ratio = round((yes / total * 100), 2) if total > 0 else 0.0
+            finance_opted_ratio_by_customer_type.append({
+                "customer_type": cust_type,
+                "finance_opted_percent": ratio
+            })
+        return {
+            "id": "finance_opted_ratio_by_customer_type",
+            "xKey": "customer_type",
+            "x-axis": ["finance_opted_percent"],
+            "y-axis": finance_opted_ratio_by_customer_type
+        }
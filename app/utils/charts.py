@@ -1,385 +1,859 @@
+import heapq
+import time
 from collections import defaultdict
+from operator import itemgetter
 
-chart_functions = []
+from app.utils.profiling import count_points, current_session, measure, record_profile
+
+# Output budgets; requests can lower or raise them per call (see collect_results)
+DEFAULT_TOP_N = 50          # named groups kept by categorical charts before "Other"
+DEFAULT_MAX_POINTS = 2000   # points returned by row-level scatter charts
+SAMPLE_CAPACITY = 10000     # points a scatter chart keeps while aggregating
+
+# (dashboard_id, tab) -> chart accumulator classes, in payload order
+tab_charts = defaultdict(list)
+
+def tab_chart(dashboard_id, tab):
+    def register(cls):
+        cls.registry = (dashboard_id, tab)
+        tab_charts[(dashboard_id, tab)].append(cls)
+        return cls
+    return register
+
+# The descriptive auto_mobile tab is the original chart_function registry
+chart_functions = tab_charts[("auto_mobile", "descriptive")]
+chart_function = tab_chart("auto_mobile", "descriptive")
+
+
+class UnknownChartError(ValueError):
+    """
+    Raised when a request names chart ids the selected tabs do not have.
+    """
+
+
+# Recorded in `errors` for charts whose data was not complete by the deadline
+TIMED_OUT = object()
+
+def deadline_passed(deadline):
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def select_tab_charts(dashboard_id, tabs, chart_ids=None):
+    """
+    Returns tab -> chart classes for the given tabs, restricted to chart_ids
+    (all charts when chart_ids is None) and kept in payload order.
+    """
+    selected = {tab: tab_charts.get((dashboard_id, tab), []) for tab in tabs}
+    if chart_ids is None:
+        return selected
+    known = {cls.id for classes in selected.values() for cls in classes}
+    unknown = [chart_id for chart_id in chart_ids if chart_id not in known]
+    if unknown:
+        raise UnknownChartError(
+            f"Unknown chart id(s) for {dashboard_id}/{', '.join(tabs)}: {', '.join(unknown)}. "
+            f"Available: {', '.join(sorted(known))}"
+        )
+    wanted = set(chart_ids)
+    return {tab: [cls for cls in classes if cls.id in wanted] for tab, classes in selected.items()}
+
+
+def chart_columns(chart_classes):
+    """
+    Ordered union of the source columns a set of charts reads.
+    """
+    columns = {}
+    for cls in chart_classes:
+        columns.update(dict.fromkeys(cls.columns))
+    return list(columns)
+
+
+def _merge_values(a, b):
+    """
+    Combines two partial aggregates of the same shape: numbers are added,
+    dicts are merged key by key and lists of points are concatenated.
+    """
+    if isinstance(a, PointSample):
+        return a.merge(b)
+    if isinstance(a, dict):
+        for k, v in b.items():
+            a[k] = _merge_values(a[k], v) if k in a else v
+        return a
+    if isinstance(a, list):
+        a.extend(b)
+        return a
+    return a + b
+
+
+def top_n_keys(weights, n):
+    """
+    Keys of the n heaviest groups, selected with a heap, or None when every
+    group fits in the budget. Ties keep the group seen first.
+    """
+    if n is None or len(weights) <= n:
+        return None
+    return {k for k, _ in heapq.nlargest(n, weights.items(), key=itemgetter(1))}
+
+
+def fold_top_n(n, weights, *groups, at=None, other="Other"):
+    """
+    Keeps the n heaviest categories of `weights` (see top_n_keys) and folds
+    the others into one `other` category in `weights` and every dict of
+    `groups`, by adding their values; sums and counts, and so the averages
+    built from them, stay exact for the folded tail. A real category named
+    like `other` is merged with the tail rather than listed twice. With
+    `at`, the dict keys of `groups` are tuples whose item `at` is the
+    category. Kept keys stay in their order and folded ones come last.
+    Returns the dicts (weights first), unchanged when every category fits.
+    """
+    keep = top_n_keys(weights, n)
+    if keep is None:
+        return (weights,) + groups
+
+    def fold(d, at):
+        kept, tail = {}, {}
+        for k, v in d.items():
+            category = k if at is None else k[at]
+            if category in keep:
+                kept[k] = v
+            else:
+                folded = other if at is None else k[:at] + (other,) + k[at + 1:]
+                tail[folded] = tail.get(folded, 0) + v
+        for k, v in tail.items():
+            kept[k] = kept.get(k, 0) + v
+        return kept
+
+    return (fold(weights, None),) + tuple(fold(d, at) for d in groups)
+
+
+_MASK64 = (1 << 64) - 1
+
+def _mix64(x):
+    """
+    splitmix64 finalizer: spreads consecutive integers over 64 bits.
+    """
+    x = (x + 0x9E3779B97F4A7C15) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+
+class PointSample:
+    """
+    Bounded, mergeable uniform sample of chart points (bottom-k sampling).
+    Each point gets a pseudo-random key hashed from the position of its row
+    in the scan, so every row is equally likely to be kept whatever its
+    values (identical points are independent), and only the `capacity`
+    smallest keys are kept. Shards are fed their global row positions, so
+    samples built on different shards merge into exactly the sample a single
+    pass would have kept.
+    """
+    def __init__(self, capacity=SAMPLE_CAPACITY):
+        self.capacity = capacity
+        self.seen = 0
+        self.heap = []  # (-key, position, point): the largest kept key sits on top
+
+    def add(self, point, position=None):
+        if position is None:
+            position = self.seen
+        self.seen += 1
+        # The position breaks ties, so points themselves are never compared
+        entry = (-_mix64(position), position, point)
+        if len(self.heap) < self.capacity:
+            heapq.heappush(self.heap, entry)
+        elif entry > self.heap[0]:
+            heapq.heapreplace(self.heap, entry)
+
+    def merge(self, other):
+        self.seen += other.seen
+        for entry in other.heap:
+            if len(self.heap) < self.capacity:
+                heapq.heappush(self.heap, entry)
+            elif entry > self.heap[0]:
+                heapq.heapreplace(self.heap, entry)
+        return self
+
+    def points(self, limit=None):
+        kept = heapq.nlargest(limit or len(self.heap), self.heap)
+        return [point for _, _, point in kept]
+
+
+class ChartAccumulator:
+    """
+    Single-pass chart aggregation.
+    Rows are fed one at a time through add(), partial accumulators built over
+    different slices of the data can be combined with merge(), and result()
+    builds the chart payload, or None when the chart should be omitted.
+    State only holds per-group sums and counts, so memory does not grow with
+    the number of rows. `columns` lists the source columns add() reads.
+    `top_n` and `max_points` bound the size of the payload result() builds
+    for charts with one entry per category or per row.
+    Every chart keyed by an uploaded column applies `top_n`; categories the
+    chart derives itself (a few fixed channels or customer kinds) and
+    calendar periods (years, months) are not bounded.
+    Charts that sample rows set `uses_row_position`; feed_rows() then sets
+    `row_position` to the position of the row being added.
+    """
+    id = None
+    columns = ()
+    top_n = DEFAULT_TOP_N
+    max_points = DEFAULT_MAX_POINTS
+    uses_row_position = False
+    row_position = None
+
+    def add(self, r):
+        raise NotImplementedError
+
+    def merge(self, other):
+        for name, value in vars(other).items():
+            if name == "row_position":
+                continue
+            setattr(self, name, _merge_values(getattr(self, name), value))
+        return self
+
+    def result(self):
+        raise NotImplementedError
+
+
+def sampled_chart(chart, sample, max_points):
+    """
+    Adds a sample's points as the chart's y-axis. When points were dropped,
+    `sampled_from` reports how many matched in total.
+    """
+    points = sample.points(min(max_points, sample.capacity))
+    chart["y-axis"] = points
+    if len(points) < sample.seen:
+        chart["sampled_from"] = sample.seen
+    return chart
+
+
+def feed_rows(accumulators, rows, errors=None, start=0):
+    """
+    Streams rows through every accumulator in one pass.
+    A chart that raises stops receiving rows; its error message is recorded
+    in `errors` keyed by the accumulator's position (chart ids can repeat when
+    several tabs share a scan) so the other charts can still be served.
+    Charts already in `errors` are skipped, so a stream can be fed in pieces;
+    `start` is the position of the first row in the whole scan.
+    """
+    if errors is None:
+        errors = {}
+    active = [(i, acc) for i, acc in enumerate(accumulators) if i not in errors]
+    positioned = [acc for _, acc in active if acc.uses_row_position]
+    for position, r in enumerate(rows, start):
+        for acc in positioned:
+            acc.row_position = position
+        failed = False
+        for i, acc in active:
+            try:
+                acc.add(r)
+            except Exception as e:
+                errors[i] = str(e)
+                failed = True
+        if failed:
+            active = [(i, acc) for i, acc in active if i not in errors]
+    return errors
+
+
+def feed_rows_profiled(accumulators, rows, errors, session, start=0):
+    """
+    feed_rows for profiled runs: the rows are fed chart by chart, which
+    gives the same result since accumulators are independent, so each
+    chart's time, rows and allocations can be measured on their own.
+    """
+    for i, acc in enumerate(accumulators):
+        if i in errors:
+            continue
+        profile = session.profile_for(acc)
+        fed = 0
+        with measure(profile):
+            try:
+                for position, r in enumerate(rows, start):
+                    acc.row_position = position
+                    acc.add(r)
+                    fed += 1
+            except Exception as e:
+                errors[i] = str(e)
+        profile.rows += fed
+    return errors
+
+
+def iter_results(accumulators, errors, offset=0, limits=None, deadline=None):
+    """
+    Yields the chart payloads one at a time, replacing failed charts with
+    {id, error} and charts not finished by `deadline` (a time.monotonic()
+    value) with {id, status: "timeout"}.
+    `offset` is the position of accumulators[0] in the list `errors` refers to.
+    `limits` overrides the top_n / max_points output budgets.
+    """
+    for i, acc in enumerate(accumulators, offset):
+        for name, value in (limits or {}).items():
+            if value is not None:
+                setattr(acc, name, value)
+        if errors.get(i) is TIMED_OUT or (i not in errors and deadline_passed(deadline)):
+            yield {"id": acc.id, "status": "timeout"}
+            continue
+        if i in errors:
+            yield {"id": acc.id, "error": errors[i]}
+            continue
+        session = current_session()
+        if session is None:
+            try:
+                chart = acc.result()
+            except Exception as e:
+                chart = {"id": acc.id, "error": str(e)}
+        else:
+            chart = _profiled_result(acc, session)
+        if chart is not None:
+            yield chart
+
+
+def _profiled_result(acc, session):
+    profile = session.profile_for(acc)
+    try:
+        with measure(profile):
+            chart = acc.result()
+    except Exception as e:
+        return {"id": acc.id, "error": str(e)}
+    if chart is not None:
+        profile.points = count_points(chart)
+        record_profile(acc, profile)
+        if session.attach:
+            chart["profile"] = profile.as_dict()
+    return chart
+
+
+def collect_results(accumulators, errors, offset=0, limits=None, deadline=None):
+    """
+    Builds the list of chart payloads (see iter_results).
+    """
+    return list(iter_results(accumulators, errors, offset, limits, deadline))
 
-def chart_function(fn):
-    chart_functions.append(fn)
-    return fn
 
 @chart_function
-def chart_monthly_sales_by_oem(rows):
-    monthly_sales = defaultdict(lambda: defaultdict(int))
-    for r in rows:
+class chart_monthly_sales_by_oem(ChartAccumulator):
+    id = "monthly_sales_by_oem"
+    columns = ("sale_date", "oem_name")
+
+    def __init__(self):
+        self.monthly_sales = defaultdict(int)
+
+    def add(self, r):
         sale_date = r.get("sale_date")
         oem = r.get("oem_name")
         if sale_date and oem:
             ym = sale_date.strftime("%Y-%m")
-            monthly_sales[ym][oem] += 1
-    months = sorted(monthly_sales.keys())
-    oems = sorted({oem for v in monthly_sales.values() for oem in v})
-    monthly_sales_data = []
-    for month in months:
-        row = {"month": month}
-        for oem in oems:
-            row[oem] = monthly_sales[month].get(oem, 0)
-        monthly_sales_data.append(row)
-    return {
-        "id": "monthly_sales_by_oem",
-        "xKey": "month",
-        "x-axis": oems,
-        "y-axis": monthly_sales_data
-    }
+            self.monthly_sales[(ym, oem)] += 1
+
+    def result(self):
+        oem_sales = defaultdict(int)
+        for (_, oem), n in self.monthly_sales.items():
+            oem_sales[oem] += n
+        oem_sales, monthly_sales = fold_top_n(self.top_n, oem_sales, self.monthly_sales, at=1)
+        months = sorted({ym for ym, _ in monthly_sales})
+        oems = sorted(oem for oem in oem_sales if oem != "Other") + (["Other"] if "Other" in oem_sales else [])
+        monthly_sales_data = []
+        for month in months:
+            row = {"month": month}
+            for oem in oems:
+                row[oem] = monthly_sales.get((month, oem), 0)
+            monthly_sales_data.append(row)
+        return {
+            "id": "monthly_sales_by_oem",
+            "xKey": "month",
+            "x-axis": oems,
+            "y-axis": monthly_sales_data
+        }
 
 @chart_function
-def chart_units_vs_price_by_region(rows):
-    units_vs_price = defaultdict(list)
-    for r in rows:
+class chart_units_vs_price_by_region(ChartAccumulator):
+    id = "units_vs_price_by_region"
+    columns = ("region", "units_sold", "final_price_after_discount", "final_price_after_discount_")
+
+    def __init__(self):
+        self.units = defaultdict(int)
+        self.price = defaultdict(float)
+        self.count = defaultdict(int)
+
+    def add(self, r):
         region = r.get("region")
         u = r.get("units_sold")
         fp = r.get("final_price_after_discount") or r.get("final_price_after_discount_")
         if region and u is not None and fp is not None:
-            units_vs_price[region].append({"units_sold": u, "final_price": fp})
-    regions = sorted(units_vs_price.keys())
-    units_vs_price_data = []
-    for region in regions:
-        region_data = units_vs_price[region]
-        avg_units = sum(d["units_sold"] for d in region_data) / len(region_data) if region_data else 0
-        avg_price = sum(d["final_price"] for d in region_data) / len(region_data) if region_data else 0
-        units_vs_price_data.append({
-            "region": region,
-            "avg_units_sold": avg_units,
-            "avg_final_price": avg_price
-        })
-    return {
-        "id": "units_vs_price_by_region",
-        "xKey": "region",
-        "x-axis": ["avg_units_sold", "avg_final_price"],
-        "y-axis": units_vs_price_data
-    }
+            self.units[region] += u
+            self.price[region] += fp
+            self.count[region] += 1
+
+    def result(self):
+        count, units, price = fold_top_n(self.top_n, self.count, self.units, self.price)
+        regions = sorted(region for region in count if region != "Other") + (["Other"] if "Other" in count else [])
+        units_vs_price_data = []
+        for region in regions:
+            n = count[region]
+            units_vs_price_data.append({
+                "region": region,
+                "avg_units_sold": units[region] / n if n else 0,
+                "avg_final_price": price[region] / n if n else 0
+            })
+        return {
+            "id": "units_vs_price_by_region",
+            "xKey": "region",
+            "x-axis": ["avg_units_sold", "avg_final_price"],
+            "y-axis": units_vs_price_data
+        }
 
 @chart_function
-def chart_nps_by_city(rows):
-    city_scores = defaultdict(list)
-    for r in rows:
+class chart_nps_by_city(ChartAccumulator):
+    id = "nps_by_city"
+    columns = ("city", "nps_customer_feedback")
+
+    def __init__(self):
+        self.nps_total = defaultdict(int)
+        self.count = defaultdict(int)
+
+    def add(self, r):
         city = r.get("city")
         nps  = r.get("nps_customer_feedback")
         if city and nps is not None:
-            city_scores[city].append(nps)
-    nps_by_city_data = []
-    for city, vals in city_scores.items():
-        if len(vals) >= 3:
-            nps_by_city_data.append({
-                "city": city,
-                "avg_nps": sum(vals) / len(vals)
-            })
-    return {
-        "id": "nps_by_city",
-        "xKey": "city",
-        "x-axis": ["avg_nps"],
-        "y-axis": nps_by_city_data
-    }
+            self.nps_total[city] += nps
+            self.count[city] += 1
+
+    def result(self):
+        eligible = {city: n for city, n in self.count.items() if n >= 3}
+        eligible, nps_total = fold_top_n(self.top_n, eligible, {city: self.nps_total[city] for city in eligible})
+        nps_by_city_data = [
+            {"city": city, "avg_nps": nps_total[city] / n}
+            for city, n in eligible.items()
+        ]
+        return {
+            "id": "nps_by_city",
+            "xKey": "city",
+            "x-axis": ["avg_nps"],
+            "y-axis": nps_by_city_data
+        }
 
 @chart_function
-def chart_fuel_vs_transmission(rows):
-    fuel_trans = defaultdict(lambda: defaultdict(int))
-    for r in rows:
+class chart_fuel_vs_transmission(ChartAccumulator):
+    id = "fuel_vs_transmission"
+    columns = ("fuel_type", "transmission_type", "units_sold")
+
+    def __init__(self):
+        self.fuel_trans = defaultdict(int)
+
+    def add(self, r):
         ft = r.get("fuel_type")
         tt = r.get("transmission_type")
         u = r.get("units_sold")
         if ft and tt and u is not None:
-            fuel_trans[ft][tt] += u
-    fuel_types = sorted(fuel_trans.keys())
-    transmissions = sorted({tt for v in fuel_trans.values() for tt in v})
-    fuel_vs_trans_data = []
-    for ft in fuel_types:
-        row = {"fuel_type": ft}
-        for tt in transmissions:
-            row[tt] = fuel_trans[ft].get(tt, 0)
-        fuel_vs_trans_data.append(row)
-    return {
-        "id": "fuel_vs_transmission",
-        "xKey": "fuel_type",
-        "x-axis": transmissions,
-        "y-axis": fuel_vs_trans_data
-    }
+            self.fuel_trans[(ft, tt)] += u
+
+    def result(self):
+        fuel_units, trans_units = defaultdict(int), defaultdict(int)
+        for (ft, tt), u in self.fuel_trans.items():
+            fuel_units[ft] += u
+            trans_units[tt] += u
+        _, fuel_trans = fold_top_n(self.top_n, fuel_units, self.fuel_trans, at=0)
+        _, fuel_trans = fold_top_n(self.top_n, trans_units, fuel_trans, at=1)
+        fuel_types = sorted({ft for ft, _ in fuel_trans})
+        transmissions = sorted({tt for _, tt in fuel_trans})
+        fuel_vs_trans_data = []
+        for ft in fuel_types:
+            row = {"fuel_type": ft}
+            for tt in transmissions:
+                row[tt] = fuel_trans.get((ft, tt), 0)
+            fuel_vs_trans_data.append(row)
+        return {
+            "id": "fuel_vs_transmission",
+            "xKey": "fuel_type",
+            "x-axis": transmissions,
+            "y-axis": fuel_vs_trans_data
+        }
 
 @chart_function
-def chart_statewise_units_market_share(rows):
-    state_acc = defaultdict(lambda: {"units":0,"mkt_total":0.0,"count":0})
-    for r in rows:
+class chart_statewise_units_market_share(ChartAccumulator):
+    id = "statewise_units_market_share"
+    columns = ("state", "units_sold", "market_share_in_region", "market_share_in_region_")
+
+    def __init__(self):
+        self.units = defaultdict(int)
+        self.mkt_total = defaultdict(float)
+        self.count = defaultdict(int)
+
+    def add(self, r):
         st = r.get("state")
         u = r.get("units_sold")
         ms = r.get("market_share_in_region") or r.get("market_share_in_region_")
         if st and u is not None and ms is not None:
-            acc = state_acc[st]
-            acc["units"]     += u
-            acc["mkt_total"] += ms
-            acc["count"]     += 1
-    statewise_data = []
-    for st, d in state_acc.items():
-        if d["count"] > 0:
-            statewise_data.append({
-                "state": st,
-                "units_sold": d["units"],
-                "avg_market_share": d["mkt_total"] / d["count"]
-            })
-    return {
-        "id": "statewise_units_market_share",
-        "xKey": "state",
-        "x-axis": ["units_sold", "avg_market_share"],
-        "y-axis": statewise_data
-    }
+            self.units[st]     += u
+            self.mkt_total[st] += ms
+            self.count[st]     += 1
+
+    def result(self):
+        count, units, mkt_total = fold_top_n(self.top_n, self.count, self.units, self.mkt_total)
+        statewise_data = []
+        for st, n in count.items():
+            if n > 0:
+                statewise_data.append({
+                    "state": st,
+                    "units_sold": units[st],
+                    "avg_market_share": mkt_total[st] / n
+                })
+        return {
+            "id": "statewise_units_market_share",
+            "xKey": "state",
+            "x-axis": ["units_sold", "avg_market_share"],
+            "y-axis": statewise_data
+        }
 
 @chart_function
-def chart_delivery_delay_by_oem(rows):
-    delays = defaultdict(list)
-    for r in rows:
+class chart_delivery_delay_by_oem(ChartAccumulator):
+    id = "delivery_delay_by_oem"
+    columns = ("oem_name", "booking_date", "delivery_date")
+
+    def __init__(self):
+        self.delay_total = defaultdict(int)
+        self.count = defaultdict(int)
+
+    def add(self, r):
         oem = r.get("oem_name")
         booking = r.get("booking_date")
         delivery = r.get("delivery_date")
         if oem and booking and delivery:
-            delays[oem].append((delivery - booking).days)
-    delivery_delay_data = []
-    for oem, L in delays.items():
-        if L:
-            delivery_delay_data.append({
-                "oem": oem,
-                "avg_delivery_delay_days": sum(L) / len(L)
-            })
-    return {
-        "id": "delivery_delay_by_oem",
-        "xKey": "oem",
-        "x-axis": ["avg_delivery_delay_days"],
-        "y-axis": delivery_delay_data
-    }
+            self.delay_total[oem] += (delivery - booking).days
+            self.count[oem] += 1
+
+    def result(self):
+        count, delay_total = fold_top_n(self.top_n, self.count, self.delay_total)
+        delivery_delay_data = []
+        for oem, n in count.items():
+            if n:
+                delivery_delay_data.append({
+                    "oem": oem,
+                    "avg_delivery_delay_days": delay_total[oem] / n
+                })
+        return {
+            "id": "delivery_delay_by_oem",
+            "xKey": "oem",
+            "x-axis": ["avg_delivery_delay_days"],
+            "y-axis": delivery_delay_data
+        }
 
 @chart_function
-def chart_discount_vs_units_by_customer(rows):
-    disc_vs_units = defaultdict(list)
-    for r in rows:
+class chart_discount_vs_units_by_customer(ChartAccumulator):
+    id = "discount_vs_units_by_customer"
+    columns = ("customer_type", "discount_offered", "discount_offered_", "units_sold")
+
+    def __init__(self):
+        self.discount = defaultdict(int)
+        self.units = defaultdict(int)
+        self.count = defaultdict(int)
+
+    def add(self, r):
         ct = r.get("customer_type")
         disc = r.get("discount_offered") or r.get("discount_offered_")
         u = r.get("units_sold")
         if ct and disc is not None and u is not None:
-            disc_vs_units[ct].append({"discount": disc, "units_sold": u})
-    discount_vs_units_data = []
-    for ct, vals in disc_vs_units.items():
-        if vals:
-            discount_vs_units_data.append({
-                "customer_type": ct,
-                "avg_discount": sum(d["discount"] for d in vals) / len(vals),
-                "avg_units_sold": sum(d["units_sold"] for d in vals) / len(vals)
-            })
-    return {
-        "id": "discount_vs_units_by_customer",
-        "xKey": "customer_type",
-        "x-axis": ["avg_discount", "avg_units_sold"],
-        "y-a": discount_vs_units_data
-    }
+            self.discount[ct] += disc
+            self.units[ct] += u
+            self.count[ct] += 1
+
+    def result(self):
+        count, discount, units = fold_top_n(self.top_n, self.count, self.discount, self.units)
+        discount_vs_units_data = []
+        for ct, n in count.items():
+            if n:
+                discount_vs_units_data.append({
+                    "customer_type": ct,
+                    "avg_discount": discount[ct] / n,
+                    "avg_units_sold": units[ct] / n
+                })
+        return {
+            "id": "discount_vs_units_by_customer",
+            "xKey": "customer_type",
+            "x-axis": ["avg_discount", "avg_units_sold"],
+            "y-a": discount_vs_units_data
+        }
 
 @chart_function
-def chart_rating_vs_complaints_by_dealer(rows):
-    dr_complaints = defaultdict(lambda: {"ratings": [], "complaints": 0})
-    for r in rows:
+class chart_rating_vs_complaints_by_dealer(ChartAccumulator):
+    id = "rating_vs_complaints_by_dealer"
+    columns = ("delivery_rating_15", "complaint_registered_yn", "dealer_name")
+
+    def __init__(self):
+        self.rating_total = defaultdict(int)
+        self.count = defaultdict(int)
+        self.complaints = defaultdict(int)
+
+    def add(self, r):
         dlr = r.get("delivery_rating_15")
         dlr_yes = r.get("complaint_registered_yn", "").lower() == "yes"
         dealer = r.get("dealer_name")
         if dealer and dlr is not None:
-            info = dr_complaints[dealer]
-            info["ratings"].append(dlr)
-            if dlr_yes:
-                info["complaints"] += 1
-    rating_vs_complaints_data = []
-    for dlr, info in dr_complaints.items():
-        if info["ratings"]:
-            rating_vs_complaints_data.append({
-                "dealer": dlr,
-                "avg_rating": sum(info["ratings"]) / len(info["ratings"]),
-                "complaint_count": info["complaints"]
-            })
-    return {
-        "id": "rating_vs_complaints_by_dealer",
-        "xKey": "dealer",
-        "x-axis": ["avg_rating", "complaint_count"],
-        "y-axis": rating_vs_complaints_data
-    }
+            self.rating_total[dealer] += dlr
+            self.count[dealer] += 1
+            self.complaints[dealer] += 1 if dlr_yes else 0
+
+    def result(self):
+        count, rating_total, complaints = fold_top_n(self.top_n, self.count, self.rating_total, self.complaints)
+        rating_vs_complaints_data = [
+            {
+                "dealer": dealer,
+                "avg_rating": rating_total[dealer] / n,
+                "complaint_count": complaints[dealer]
+            }
+            for dealer, n in count.items() if n
+        ]
+        return {
+            "id": "rating_vs_complaints_by_dealer",
+            "xKey": "dealer",
+            "x-axis": ["avg_rating", "complaint_count"],
+            "y-axis": rating_vs_complaints_data
+        }
 
 @chart_function
-def chart_competitor_vs_final_price(rows):
-    comp_vs_final = []
-    for r in rows:
+class chart_competitor_vs_final_price(ChartAccumulator):
+    id = "competitor_vs_final_price"
+    columns = ("competitor_price", "final_price_after_discount", "final_price_after_discount_", "oem_name")
+    uses_row_position = True
+
+    def __init__(self):
+        self.comp_vs_final = PointSample()
+
+    def add(self, r):
         cp = r.get("competitor_price")
         fp = r.get("final_price_after_discount") or r.get("final_price_after_discount_")
         oem = r.get("oem_name")
         if cp is not None and fp is not None:
-            comp_vs_final.append({
+            self.comp_vs_final.add({
                 "oem": oem,
                 "competitor_price": cp,
                 "final_price": fp
-            })
-    return {
-        "id": "competitor_vs_final_price",
-        "xKey": "oem",
-        "x-axis": ["competitor_price", "final_price"],
-        "y-axis": comp_vs_final
-    }
+            }, self.row_position)
+
+    def result(self):
+        return sampled_chart({
+            "id": "competitor_vs_final_price",
+            "xKey": "oem",
+            "x-axis": ["competitor_price", "final_price"],
+        }, self.comp_vs_final, self.max_points)
 
 @chart_function
-def chart_ev_metrics(rows):
-    ev_metrics = []
-    for r in rows:
+class chart_ev_metrics(ChartAccumulator):
+    id = "ev_range_vs_battery_vs_charging"
+    columns = ("fuel_type", "range_km", "battery_capacity_kwh", "charging_time_hours", "oem_name")
+    uses_row_position = True
+
+    def __init__(self):
+        self.ev_metrics = PointSample()
+
+    def add(self, r):
         ft = r.get("fuel_type")
         if ft and "electric" in ft.lower():
             rng = r.get("range_km")
             bat = r.get("battery_capacity_kwh")
             chg = r.get("charging_time_hours")
             if rng is not None and bat is not None and chg is not None:
-                ev_metrics.append({
+                self.ev_metrics.add({
                     "oem": r.get("oem_name"),
                     "range_km": rng,
                     "battery_kwh": bat,
                     "charging_time_hr": chg
-                })
-    return {
-        "id": "ev_range_vs_battery_vs_charging",
-        "xKey": "oem",
-        "x-axis": ["range_km", "battery_kwh", "charging_time_hr"],
-        "y-axis": ev_metrics
-    }
+                }, self.row_position)
+
+    def result(self):
+        return sampled_chart({
+            "id": "ev_range_vs_battery_vs_charging",
+            "xKey": "oem",
+            "x-axis": ["range_km", "battery_kwh", "charging_time_hr"],
+        }, self.ev_metrics, self.max_points)
 
 @chart_function
-def chart_market_share_by_oem(rows):
-    oem_units = defaultdict(int)
-    total_units = 0
-    for r in rows:
+class chart_market_share_by_oem(ChartAccumulator):
+    id = "market_share_by_oem"
+    columns = ("oem_name", "units_sold")
+
+    def __init__(self):
+        self.oem_units = defaultdict(int)
+        self.total_units = 0
+
+    def add(self, r):
         oem = r.get("oem_name")
         u = r.get("units_sold")
         if oem and u is not None:
-            oem_units[oem] += u
-            total_units += u
-    market_share_oem = []
-    for oem, units in sorted(oem_units.items(), key=lambda x: x[1], reverse=True):
-        market_share_oem.append({
-            "oem": oem,
-            "units_sold": units,
-            "market_share_percent": (units / total_units * 100) if total_units else 0
-        })
-    return {
-        "id": "market_share_by_oem",
-        "xKey": "oem",
-        "x-axis": ["units_sold", "market_share_percent"],
-        "y-axis": market_share_oem
-    }
+            self.oem_units[oem] += u
+            self.total_units += u
+
+    def result(self):
+        total_units = self.total_units
+        oem_units, = fold_top_n(self.top_n, self.oem_units)
+        market_share_oem = []
+        for oem, units in sorted(oem_units.items(), key=lambda x: x[1], reverse=True):
+            market_share_oem.append({
+                "oem": oem,
+                "units_sold": units,
+                "market_share_percent": (units / total_units * 100) if total_units else 0
+            })
+        return {
+            "id": "market_share_by_oem",
+            "xKey": "oem",
+            "x-axis": ["units_sold", "market_share_percent"],
+            "y-axis": market_share_oem
+        }
 
 @chart_function
-def chart_market_share_by_competitor_oem(rows):
-    competitor_units = defaultdict(int)
-    total_comp_units = 0
-    for r in rows:
+class chart_market_share_by_competitor_oem(ChartAccumulator):
+    id = "market_share_by_competitor_oem"
+    columns = ("competitor_oem", "units_sold")
+
+    def __init__(self):
+        self.competitor_units = defaultdict(int)
+        self.total_comp_units = 0
+
+    def add(self, r):
         competitor = r.get("competitor_oem")
         u = r.get("units_sold")
         if competitor and u is not None:
-            competitor_units[competitor] += u
-            total_comp_units += u
-    market_share_comp = []
-    for comp, units in sorted(competitor_units.items(), key=lambda x: x[1], reverse=True):
-        market_share_comp.append({
-            "competitor_oem": comp,
-            "units_sold": units,
-            "market_share_percent": (units / total_comp_units * 100) if total_comp_units else 0
-        })
-    return {
-        "id": "market_share_by_competitor_oem",
-        "xKey": "competitor_oem",
-        "x-axis": ["units_sold", "market_share_percent"],
-        "y-axis": market_share_comp
-    }
+            self.competitor_units[competitor] += u
+            self.total_comp_units += u
+
+    def result(self):
+        total_comp_units = self.total_comp_units
+        competitor_units, = fold_top_n(self.top_n, self.competitor_units)
+        market_share_comp = []
+        for comp, units in sorted(competitor_units.items(), key=lambda x: x[1], reverse=True):
+            market_share_comp.append({
+                "competitor_oem": comp,
+                "units_sold": units,
+                "market_share_percent": (units / total_comp_units * 100) if total_comp_units else 0
+            })
+        return {
+            "id": "market_share_by_competitor_oem",
+            "xKey": "competitor_oem",
+            "x-axis": ["units_sold", "market_share_percent"],
+            "y-axis": market_share_comp
+        }
 
 @chart_function
-def chart_top_selling_models(rows):
-    model_units = defaultdict(int)
-    for r in rows:
+class chart_top_selling_models(ChartAccumulator):
+    id = "top_selling_models"
+    columns = ("vehicle_model", "units_sold")
+
+    def __init__(self):
+        self.model_units = defaultdict(int)
+
+    def add(self, r):
         model = r.get("vehicle_model")
         u = r.get("units_sold")
         if model and u is not None:
-            model_units[model] += u
-    top_models = sorted(model_units.items(), key=lambda x: x[1], reverse=True)[:10]
-    top_models_data = [{"model": m, "units_sold": u} for m, u in top_models]
-    return {
-        "id": "top_selling_models",
-        "xKey": "model",
-        "x-axis": ["units_sold"],
-        "y-axis": top_models_data
-    }
+            self.model_units[model] += u
+
+    def result(self):
+        top_models = sorted(self.model_units.items(), key=lambda x: x[1], reverse=True)[:10]
+        top_models_data = [{"model": m, "units_sold": u} for m, u in top_models]
+        return {
+            "id": "top_selling_models",
+            "xKey": "model",
+            "x-axis": ["units_sold"],
+            "y-axis": top_models_data
+        }
 
 @chart_function
-def chart_avg_discount_by_brand(rows):
-    brand_discount = defaultdict(list)
-    for r in rows:
+class chart_avg_discount_by_brand(ChartAccumulator):
+    id = "avg_discount_by_brand"
+    columns = ("oem_name", "discount_offered", "discount_offered_")
+
+    def __init__(self):
+        self.discount_total = defaultdict(int)
+        self.count = defaultdict(int)
+
+    def add(self, r):
         oem = r.get("oem_name")
         disc = r.get("discount_offered") or r.get("discount_offered_")
         if oem and disc is not None:
-            brand_discount[oem].append(disc)
-    avg_discount_data = []
-    for oem, discounts in brand_discount.items():
-        if discounts:
-            avg_discount_data.append({
-                "oem": oem,
-                "avg_discount": sum(discounts) / len(discounts)
-            })
-    return {
-        "id": "avg_discount_by_brand",
-        "xKey": "oem",
-        "x-axis": ["avg_discount"],
-        "y-axis": avg_discount_data
-    }
+            self.discount_total[oem] += disc
+            self.count[oem] += 1
+
+    def result(self):
+        count, discount_total = fold_top_n(self.top_n, self.count, self.discount_total)
+        avg_discount_data = []
+        for oem, n in count.items():
+            if n:
+                avg_discount_data.append({
+                    "oem": oem,
+                    "avg_discount": discount_total[oem] / n
+                })
+        return {
+            "id": "avg_discount_by_brand",
+            "xKey": "oem",
+            "x-axis": ["avg_discount"],
+            "y-axis": avg_discount_data
+        }
 
 @chart_function
-def chart_sales_trend_by_vehicle_segment(rows):
-    segment_trend = defaultdict(lambda: defaultdict(int))
-    for r in rows:
+class chart_sales_trend_by_vehicle_segment(ChartAccumulator):
+    id = "sales_trend_by_vehicle_segment"
+    columns = ("vehicle_segment", "sale_date", "units_sold")
+
+    def __init__(self):
+        self.segment_trend = defaultdict(int)
+
+    def add(self, r):
         segment = r.get("vehicle_segment")
         sale_date = r.get("sale_date")
         u = r.get("units_sold")
         if segment and sale_date and u is not None:
             ym = sale_date.strftime("%Y-%m")
-            segment_trend[segment][ym] += u
-    segment_trend_data = []
-    all_months = sorted({m for seg in segment_trend.values() for m in seg})
-    for segment, month_units in segment_trend.items():
-        row = {"vehicle_segment": segment}
-        for m in all_months:
-            row[m] = month_units.get(m, 0)
-        segment_trend_data.append(row)
-    return {
-        "id": "sales_trend_by_vehicle_segment",
-        "xKey": "vehicle_segment",
-        "x-axis": all_months,
-        "y-axis": segment_trend_data
-    }
+            self.segment_trend[(segment, ym)] += u
+
+    def result(self):
+        segment_units = defaultdict(int)
+        for (segment, _), u in self.segment_trend.items():
+            segment_units[segment] += u
+        _, segment_trend = fold_top_n(self.top_n, segment_units, self.segment_trend, at=0)
+        segment_trend_data = []
+        segments = dict.fromkeys(segment for segment, _ in segment_trend)
+        all_months = sorted({m for _, m in segment_trend})
+        for segment in segments:
+            row = {"vehicle_segment": segment}
+            for m in all_months:
+                row[m] = segment_trend.get((segment, m), 0)
+            segment_trend_data.append(row)
+        return {
+            "id": "sales_trend_by_vehicle_segment",
+            "xKey": "vehicle_segment",
+            "x-axis": all_months,
+            "y-axis": segment_trend_data
+        }
 
 @chart_function
-def chart_finance_opted_ratio_by_customer_type(rows):
-    finance_by_cust = defaultdict(lambda: {"finance_yes": 0, "total": 0})
-    for r in rows:
+class chart_finance_opted_ratio_by_customer_type(ChartAccumulator):
+    id = "finance_opted_ratio_by_customer_type"
+    columns = ("customer_type", "finance_opted_yesno")
+
+    def __init__(self):
+        self.finance_yes = defaultdict(int)
+        self.total = defaultdict(int)
+
+    def add(self, r):
         cust_type = r.get("customer_type")
         finance_yn = r.get("finance_opted_yesno")
         if cust_type:
-            finance_by_cust[cust_type]["total"] += 1
+            self.total[cust_type] += 1
             if finance_yn and finance_yn.lower() == "yes":
-                finance_by_cust[cust_type]["finance_yes"] += 1
-    finance_ratio_data = []
-    for cust_type, d in finance_by_cust.items():
-        total = d["total"]
-        yes = d["finance_yes"]
-        ratio = (yes / total * 100) if total else 0
-        finance_ratio_data.append({
-            "customer_type": cust_type,
-            "finance_opted_percent": ratio
-        })
-    return {
-        "id": "finance_opted_ratio_by_customer_type",
-        "xKey": "customer_type",
-        "x-axis": ["finance_opted_percent"],
-        "y-axis": finance_ratio_data
-    }
\ No newline at end of file
+                self.finance_yes[cust_type] += 1
+
+    def result(self):
+        totals, finance_yes = fold_top_n(self.top_n, self.total, self.finance_yes)
+        finance_ratio_data = []
+        for cust_type, total in totals.items():
+            yes = finance_yes.get(cust_type, 0)
+            ratio = (yes / total * 100) if total else 0
+            finance_ratio_data.append({
+                "customer_type": cust_type,
+                "finance_opted_percent": ratio
+            })
+        return {
+            "id": "finance_opted_ratio_by_customer_type",
+            "xKey": "customer_type",
+            "x-axis": ["finance_opted_percent"],
+            "y-axis": finance_ratio_data
+        }
@@ -0,0 +1,77 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from sqlalchemy import select, update, insert
+
+from app.models.datapoints import DataVersion
+
+data_versions = DataVersion.__table__
+
+
+def bump_data_version(conn, table_name: str, row_count: int = None):
+    """
+    Marks `table_name` as changed: increments its version (starting at 1),
+    stamps the time and records the row count when known.
+    `conn` is a Connection or Session; the caller commits.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    result = conn.execute(
+        update(data_versions)
+        .where(data_versions.c.table_name == table_name)
+        .values(version=data_versions.c.version + 1, updated_at=now, row_count=row_count)
+    )
+    if result.rowcount == 0:
+        conn.execute(insert(data_versions).values(table_name=table_name, version=1, updated_at=now, row_count=row_count))
+
+
+def get_data_versions(db, table_names):
+    """
+    Returns {table_name: (version, updated_at, row_count)} for the tables that
+    have been versioned by ingestion; unversioned tables are left out.
+    """
+    rows = db.execute(
+        select(data_versions.c.table_name, data_versions.c.version, data_versions.c.updated_at, data_versions.c.row_count)
+        .where(data_versions.c.table_name.in_(list(table_names)))
+    )
+    return {name: (version, updated_at, row_count) for name, version, updated_at, row_count in rows}
+
+
+def cache_validators(versions, variant: str = ""):
+    """
+    Builds the ETag / Last-Modified headers for a response computed from
+    tables at the given versions. `variant` (e.g. the query string) is folded
+    into the ETag so different representations never share one.
+    """
+    digest = hashlib.sha1(variant.encode())
+    for name in sorted(versions):
+        digest.update(f"|{name}:{versions[name][0]}".encode())
+    last_modified = max(v[1] for v in versions.values())
+    return {
+        "ETag": f'"{digest.hexdigest()[:32]}"',
+        "Last-Modified": format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True),
+        "Cache-Control": "no-cache",
+    }
+
+
+def is_not_modified(request_headers, validators) -> bool:
+    """
+    Evaluates If-None-Match (or, without it, If-Modified-Since) against the
+    validators of the current data, as in RFC 9110 section 13.2.2.
+    """
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return validators["ETag"] in tags
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return parsedate_to_datetime(validators["Last-Modified"]) <= since
+    return False
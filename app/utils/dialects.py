@@ -0,0 +1,94 @@
+from sqlalchemy import Boolean, literal
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.sql.expression import ColumnElement
+from sqlalchemy.sql.visitors import InternalTraversal
+
+from app.config import settings
+
+# Bound parameters allowed in one statement, per dialect
+MAX_BIND_PARAMS = {
+    "mssql": 2100,
+    "sqlite": 32766,  # SQLITE_MAX_VARIABLE_NUMBER since SQLite 3.32
+    "postgresql": 65535,
+    "duckdb": 65535,
+}
+DEFAULT_MAX_BIND_PARAMS = 999
+
+
+def max_bind_params(dialect) -> int:
+    return MAX_BIND_PARAMS.get(dialect.name, DEFAULT_MAX_BIND_PARAMS)
+
+
+def batch_rows(dialect, num_cols: int) -> int:
+    """
+    Rows per insert batch so that rows * cols stays within the dialect's
+    bound-parameter limit (the 2100-parameter heuristic on SQL Server).
+    """
+    return max(1, max_bind_params(dialect) // max(1, num_cols))
+
+
+def engine_options(url: str):
+    """
+    Dialect-specific create_engine() arguments. SQLite connections are
+    shared across the request threads, and an in-memory SQLite database
+    only exists on one connection, so it gets a single static connection
+    instead of the pool.
+    """
+    url = make_url(url)
+    if url.get_backend_name() != "sqlite":
+        return {}
+    options = {"connect_args": {"check_same_thread": False}}
+    if url.database in (None, "", ":memory:"):
+        options["poolclass"] = StaticPool
+    return options
+
+
+def transactional_ddl(conn):
+    """
+    Makes DDL on `conn` part of its transaction. The sqlite3 driver only
+    opens a transaction before DML, so a DROP/CREATE would otherwise commit
+    on its own; call this first thing inside engine.begin().
+    """
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("BEGIN")
+
+
+class contains_ci(ColumnElement):
+    """
+    Case-insensitive substring match, `column ILIKE '%value%'`, compiled per
+    dialect. SQL Server and SQLite compare case-insensitively with plain
+    LIKE (SQL Server through the column's collation, or DB_CI_COLLATION when
+    set), which keeps the column usable by the optimizer; SQLAlchemy's
+    generic ilike would wrap both sides in lower().
+    """
+    type = Boolean()
+    inherit_cache = True
+    _is_implicitly_boolean = True  # a predicate, not a value to compare with 1
+    _traverse_internals = [
+        ("column", InternalTraversal.dp_clauseelement),
+        ("pattern", InternalTraversal.dp_clauseelement),
+    ]
+
+    def __init__(self, column, value: str):
+        self.column = column
+        self.pattern = literal(f"%{value}%")
+
+
+@compiles(contains_ci)
+def _contains_ci(element, compiler, **kw):
+    return compiler.process(element.column.ilike(element.pattern), **kw)
+
+
+@compiles(contains_ci, "mssql")
+def _contains_ci_mssql(element, compiler, **kw):
+    column = element.column
+    if settings.DB_CI_COLLATION:
+        column = column.collate(settings.DB_CI_COLLATION)
+    return compiler.process(column.like(element.pattern), **kw)
+
+
+@compiles(contains_ci, "sqlite")
+def _contains_ci_sqlite(element, compiler, **kw):
+    return compiler.process(element.column.like(element.pattern), **kw)
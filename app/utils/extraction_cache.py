@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+class ExtractionCache:
+    """
+    On-disk cache of LLM extraction results, content-addressed by a hash of
+    (prompt template, model name, chunk text): a chunk extracted once with
+    the same prompt and model is served from disk, whatever file it came
+    from. Entries are evicted least recently used first once the cache is
+    larger than `max_bytes`.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        os.makedirs(directory, exist_ok=True)
+        # path -> (size, last use), rebuilt from the files already on disk
+        self._entries = {}
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    self._entries[path] = (stat.st_size, stat.st_mtime)
+        self.size = sum(size for size, _ in self._entries.values())
+
+    @staticmethod
+    def key(prompt_template, model_name: str, text_chunk: str) -> str:
+        payload = json.dumps([prompt_template, model_name, text_chunk], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str):
+        """
+        Cached records for `key`, or None on a miss.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                records = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+        with self._lock:
+            self.stats["hits"] += 1
+            if path in self._entries:
+                self._entries[path] = (self._entries[path][0], time.time())
+        try:
+            os.utime(path)  # keeps recency across restarts
+        except OSError:
+            pass
+        return records
+
+    def put(self, key: str, records):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so readers never see a partial entry
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False)
+        size = os.path.getsize(tmp)
+        os.replace(tmp, path)
+        with self._lock:
+            old = self._entries.get(path)
+            self.size += size - (old[0] if old else 0)
+            self._entries[path] = (size, time.time())
+            self.stats["writes"] += 1
+            self._evict()
+
+    def _evict(self):
+        if self.size <= self.max_bytes:
+            return
+        for path, (size, _) in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            if self.size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            del self._entries[path]
+            self.size -= size
+            self.stats["evictions"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else None,
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,329 @@
+from collections import defaultdict
+
+from app.utils.charts import ChartAccumulator, fold_top_n, tab_chart
+
+# Charts behind the FMCG dashboard tabs, one accumulator per chart.
+
+class RegionTotal(ChartAccumulator):
+    """
+    Sums one column per group key and optionally rounds the totals.
+    Subclasses only declare the key/value columns and the output names.
+    """
+    key_column = "region"
+    key_default = "Unknown"
+    value_column = None
+    value_default = 0.0
+    x_key = "region"
+    output_name = None
+    digits = 2
+
+    def __init__(self):
+        self.totals = defaultdict(float)
+
+    def add(self, r):
+        self.totals[r.get(self.key_column, self.key_default)] += r.get(self.value_column, self.value_default)
+
+    def result(self):
+        totals, = fold_top_n(self.top_n, self.totals)
+        return {
+            "id": self.id,
+            "xKey": self.x_key,
+            "x-axis": [self.output_name],
+            "y-axis": [{self.x_key: k, self.output_name: round(v, self.digits) if self.digits is not None else v} for k, v in totals.items()]
+        }
+
+
+class RegionAverage(ChartAccumulator):
+    """
+    Average of one column per region.
+    """
+    value_column = None
+    output_name = None
+
+    def __init__(self):
+        self.total = defaultdict(float)
+        self.count = defaultdict(int)
+
+    def add(self, r):
+        region = r.get("region", "Unknown")
+        self.total[region] += r.get(self.value_column, 0)
+        self.count[region] += 1
+
+    def result(self):
+        count, total = fold_top_n(self.top_n, self.count, self.total)
+        return {
+            "id": self.id,
+            "xKey": "region",
+            "x-axis": [self.output_name],
+            "y-axis": [{"region": k, self.output_name: round(total[k]/v, 2) if v else 0} for k, v in count.items()]
+        }
+
+
+# --- global_regional_sales ---
+
+@tab_chart("fmcg", "global_regional_sales")
+class chart_units_sold_by_region(RegionTotal):
+    id = "units_sold_by_region"
+    columns = ("region", "units_sold")
+    value_column = "units_sold"
+    value_default = 0
+    output_name = "units_sold"
+    digits = None
+
+    def __init__(self):
+        self.totals = defaultdict(int)
+
+@tab_chart("fmcg", "global_regional_sales")
+class chart_revenue_by_region(RegionTotal):
+    id = "revenue_by_region"
+    columns = ("region", "revenue")
+    value_column = "revenue"
+    output_name = "revenue"
+
+@tab_chart("fmcg", "global_regional_sales")
+class chart_average_selling_price_by_region(ChartAccumulator):
+    id = "average_selling_price_by_region"
+    columns = ("region", "selling_price")
+
+    def __init__(self):
+        self.price_sum = defaultdict(float)
+        self.price_count = defaultdict(int)
+
+    def add(self, r):
+        region = r.get("region", "Unknown")
+        selling_price = r.get("selling_price", 0.0)
+        if selling_price > 0:
+            self.price_sum[region] += selling_price
+            self.price_count[region] += 1
+
+    def result(self):
+        price_count, price_sum = fold_top_n(self.top_n, self.price_count, self.price_sum)
+        return {
+            "id": "average_selling_price_by_region",
+            "xKey": "region",
+            "x-axis": ["average_selling_price"],
+            "y-axis": [{"region": k, "average_selling_price": round(price_sum[k] / v, 2) if v else 0} for k, v in price_count.items()]
+        }
+
+@tab_chart("fmcg", "global_regional_sales")
+class chart_sales_by_channel(RegionTotal):
+    id = "sales_by_channel"
+    columns = ("channel", "revenue")
+    key_column = "channel"
+    value_column = "revenue"
+    x_key = "channel"
+    output_name = "revenue"
+
+@tab_chart("fmcg", "global_regional_sales")
+class chart_market_share_by_region(RegionTotal):
+    id = "market_share_by_region"
+    columns = ("region", "market_share_")
+    value_column = "market_share_"
+    output_name = "market_share"
+
+@tab_chart("fmcg", "global_regional_sales")
+class chart_product_performance(ChartAccumulator):
+    id = "product_performance"
+    columns = ("product_name", "units_sold")
+
+    def __init__(self):
+        self.product_performance = defaultdict(int)
+
+    def add(self, r):
+        self.product_performance[r.get("product_name", "Unknown")] += r.get("units_sold", 0)
+
+    def result(self):
+        # Best sellers first; the long tail is summed as "Other", listed last
+        units, = fold_top_n(self.top_n, self.product_performance)
+        folded = len(units) < len(self.product_performance)
+        ranked = sorted(units.items(), key=lambda x: (folded and x[0] == "Other", -x[1]))
+        y_axis = [{"product_name": k, "units_sold": v} for k, v in ranked]
+        return {
+            "id": "product_performance",
+            "xKey": "product_name",
+            "x-axis": ["units_sold"],
+            "y-axis": y_axis
+        }
+
+
+# --- supply_chain ---
+
+@tab_chart("fmcg", "supply_chain")
+class chart_avg_delivery_time_by_region(RegionAverage):
+    id = "avg_delivery_time_by_region"
+    columns = ("region", "delivery_time_days")
+    value_column = "delivery_time_days"
+    output_name = "avg_delivery_days"
+
+@tab_chart("fmcg", "supply_chain")
+class chart_stock_levels_by_region(RegionTotal):
+    id = "stock_levels_by_region"
+    columns = ("region", "stock_on_hand")
+    value_column = "stock_on_hand"
+    value_default = 0
+    output_name = "total_stock"
+    digits = None
+
+    def __init__(self):
+        self.totals = defaultdict(int)
+
+@tab_chart("fmcg", "supply_chain")
+class chart_stockout_rate_by_region(ChartAccumulator):
+    id = "stockout_rate_by_region"
+    columns = ("region", "out_of_stock_flag")
+
+    def __init__(self):
+        self.total = defaultdict(int)
+        self.oos = defaultdict(int)
+
+    def add(self, r):
+        region = r.get("region", "Unknown")
+        oos_flag = r.get("out_of_stock_flag", "No")
+        self.total[region] += 1
+        if oos_flag.lower() == "yes":
+            self.oos[region] += 1
+
+    def result(self):
+        total, oos = fold_top_n(self.top_n, self.total, self.oos)
+        return {
+            "id": "stockout_rate_by_region",
+            "xKey": "region",
+            "x-axis": ["stockout_percentage"],
+            "y-axis": [{"region": k, "stockout_percentage": round((oos.get(k, 0)/v)*100, 2) if v else 0} for k, v in total.items()]
+        }
+
+
+# --- marketing_brand ---
+
+@tab_chart("fmcg", "marketing_brand")
+class chart_brand_penetration_by_region(RegionAverage):
+    id = "brand_penetration_by_region"
+    columns = ("region", "brand_penetration_")
+    value_column = "brand_penetration_"
+    output_name = "avg_penetration"
+
+@tab_chart("fmcg", "marketing_brand")
+class chart_promotion_performance(RegionTotal):
+    id = "promotion_performance"
+    columns = ("promotion_type", "revenue")
+    key_column = "promotion_type"
+    key_default = "None"
+    value_column = "revenue"
+    x_key = "promotion_type"
+    output_name = "revenue"
+
+
+# --- financial_profitability ---
+
+@tab_chart("fmcg", "financial_profitability")
+class chart_total_revenue_by_region(RegionTotal):
+    id = "revenue_by_region"
+    columns = ("region", "revenue")
+    value_column = "revenue"
+    output_name = "total_revenue"
+
+@tab_chart("fmcg", "financial_profitability")
+class chart_profit_margin_by_region(ChartAccumulator):
+    id = "profit_margin_by_region"
+    columns = ("region", "revenue", "profit")
+
+    def __init__(self):
+        self.revenue = defaultdict(float)
+        self.profit = defaultdict(float)
+
+    def add(self, r):
+        region = r.get("region", "Unknown")
+        self.revenue[region] += r.get("revenue", 0.0)
+        self.profit[region] += r.get("profit", 0.0)
+
+    def result(self):
+        revenue, profit = fold_top_n(self.top_n, self.revenue, self.profit)
+        return {
+            "id": "profit_margin_by_region",
+            "xKey": "region",
+            "x-axis": ["profit_margin"],
+            "y-axis": [{"region": k, "profit_margin": round((profit[k]/v)*100, 2) if v else 0} for k, v in revenue.items()]
+        }
+
+@tab_chart("fmcg", "financial_profitability")
+class chart_cost_breakdown_by_region(RegionTotal):
+    id = "cost_breakdown_by_region"
+    columns = ("region", "cost_to_company")
+    value_column = "cost_to_company"
+    output_name = "total_cost"
+
+
+# --- consumer_insights ---
+
+@tab_chart("fmcg", "consumer_insights")
+class chart_avg_feedback_by_region(RegionAverage):
+    id = "avg_feedback_by_region"
+    columns = ("region", "customer_feedback_score")
+    value_column = "customer_feedback_score"
+    output_name = "avg_feedback_score"
+
+@tab_chart("fmcg", "consumer_insights")
+class chart_customer_type_distribution(ChartAccumulator):
+    id = "customer_type_distribution"
+    columns = ("customer_type",)
+
+    def __init__(self):
+        self.customer_type_dist = defaultdict(int)
+
+    def add(self, r):
+        self.customer_type_dist[r.get("customer_type", "Unknown")] += 1
+
+    def result(self):
+        customer_type_dist, = fold_top_n(self.top_n, self.customer_type_dist)
+        return {
+            "id": "customer_type_distribution",
+            "xKey": "customer_type",
+            "x-axis": ["count"],
+            "y-axis": [{"customer_type": k, "count": v} for k, v in customer_type_dist.items()]
+        }
+
+@tab_chart("fmcg", "consumer_insights")
+class chart_return_rate_by_product(ChartAccumulator):
+    id = "return_rate_by_product"
+    columns = ("product_name", "returned_units", "units_sold")
+
+    def __init__(self):
+        self.returned = defaultdict(int)
+        self.sold = defaultdict(int)
+
+    def add(self, r):
+        product = r.get("product_name", "Unknown")
+        self.returned[product] += r.get("returned_units", 0)
+        self.sold[product] += r.get("units_sold", 0)
+
+    def result(self):
+        # Products ranked by units sold; the tail is reported as one "Other" rate
+        sold, returned = fold_top_n(self.top_n, self.sold, self.returned)
+        y_axis = [{"product_name": k, "return_rate": round((returned[k]/v)*100, 2) if v else 0} for k, v in sold.items()]
+        return {
+            "id": "return_rate_by_product",
+            "xKey": "product_name",
+            "x-axis": ["return_rate"],
+            "y-axis": y_axis
+        }
+
+
+# --- sustainability_compliance ---
+
+@tab_chart("fmcg", "sustainability_compliance")
+class chart_sustainability_score_by_region(ChartAccumulator):
+    # Mock sustainability data since not in current schema; reads no columns,
+    # so the tab never scans the table.
+    id = "sustainability_score_by_region"
+    columns = ()
+
+    def add(self, r):
+        pass
+
+    def result(self):
+        return {
+            "id": "sustainability_score_by_region",
+            "xKey": "region",
+            "x-axis": ["sustainability_score"],
+            "y-axis": [{"region": "North", "sustainability_score": 85}, {"region": "South", "sustainability_score": 78}, {"region": "East", "sustainability_score": 82}, {"region": "West", "sustainability_score": 79}]
+        }
@@ -0,0 +1,274 @@
+import re
+import threading
+import time
+from collections import defaultdict
+
+import pandas as pd
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from app.models.datapoints import MetricDictionary, MetricSeries
+from app.utils.data_versions import bump_data_version
+
+metric_dictionary = MetricDictionary.__table__
+metric_series = MetricSeries.__table__
+
+# Columns of a long-format metric file once the upload has cleaned its
+# header (Country, Year, Brand, Metric, Value, Source URL)
+LONG_FORMAT_COLUMNS = ("country", "year", "brand", "metric", "value", "source_url")
+# Dictionary-encoded columns and their kind in metric_dictionary
+ENCODED_COLUMNS = {"metric": "metric", "brand": "brand", "country": "country", "source_url": "source"}
+# Years as metric files write them: 2018, or a fiscal year such as
+# "2013-14", "2020-2021", "FY 2022-23" or "FY20" (the one ending in 2020)
+_YEAR = re.compile(r"^(\d{4})(?:\.0+)?$")
+_FISCAL_YEAR = re.compile(r"^(?:FY\s*)?(\d{4}|\d{2})\s*[-/\u2013]\s*(\d{4}|\d{2})$", re.IGNORECASE)
+_FISCAL_YEAR_END = re.compile(r"^FY\s*(\d{4}|\d{2})$", re.IGNORECASE)
+# Rows per INSERT batch and values per IN list (under every dialect's
+# bound-parameter limit)
+INSERT_BATCH_ROWS = 10000
+IN_BATCH = 1000
+# Attempts at coding new values when other processes insert them too
+ENCODE_ATTEMPTS = 3
+# How long a name found in no dictionary is remembered as unknown (another
+# process may add it), and how many such names are kept
+UNKNOWN_TTL_S = 60
+UNKNOWN_MAX = 10000
+
+# (kind, value) -> id and id -> value for the codes seen by this process;
+# codes are never reassigned, so entries stay valid
+_codes = {}
+_values = {}
+# (kind, value) -> time.monotonic() of the lookup that did not find it
+_unknown = {}
+_codes_lock = threading.Lock()
+
+
+def is_long_format(columns) -> bool:
+    return set(LONG_FORMAT_COLUMNS) <= set(columns)
+
+
+def _remember(rows):
+    for id_, kind, value in rows:
+        _codes[(kind, value)] = id_
+        _values[id_] = value
+
+
+def _fetch(conn, *where):
+    return conn.execute(
+        select(metric_dictionary.c.id, metric_dictionary.c.kind, metric_dictionary.c.value).where(*where)
+    ).all()
+
+
+def _batches(values, size):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _code_missing(engine, kind: str, missing):
+    """
+    Rows of metric_dictionary for `missing` values, inserting the values not
+    coded yet, in one transaction. Another process may insert the same values
+    meanwhile: the unique constraint then fails this transaction and it is
+    retried, finding their codes.
+    """
+    for attempt in range(ENCODE_ATTEMPTS):
+        try:
+            with engine.begin() as conn:
+                rows = []
+                for batch in _batches(missing, IN_BATCH):
+                    rows += _fetch(conn, metric_dictionary.c.kind == kind, metric_dictionary.c.value.in_(batch))
+                found = {value for _, _, value in rows}
+                new = [value for value in missing if value not in found]
+                for batch in _batches(new, INSERT_BATCH_ROWS):
+                    conn.execute(insert(metric_dictionary), [{"kind": kind, "value": value} for value in batch])
+                for batch in _batches(new, IN_BATCH):
+                    rows += _fetch(conn, metric_dictionary.c.kind == kind, metric_dictionary.c.value.in_(batch))
+            return rows
+        except IntegrityError:
+            if attempt == ENCODE_ATTEMPTS - 1:
+                raise
+
+
+def encode(engine, kind: str, values):
+    """
+    {value: id} for `values` of one kind, adding the values not coded yet
+    to metric_dictionary. Codes are cached only once their transaction has
+    committed.
+    """
+    values = set(values)
+    with _codes_lock:
+        missing = [value for value in values if (kind, value) not in _codes]
+        if missing:
+            _remember(_code_missing(engine, kind, missing))
+            for value in missing:
+                _unknown.pop((kind, value), None)
+        return {value: _codes[(kind, value)] for value in values}
+
+
+def lookup(conn, kind: str, values):
+    """
+    {value: id} for the `values` of one kind that are coded. Values are
+    stored as uploaded (stripped of surrounding spaces), so matching is exact
+    and case-sensitive. Only names not cached yet are fetched, and names
+    found nowhere are remembered for UNKNOWN_TTL_S.
+    """
+    wanted = {value.strip() for value in values}
+    now = time.monotonic()
+    with _codes_lock:
+        missing = [
+            value for value in wanted
+            if (kind, value) not in _codes and now - _unknown.get((kind, value), -UNKNOWN_TTL_S) >= UNKNOWN_TTL_S
+        ]
+        for batch in _batches(missing, IN_BATCH):
+            _remember(_fetch(conn, metric_dictionary.c.kind == kind, metric_dictionary.c.value.in_(batch)))
+        if len(_unknown) > UNKNOWN_MAX:
+            _unknown.clear()
+        _unknown.update({(kind, value): now for value in missing if (kind, value) not in _codes})
+        return {value: _codes[(kind, value)] for value in wanted if (kind, value) in _codes}
+
+
+def decode(conn, ids):
+    """
+    {id: value} for metric_dictionary ids.
+    """
+    ids = set(ids)
+    with _codes_lock:
+        missing = [id_ for id_ in ids if id_ not in _values]
+        for batch in _batches(missing, IN_BATCH):
+            _remember(_fetch(conn, metric_dictionary.c.id.in_(batch)))
+        return {id_: _values[id_] for id_ in ids if id_ in _values}
+
+
+def _full_year(digits: str, after: int = 1999) -> int:
+    # Two-digit years are the first such year after `after`
+    year = int(digits)
+    if len(digits) == 4:
+        return year
+    year += after - after % 100
+    return year if year > after else year + 100
+
+
+def parse_year(value):
+    """
+    (year, fiscal) for a metric file's year: a calendar year as is, a fiscal
+    year as the calendar year it starts in ("2013-14" and "FY14" are 2013).
+    (None, False) for anything else, such as quarters ("Q3 FY25") or ranges
+    of several years ("2016-21").
+    """
+    text = str(value).strip()
+    match = _YEAR.match(text)
+    if match:
+        return int(match.group(1)), False
+    match = _FISCAL_YEAR.match(text)
+    if match:
+        start = _full_year(match.group(1))
+        end = _full_year(match.group(2), start)
+        return (start, True) if end == start + 1 else (None, False)
+    match = _FISCAL_YEAR_END.match(text)
+    if match:
+        return _full_year(match.group(1)) - 1, True
+    return None, False
+
+
+def load_long_metrics(engine, df: pd.DataFrame, dataset: str):
+    """
+    Replaces `dataset` in metric_series with the rows of a long-format
+    metric frame: metric, brand and country are stored as integer codes,
+    fiscal years as the year they start in (see parse_year), and for
+    duplicate (metric, brand, year, country) rows the last one wins. Rows
+    without a usable year, a numeric value, a metric or a brand are dropped.
+    Returns the load report: values stored, fiscal-year rows, rows dropped
+    (by reason) and duplicate rows merged.
+    """
+    df = df[list(LONG_FORMAT_COLUMNS)].copy()
+    years = df["year"].map(lambda value: parse_year(value) if pd.notna(value) else (None, False))
+    df["year"] = pd.to_numeric(years.str[0], errors="coerce")
+    fiscal = years.str[1] & df["year"].notna()
+    df["value"] = pd.to_numeric(df["value"], errors="coerce")
+    report = {
+        "rows": len(df),
+        "fiscal_years": int(fiscal.sum()),
+        "dropped_year": int(df["year"].isna().sum()),
+        "dropped_value": int((df["year"].notna() & df["value"].isna()).sum()),
+    }
+    df = df.dropna(subset=["year", "value"])
+    rows = len(df)
+    df = df.dropna(subset=["metric", "brand"])
+    report["dropped_name"] = rows - len(df)
+    for column in ENCODED_COLUMNS:
+        df[column] = df[column].fillna("").astype(str).str.strip()
+    rows = len(df)
+    df = df.drop_duplicates(subset=["metric", "brand", "year", "country"], keep="last")
+    report["merged"] = rows - len(df)
+
+    coded = {"dataset": dataset, "year": df["year"].astype(int), "value": df["value"]}
+    for column, kind in ENCODED_COLUMNS.items():
+        # A missing source is stored as NULL rather than coded
+        values = df[column][df[column] != ""] if column == "source_url" else df[column]
+        coded[f"{kind}_id"] = df[column].map(encode(engine, kind, values.unique())).astype("Int64")
+    frame = pd.DataFrame(coded)
+    frame = frame.astype(object).where(frame.notna(), None)
+    records = frame.to_dict("records")
+
+    with engine.begin() as conn:
+        conn.execute(delete(metric_series).where(metric_series.c.dataset == dataset))
+        for batch in _batches(records, INSERT_BATCH_ROWS):
+            conn.execute(insert(metric_series), batch)
+        bump_data_version(conn, dataset, len(records))
+    report["stored"] = len(records)
+    return report
+
+
+def has_dataset(conn, dataset: str) -> bool:
+    """
+    Whether `dataset` was loaded into metric_series (other uploaded tables
+    have data versions too).
+    """
+    return conn.execute(
+        select(metric_series.c.dataset).where(metric_series.c.dataset == dataset).limit(1)
+    ).first() is not None
+
+
+def query_series(conn, dataset: str, metrics, brands=None, countries=None, year_from=None, year_to=None):
+    """
+    Series of `dataset` for the given metrics, restricted to the given
+    brands, countries and year range, as
+    [{metric, brand, country, points: [{year, value}], sources}] sorted by
+    metric, brand and country. Names are matched exactly, as uploaded;
+    unknown names match nothing. Served from the metric_series primary key.
+    """
+    metric_ids = lookup(conn, "metric", metrics)
+    if not metric_ids:
+        return []
+    query = select(metric_series).where(
+        metric_series.c.dataset == dataset,
+        metric_series.c.metric_id.in_(list(metric_ids.values())),
+    )
+    for column, kind, values in (("brand_id", "brand", brands), ("country_id", "country", countries)):
+        if values:
+            ids = lookup(conn, kind, values)
+            if not ids:
+                return []
+            query = query.where(metric_series.c[column].in_(list(ids.values())))
+    if year_from is not None:
+        query = query.where(metric_series.c.year >= year_from)
+    if year_to is not None:
+        query = query.where(metric_series.c.year <= year_to)
+
+    rows = conn.execute(query).all()
+    names = decode(conn, {id_ for r in rows for id_ in (r.metric_id, r.brand_id, r.country_id, r.source_id) if id_ is not None})
+    series = defaultdict(lambda: {"points": [], "sources": set()})
+    for r in rows:
+        entry = series[(names[r.metric_id], names[r.brand_id], names[r.country_id])]
+        entry["points"].append({"year": r.year, "value": r.value})
+        if r.source_id is not None:
+            entry["sources"].add(names[r.source_id])
+    return [
+        {
+            "metric": metric, "brand": brand, "country": country,
+            "points": sorted(entry["points"], key=lambda p: p["year"]),
+            "sources": sorted(entry["sources"]),
+        }
+        for (metric, brand, country), entry in sorted(series.items())
+    ]
@@ -0,0 +1,103 @@
+import threading
+import time
+
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import REGISTRY, GaugeMetricFamily
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+from app.utils.timing import PHASE_BUCKETS
+
+POOL_WAIT_SECONDS = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting for a connection from the pool",
+    ["engine"],
+    buckets=PHASE_BUCKETS,
+)
+POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total",
+    "Checkouts that gave up after DB_POOL_TIMEOUT",
+    ["engine"],
+)
+
+# Engines whose pools are exported, by name
+_engines = {}
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that counts callers waiting for a connection and records how
+    long each checkout waited.
+    """
+    label = "main"
+
+    def __init__(self, *args, **kw):
+        super().__init__(*args, **kw)
+        self.waiting = 0
+        self._waiting_lock = threading.Lock()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        with self._waiting_lock:
+            self.waiting += 1
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            POOL_TIMEOUTS.labels(self.label).inc()
+            raise
+        finally:
+            with self._waiting_lock:
+                self.waiting -= 1
+            POOL_WAIT_SECONDS.labels(self.label).observe(time.perf_counter() - start)
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep exporting under the same name
+        pool = super().recreate()
+        pool.label = self.label
+        return pool
+
+
+def watch_engine(name: str, engine):
+    engine.pool.label = name
+    _engines[name] = engine
+
+
+def pool_snapshot():
+    """
+    Live state of each watched pool: configured size, connections checked
+    out / idle, overflow in use and callers waiting for a connection.
+    """
+    snapshot = {}
+    for name, engine in _engines.items():
+        pool = engine.pool
+        if not isinstance(pool, QueuePool):
+            snapshot[name] = {"pool": type(pool).__name__}
+            continue
+        snapshot[name] = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "waiting": getattr(pool, "waiting", 0),
+        }
+    return snapshot
+
+
+class PoolCollector:
+    """
+    Exports pool_snapshot() as db_pool_* gauges on each scrape.
+    """
+
+    def collect(self):
+        gauges = {
+            key: GaugeMetricFamily(f"db_pool_{key}", f"Connection pool {key.replace('_', ' ')}", labels=["engine"])
+            for key in ("size", "checked_out", "checked_in", "overflow", "waiting")
+        }
+        for name, stats in pool_snapshot().items():
+            for key, gauge in gauges.items():
+                if key in stats:
+                    gauge.add_metric([name], stats[key])
+        yield from gauges.values()
+
+
+REGISTRY.register(PoolCollector())
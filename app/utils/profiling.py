@@ -0,0 +1,146 @@
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Profiling state of the request being served, None when it is not profiled
+_session: ContextVar = ContextVar("chart_profiling", default=None)
+
+# Aggregated cost per chart ("dashboard_id/tab/chart_id") over profiled runs
+chart_stats = defaultdict(lambda: {
+    "runs": 0, "wall_ms": 0.0, "cpu_ms": 0.0, "rows": 0, "points": 0, "peak_alloc_bytes": 0,
+})
+_stats_lock = threading.Lock()
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+
+
+class ChartProfile:
+    """
+    Cost of one chart in one run: wall and CPU time spent in add() and
+    result(), rows fed, points returned and peak traced allocation.
+    """
+
+    def __init__(self):
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.rows = 0
+        self.points = 0
+        self.retained = 0
+        self.peak = 0
+
+    def as_dict(self):
+        return {
+            "wall_ms": round(self.wall * 1000, 3),
+            "cpu_ms": round(self.cpu * 1000, 3),
+            "rows": self.rows,
+            "points": self.points,
+            "peak_alloc_bytes": self.peak,
+        }
+
+
+class ProfileSession:
+    """
+    Per-request profiling state; `attach` adds each chart's profile to its
+    payload. Profiles are keyed by accumulator identity.
+    """
+
+    def __init__(self, attach: bool = False):
+        self.attach = attach
+        self.profiles = {}
+
+    def profile_for(self, acc) -> ChartProfile:
+        return self.profiles.setdefault(id(acc), ChartProfile())
+
+
+def current_session():
+    return _session.get()
+
+
+@contextmanager
+def profiling(attach: bool = False):
+    """
+    Profiles the charts computed inside the block (including worker threads
+    started from it). Allocation tracking turns tracemalloc on for the
+    duration, which slows every thread down, so this is opt-in only; the
+    peaks of concurrent profiled requests can overlap.
+    """
+    global _tracing_users
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _tracing_users += 1
+    token = _session.set(ProfileSession(attach))
+    try:
+        yield
+    finally:
+        _session.reset(token)
+        with _tracing_lock:
+            _tracing_users -= 1
+            if _tracing_users == 0 and tracemalloc.is_tracing():
+                tracemalloc.stop()
+
+
+@contextmanager
+def measure(profile: ChartProfile):
+    """
+    Adds the wall time, CPU time and allocation of the block to `profile`.
+    Memory retained by earlier blocks counts towards later peaks, so the
+    peak approximates the chart's largest footprint over the run.
+    """
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    wall, cpu = time.perf_counter(), time.thread_time()
+    try:
+        yield
+    finally:
+        profile.wall += time.perf_counter() - wall
+        profile.cpu += time.thread_time() - cpu
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            profile.peak = max(profile.peak, profile.retained + peak - base)
+            profile.retained += current - base
+
+
+def count_points(chart) -> int:
+    y_axis = chart.get("y-axis")
+    if isinstance(y_axis, list):
+        return len(y_axis)
+    if isinstance(y_axis, dict):
+        return sum(len(v) if isinstance(v, list) else 1 for v in y_axis.values())
+    return 0 if y_axis is None else 1
+
+
+def record_profile(acc, profile: ChartProfile):
+    dashboard_id, tab = getattr(acc, "registry", (None, None))
+    with _stats_lock:
+        stats = chart_stats[f"{dashboard_id}/{tab}/{acc.id}"]
+        stats["runs"] += 1
+        stats["wall_ms"] += profile.wall * 1000
+        stats["cpu_ms"] += profile.cpu * 1000
+        stats["rows"] += profile.rows
+        stats["points"] += profile.points
+        stats["peak_alloc_bytes"] = max(stats["peak_alloc_bytes"], profile.peak)
+
+
+def profile_report():
+    """
+    Per-chart totals and per-run averages, most expensive charts first.
+    """
+    with _stats_lock:
+        items = [(key, dict(stats)) for key, stats in chart_stats.items()]
+    report = []
+    for key, stats in items:
+        runs = stats["runs"] or 1
+        report.append({
+            "chart": key,
+            **stats,
+            "avg_wall_ms": round(stats["wall_ms"] / runs, 3),
+            "avg_cpu_ms": round(stats["cpu_ms"] / runs, 3),
+            "avg_rows": stats["rows"] // runs,
+        })
+    return sorted(report, key=lambda entry: entry["avg_wall_ms"], reverse=True)
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+
+from app.config import settings
+
+slow_log = logging.getLogger("app.slow_query")
+
+# Literals that vary between otherwise identical statements
+_NUMBER = re.compile(r"\b\d+(\.\d+)?\b")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_PARAM_LIST = re.compile(r"\((\s*(\?|%\(\w+\)s|:\w+)\s*,)+\s*(\?|%\(\w+\)s|:\w+)\s*\)")
+_SPACE = re.compile(r"\s+")
+
+# statement -> fingerprint, bounded so ad-hoc SQL cannot grow it forever
+_fingerprints = OrderedDict()
+_FINGERPRINT_CACHE_SIZE = 1024
+
+_lock = threading.Lock()
+query_stats = defaultdict(lambda: {"statement": "", "count": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0, "bytes": 0})
+slow_queries = deque(maxlen=settings.SLOW_QUERY_LOG_SIZE)
+# fingerprint -> (engine, statement, parameters) of its latest slow run, for plan capture
+_slow_samples = {}
+
+
+def fingerprint(statement: str):
+    """
+    Returns (fingerprint id, normalized statement): literals become ?,
+    parameter lists collapse to (?+) and whitespace is squashed, so the same
+    query with different values or IN-list lengths shares one fingerprint.
+    Cached per statement string, so fast paths only pay a dict lookup.
+    """
+    cached = _fingerprints.get(statement)
+    if cached is not None:
+        return cached
+    normalized = _STRING.sub("?", statement)
+    normalized = _NUMBER.sub("?", normalized)
+    normalized = _PARAM_LIST.sub("(?+)", normalized)
+    normalized = _SPACE.sub(" ", normalized).strip()
+    result = (hashlib.sha1(normalized.encode()).hexdigest()[:12], normalized)
+    with _lock:
+        _fingerprints[statement] = result
+        if len(_fingerprints) > _FINGERPRINT_CACHE_SIZE:
+            _fingerprints.popitem(last=False)
+    return result
+
+
+def _finish(engine, statement, parameters, rows, nbytes, seconds):
+    fp, normalized = fingerprint(statement)
+    ms = seconds * 1000
+    with _lock:
+        stats = query_stats[fp]
+        stats["statement"] = normalized
+        stats["count"] += 1
+        stats["total_ms"] += ms
+        stats["max_ms"] = max(stats["max_ms"], ms)
+        stats["rows"] += max(rows, 0)
+        stats["bytes"] += nbytes
+    if ms < settings.SLOW_QUERY_MS:
+        return
+    entry = {
+        "at": datetime.now(timezone.utc).isoformat(),
+        "fingerprint": fp,
+        "statement": normalized[:2000],
+        "duration_ms": round(ms, 1),
+        "rows": rows,
+        "bytes": nbytes,
+    }
+    with _lock:
+        slow_queries.append(entry)
+        _slow_samples[fp] = (engine, statement, parameters)
+    slow_log.warning(json.dumps(entry))
+
+
+def install_query_log(engine):
+    """
+    Times every statement run on `engine`. Statements executed for streamed
+    results (yield_per / stream_results) are finished by finish_streamed()
+    once their rows have been fetched; others are finished right after
+    execution with the driver's rowcount.
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_log_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_query_log_start", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        options = context.execution_options
+        if options.get("yield_per") or options.get("stream_results"):
+            context._query_log_pending = (statement, parameters, elapsed)
+            return
+        _finish(engine, statement, parameters, cursor.rowcount, 0, elapsed)
+
+
+def finish_streamed(result, rows: int, nbytes: int, fetch_seconds: float):
+    """
+    Completes the record of a streamed query with the rows and (approximate)
+    bytes fetched and the time spent fetching them.
+    """
+    context = getattr(result, "context", None)
+    pending = getattr(context, "_query_log_pending", None)
+    if pending is None:
+        return
+    statement, parameters, elapsed = pending
+    context._query_log_pending = None
+    _finish(context.root_connection.engine, statement, parameters, rows, nbytes, elapsed + fetch_seconds)
+
+
+def row_bytes(row) -> int:
+    """
+    Rough size of a fetched row: text and binary by length, other values
+    counted as 8 bytes. Callers estimate a partition from one of its rows.
+    """
+    size = 0
+    for value in row:
+        if isinstance(value, (str, bytes)):
+            size += len(value)
+        elif value is not None:
+            size += 8
+    return size
+
+
+# Estimated-plan statements per dialect; nothing is executed for real
+_EXPLAIN = {
+    "mssql": ("SET SHOWPLAN_XML ON", "SET SHOWPLAN_XML OFF"),
+    "sqlite": "EXPLAIN QUERY PLAN ",
+    "postgresql": "EXPLAIN ",
+    "duckdb": "EXPLAIN ",
+    "mysql": "EXPLAIN ",
+}
+
+
+def capture_plan(fp: str):
+    """
+    Captures the estimated plan of the latest slow run of fingerprint `fp`,
+    replaying its statement and parameters on a fresh connection.
+    Returns None when no slow run of `fp` has been recorded.
+    """
+    with _lock:
+        sample = _slow_samples.get(fp)
+    if sample is None:
+        return None
+    engine, statement, parameters = sample
+    explain = _EXPLAIN.get(engine.dialect.name)
+    if explain is None:
+        raise NotImplementedError(f"Plan capture is not supported for {engine.dialect.name}")
+    with engine.connect() as conn:
+        if isinstance(explain, tuple):
+            on, off = explain
+            conn.exec_driver_sql(on)
+            try:
+                rows = conn.exec_driver_sql(statement, parameters).fetchall()
+            finally:
+                conn.exec_driver_sql(off)
+        else:
+            rows = conn.exec_driver_sql(explain + statement, parameters).fetchall()
+    return {"fingerprint": fp, "dialect": engine.dialect.name, "plan": [list(map(str, row)) for row in rows]}
+
+
+def query_report():
+    with _lock:
+        stats = [{"fingerprint": fp, **dict(s)} for fp, s in query_stats.items()]
+        slow = list(slow_queries)
+    stats.sort(key=lambda s: s["total_ms"], reverse=True)
+    return {"threshold_ms": settings.SLOW_QUERY_MS, "statements": stats, "slow": slow}
@@ -0,0 +1,108 @@
+import asyncio
+import time
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute budgets (0 = unlimited), as
+    LLM APIs enforce them. Both refill continuously; acquire() waits until
+    the request fits and reserves its estimated tokens, settle() corrects
+    the reservation once the actual usage is known. Waiters are served in
+    arrival order. Must be used from a single event loop.
+    """
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.waited = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed, self._updated = now - self._updated, now
+        if self.requests_per_minute:
+            self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        if self.tokens_per_minute:
+            self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def _wait_time(self, tokens: float) -> float:
+        wait = 0.0
+        if self.requests_per_minute and self._requests < 1:
+            wait = (1 - self._requests) * 60 / self.requests_per_minute
+        if self.tokens_per_minute and self._tokens < tokens:
+            wait = max(wait, (tokens - self._tokens) * 60 / self.tokens_per_minute)
+        return wait
+
+    async def acquire(self, tokens: int = 0):
+        # A request larger than the whole budget only waits for a full bucket
+        tokens = min(tokens, self.tokens_per_minute) if self.tokens_per_minute else 0
+        async with self._lock:
+            while True:
+                self._refill()
+                wait = self._wait_time(tokens)
+                if wait <= 0:
+                    break
+                self.waited += wait
+                await asyncio.sleep(wait)
+            if self.requests_per_minute:
+                self._requests -= 1
+            self._tokens -= tokens
+
+    def settle(self, reserved: int, used: int):
+        """
+        Returns unused reserved tokens to the budget, or charges the excess;
+        the budget may go negative, delaying later requests.
+        """
+        if not self.tokens_per_minute:
+            return
+        self._refill()
+        reserved = min(reserved, self.tokens_per_minute)
+        self._tokens = min(self.tokens_per_minute, self._tokens + reserved - used)
+
+
+class AdaptiveConcurrency:
+    """
+    Limit on concurrent requests that adapts to how the server copes: halved
+    when a response cannot be parsed (often a truncated answer) or a request
+    takes longer than `target_latency` seconds, and raised by one when
+    requests succeed well within it, between 1 and `max_limit`. Used as an
+    async context manager around each request. Must be used from a single
+    event loop.
+    """
+
+    def __init__(self, max_limit: int, target_latency: float):
+        self.max_limit = max_limit
+        self.limit = max_limit
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self._changed = asyncio.Condition()
+        self.stats = {"shrinks": 0, "grows": 0}
+
+    async def __aenter__(self):
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def __aexit__(self, *exc):
+        async with self._changed:
+            self.in_flight -= 1
+            self._changed.notify_all()
+
+    def observe(self, seconds: float, ok: bool):
+        """
+        Adjusts the limit after one request.
+        """
+        if not ok or seconds > self.target_latency:
+            limit = max(1, self.limit // 2)
+        elif seconds < self.target_latency / 2:
+            limit = min(self.max_limit, self.limit + 1)
+        else:
+            return
+        if limit < self.limit:
+            self.stats["shrinks"] += 1
+        elif limit > self.limit:
+            self.stats["grows"] += 1
+        self.limit = limit
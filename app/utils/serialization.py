@@ -0,0 +1,73 @@
+import decimal
+
+import orjson
+from fastapi.responses import Response
+
+from app.utils.timing import phase
+
+# NumPy arrays/scalars and int dict keys (e.g. years) are encoded natively
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj):
+    """
+    Fallback for the few types orjson does not encode by itself.
+    """
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if hasattr(obj, "item"):
+        # NumPy scalars orjson skips (e.g. float16) and pandas scalars
+        return obj.item()
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content) -> bytes:
+    """
+    Encodes chart payloads straight to UTF-8 JSON bytes (the "json" phase of
+    a timed request).
+    """
+    with phase("json"):
+        return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+class ChartJSONResponse(Response):
+    """
+    JSON response for chart payloads, encoded with orjson.
+    Bytes are sent as they are, so cached payloads that were encoded once
+    with dumps() are not decoded and re-encoded on every hit.
+    Endpoints should return this response directly: a plain dict return value
+    would still be walked by FastAPI's jsonable_encoder first.
+    """
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        if isinstance(content, (bytes, bytearray, memoryview)):
+            return bytes(content)
+        return dumps(content)
+
+
+# Media types of the streamed chart formats
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "array": "application/json",
+}
+
+
+def ndjson_lines(charts):
+    """
+    Encodes an iterable of charts as newline-delimited JSON, one line per chart.
+    """
+    for chart in charts:
+        yield dumps(chart) + b"\n"
+
+
+def json_array_chunks(charts):
+    """
+    Encodes an iterable of charts as one JSON array, one chunk per element.
+    """
+    yield b"["
+    for i, chart in enumerate(charts):
+        yield b"," + dumps(chart) if i else dumps(chart)
+    yield b"]"
@@ -0,0 +1,32 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent computations: the first caller for a key
+    starts the work and every caller that arrives while it is running awaits
+    the same task instead of repeating it. Nothing is cached once it finishes.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self.stats = {"computed": 0, "coalesced": 0}
+
+    async def run(self, key, func, *args):
+        """
+        Awaits the coroutine function `func(*args)`, or joins the run already
+        in flight for `key`, and returns its result (or raises its exception).
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            self.stats["computed"] += 1
+            task = asyncio.ensure_future(func(*args))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+        # A caller that goes away must not cancel the work the others await
+        return await asyncio.shield(task)
+
+    def snapshot(self):
+        return {**self.stats, "in_flight": len(self._inflight)}
@@ -0,0 +1,82 @@
+import base64
+import gzip
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, select, update
+
+from app.models.datapoints import Dashboard, DashboardTab
+
+dashboards = Dashboard.__table__
+dashboard_tabs = DashboardTab.__table__
+
+
+def version_key(versions) -> str:
+    """
+    The data versions a payload was computed from, as stored with snapshots
+    ("table:version,..." sorted by table).
+    """
+    return ",".join(f"{name}:{versions[name][0]}" for name in sorted(versions))
+
+
+def store_snapshot(conn, dashboard_id: str, tab: str, body: bytes, data_version: str):
+    """
+    Saves the encoded default payload of a tab as its snapshot in
+    dashboard_tabs.tab_data, gzipped (base64 in the Text column) and tagged
+    with `data_version`, replacing the previous one. The dashboards row the
+    tab belongs to is created if missing. `conn` is a Connection or Session;
+    the caller commits.
+    """
+    if conn.execute(select(dashboards.c.id).where(dashboards.c.id == dashboard_id)).first() is None:
+        conn.execute(insert(dashboards).values(id=dashboard_id, name=dashboard_id))
+    values = {
+        "tab_data": base64.b64encode(gzip.compress(body, compresslevel=6, mtime=0)).decode("ascii"),
+        "data_version": data_version,
+        "created_at": datetime.now(timezone.utc).replace(tzinfo=None),
+    }
+    result = conn.execute(
+        update(dashboard_tabs)
+        .where(dashboard_tabs.c.dashboard_id == dashboard_id, dashboard_tabs.c.tab_name == tab)
+        .values(**values)
+    )
+    if result.rowcount == 0:
+        conn.execute(insert(dashboard_tabs).values(id=str(uuid.uuid4()), dashboard_id=dashboard_id, tab_name=tab, **values))
+
+
+def load_snapshot(conn, dashboard_id: str, tab: str, data_version: str):
+    """
+    The gzipped payload of a tab's snapshot if it was rendered from
+    `data_version`, else None (no snapshot yet, or the data changed since).
+    """
+    tab_data = conn.execute(
+        select(dashboard_tabs.c.tab_data)
+        .where(
+            dashboard_tabs.c.dashboard_id == dashboard_id,
+            dashboard_tabs.c.tab_name == tab,
+            dashboard_tabs.c.data_version == data_version,
+        )
+    ).scalar()
+    return base64.b64decode(tab_data) if tab_data else None
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """
+    Whether an Accept-Encoding header value allows a gzip response: gzip (or
+    "*" when gzip is not listed) with a non-zero q-value.
+    """
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities.get("gzip", qualities.get("*", 0.0)) > 0
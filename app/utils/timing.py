@@ -0,0 +1,87 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import Histogram
+
+# Phase timings of the request being served. Worker threads started with
+# asyncio.to_thread (and Starlette's threadpool) run in a copy of the request
+# context, so they record into the same object.
+_timings: ContextVar = ContextVar("request_timings", default=None)
+
+PHASE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+DASHBOARD_PHASE_SECONDS = Histogram(
+    "dashboard_phase_seconds",
+    "Time spent in each phase of a dashboard request",
+    ["dashboard_id", "tab", "phase"],
+    buckets=PHASE_BUCKETS,
+)
+DASHBOARD_REQUEST_SECONDS = Histogram(
+    "dashboard_request_seconds",
+    "Total time to serve a dashboard request",
+    ["dashboard_id", "tab"],
+    buckets=PHASE_BUCKETS,
+)
+UPLOAD_PHASE_SECONDS = Histogram(
+    "upload_phase_seconds",
+    "Time spent in each phase of a raw data upload",
+    ["phase"],
+    buckets=PHASE_BUCKETS,
+)
+
+
+class RequestTimings:
+    """
+    Seconds spent per phase (reflection, sql, materialization, aggregation,
+    json, ...) while serving one request.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = defaultdict(float)
+
+    def add(self, name: str, seconds: float):
+        self.phases[name] += seconds
+
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """
+        Server-Timing header value, durations in milliseconds.
+        """
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.phases.items()]
+        entries.append(f"total;dur={self.total() * 1000:.1f}")
+        return ", ".join(entries)
+
+    def observe(self, dashboard_id: str, tab: str):
+        for name, seconds in self.phases.items():
+            DASHBOARD_PHASE_SECONDS.labels(dashboard_id, tab, name).observe(seconds)
+        DASHBOARD_REQUEST_SECONDS.labels(dashboard_id, tab).observe(self.total())
+
+
+def start_timings() -> RequestTimings:
+    timings = RequestTimings()
+    _timings.set(timings)
+    return timings
+
+
+def record(name: str, seconds: float):
+    timings = _timings.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+@contextmanager
+def phase(name: str):
+    """
+    Adds the time spent in the block to phase `name` of the current request
+    (a no-op outside a timed request).
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
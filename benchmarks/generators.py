@@ -0,0 +1,221 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from app.database import Base
+from app.models.datapoints import AutoMobileData
+from app.utils.data_versions import bump_data_version
+
+# Distinct values per dimension; override with --cardinality name=count
+DEFAULT_CARDINALITIES = {
+    "oem": 15,
+    "dealer": 300,
+    "city": 60,
+    "region": 5,
+    "brand": 40,
+    "product": 500,
+}
+
+# Rows generated and inserted per chunk, so 10M-row tables never sit in memory
+CHUNK_ROWS = 50_000
+
+COUNTRIES = ["India", "Nepal", "Sri Lanka", "Bangladesh"]
+COUNTRY_P = [0.85, 0.05, 0.05, 0.05]
+SEGMENTS = ["Hatchback", "Sedan", "SUV", "MUV", "Luxury"]
+SEGMENT_P = [0.35, 0.2, 0.3, 0.1, 0.05]
+SEGMENT_PRICE = np.array([600_000, 1_000_000, 1_500_000, 1_200_000, 5_000_000])
+FUELS = ["Petrol", "Diesel", "CNG", "Electric", "Hybrid"]
+FUEL_P = [0.45, 0.25, 0.1, 0.12, 0.08]
+CUSTOMER_TYPES = ["Individual", "Fleet", "Corporate"]
+CUSTOMER_TYPE_P = [0.75, 0.15, 0.1]
+LEAD_SOURCES = ["Walk-in", "Online", "Website", "Digital", "Referral", "Dealer Event"]
+COLORS = ["White", "Silver", "Black", "Red", "Blue", "Grey"]
+CHANNELS = ["Modern Trade", "General Trade", "E-commerce", "Quick Commerce"]
+PROMOTIONS = ["None", "Discount", "BOGO", "Bundle", "Cashback"]
+CATEGORIES = ["Personal Care", "Food", "Beverages", "Home Care", "Health"]
+FMCG_CUSTOMER_TYPES = ["Retail", "Wholesale", "Online", "Institutional"]
+
+START_DATE = np.datetime64("2021-01-01")
+
+
+def _names(prefix: str, count: int):
+    return np.array([f"{prefix} {i:0{len(str(count))}d}" for i in range(count)], dtype=object)
+
+
+def _skewed(rng, count: int, size: int):
+    """
+    Indices in [0, count) with a Zipf-like skew, so a few OEMs, dealers and
+    cities carry most of the volume as they do in real data.
+    """
+    weights = 1.0 / np.arange(1, count + 1) ** 1.1
+    return rng.choice(count, size=size, p=weights / weights.sum())
+
+
+def _pick(rng, values, size, p=None):
+    return np.asarray(values, dtype=object)[rng.choice(len(values), size=size, p=p)]
+
+
+def _yes_no(rng, size: int, p_yes: float):
+    return np.where(rng.random(size) < p_yes, "Yes", "No").astype(object)
+
+
+def auto_mobile_frames(rows: int, cardinalities=None, seed: int = 0, chunk_rows: int = CHUNK_ROWS):
+    """
+    Yields DataFrames of synthetic auto_mobile_data rows (the columns of
+    AutoMobileData), `chunk_rows` at a time. Dealers and cities map onto
+    regions and states, EV fields are only set for electric vehicles and
+    prices follow the segment.
+    """
+    card = {**DEFAULT_CARDINALITIES, **(cardinalities or {})}
+    rng = np.random.default_rng(seed)
+    oems, dealers = _names("OEM", card["oem"]), _names("Dealer", card["dealer"])
+    cities, regions = _names("City", card["city"]), _names("Region", card["region"])
+    states = _names("State", max(1, card["city"] // 3))
+    salespeople = _names("Salesperson", 1000)
+    for offset in range(0, rows, chunk_rows):
+        n = min(chunk_rows, rows - offset)
+        oem = _skewed(rng, card["oem"], n)
+        city = _skewed(rng, card["city"], n)
+        dealer = _skewed(rng, card["dealer"], n)
+        segment = rng.choice(len(SEGMENTS), size=n, p=SEGMENT_P)
+        fuel = _pick(rng, FUELS, n, FUEL_P)
+        electric = fuel == "Electric"
+        customer_type = _pick(rng, CUSTOMER_TYPES, n, CUSTOMER_TYPE_P)
+
+        booking = START_DATE + rng.integers(0, 4 * 365, n).astype("timedelta64[D]")
+        sale = booking + rng.integers(0, 10, n).astype("timedelta64[D]")
+        delivery = sale + rng.integers(1, 60, n).astype("timedelta64[D]")
+        sale = np.where(rng.random(n) < 0.02, np.datetime64("NaT"), sale)
+
+        unit_price = (SEGMENT_PRICE[segment] * rng.lognormal(0, 0.15, n)).astype(np.int64)
+        units = np.where(customer_type == "Individual", 1, rng.integers(1, 6, n))
+        discount = (unit_price * rng.uniform(0, 0.1, n)).astype(np.int64)
+
+        yield pd.DataFrame({
+            "invoice_id": [f"INV{i:010d}" for i in range(offset, offset + n)],
+            "booking_date": booking,
+            "delivery_date": delivery,
+            "sale_date": sale,
+            "oem_name": oems[oem],
+            "dealer_name": dealers[dealer],
+            "region": regions[dealer % card["region"]],
+            "country": _pick(rng, COUNTRIES, n, COUNTRY_P),
+            "state": states[city % len(states)],
+            "city": cities[city],
+            "vehicle_segment": np.asarray(SEGMENTS, dtype=object)[segment],
+            "vehicle_model": [f"{oems[o]} M{m}" for o, m in zip(oem, rng.integers(0, 8, n))],
+            "variant": _pick(rng, ["Base", "Mid", "Top"], n),
+            "year": booking.astype("datetime64[Y]").astype(int) + 1970,
+            "fuel_type": fuel,
+            "transmission_type": _pick(rng, ["Manual", "Automatic"], n, [0.6, 0.4]),
+            "engine_displacement_cc": np.where(electric, 0, rng.choice([1000, 1200, 1500, 2000, 2500], n)),
+            "color": _pick(rng, COLORS, n),
+            "type_of_fuel_used_postsale": fuel,
+            "range_km": np.where(electric, rng.uniform(150, 550, n), np.nan),
+            "battery_capacity_kwh": np.where(electric, rng.uniform(20, 90, n), np.nan),
+            "charging_time_hours": np.where(electric, rng.uniform(0.5, 10, n), np.nan),
+            "competitor_model_name": [f"{oems[o]} M{m}" for o, m in zip(rng.integers(0, card["oem"], n), rng.integers(0, 8, n))],
+            "competitor_oem": oems[rng.integers(0, card["oem"], n)],
+            "competitor_price": (unit_price * rng.uniform(0.85, 1.15, n)).astype(np.int64),
+            "market_share_in_region": rng.uniform(0, 25, n),
+            "salesperson_name": salespeople[rng.integers(0, len(salespeople), n)],
+            "units_sold": units,
+            "unit_price": unit_price,
+            "discount_offered": discount,
+            "final_price_after_discount": ((unit_price - discount) * units).astype(float),
+            "customer_type": customer_type,
+            "finance_opted_yesno": _yes_no(rng, n, 0.55),
+            "financing_partner": _pick(rng, ["Bank A", "Bank B", "NBFC C", "Captive"], n),
+            "exchange_vehicle_offered": _yes_no(rng, n, 0.25),
+            "lead_source": _pick(rng, LEAD_SOURCES, n),
+            "promotion_scheme_applied": _pick(rng, ["None", "Festive", "Year End", "Corporate"], n),
+            "accessories_bundle": _pick(rng, ["None", "Basic", "Premium"], n),
+            "free_services_offered": rng.integers(0, 6, n),
+            "nps_customer_feedback": rng.integers(0, 11, n),
+            "complaint_registered_yn": _yes_no(rng, n, 0.08),
+            "delivery_rating_15": rng.integers(1, 6, n),
+        })
+
+
+def fmcg_frames(rows: int, cardinalities=None, seed: int = 0, chunk_rows: int = CHUNK_ROWS):
+    """
+    Yields DataFrames of synthetic table_fmcg rows with the columns the FMCG
+    tab charts and filters read, `chunk_rows` at a time.
+    """
+    card = {**DEFAULT_CARDINALITIES, **(cardinalities or {})}
+    rng = np.random.default_rng(seed + 1)
+    brands, products = _names("Brand", card["brand"]), _names("Product", card["product"])
+    regions = _names("Region", card["region"])
+    for offset in range(0, rows, chunk_rows):
+        n = min(chunk_rows, rows - offset)
+        product = _skewed(rng, card["product"], n)
+        units = rng.integers(1, 500, n)
+        price = rng.uniform(10, 500, n).round(2)
+        revenue = (units * price).round(2)
+        cost = (revenue * rng.uniform(0.5, 0.9, n)).round(2)
+        yield pd.DataFrame({
+            "date": START_DATE + rng.integers(0, 3 * 365, n).astype("timedelta64[D]"),
+            "region": regions[_skewed(rng, card["region"], n)],
+            "market": _pick(rng, COUNTRIES, n, COUNTRY_P),
+            "brand": brands[product % card["brand"]],
+            "category": np.asarray(CATEGORIES, dtype=object)[product % len(CATEGORIES)],
+            "product_name": products[product],
+            "channel": _pick(rng, CHANNELS, n),
+            "promotion_type": _pick(rng, PROMOTIONS, n),
+            "customer_type": _pick(rng, FMCG_CUSTOMER_TYPES, n),
+            "units_sold": units,
+            "selling_price": price,
+            "revenue": revenue,
+            "cost_to_company": cost,
+            "profit": (revenue - cost).round(2),
+            "market_share_": rng.uniform(0, 30, n).round(2),
+            "brand_penetration_": rng.uniform(0, 60, n).round(2),
+            "delivery_time_days": rng.integers(1, 15, n),
+            "stock_on_hand": rng.integers(0, 5000, n),
+            "out_of_stock_flag": _yes_no(rng, n, 0.07),
+            "customer_feedback_score": rng.integers(1, 6, n),
+            "returned_units": rng.binomial(units, 0.02),
+        })
+
+
+def load_auto_mobile(engine, rows: int, cardinalities=None, seed: int = 0):
+    """
+    (Re)creates auto_mobile_data from the model and fills it with `rows`
+    synthetic rows, bumping its data version like an upload would.
+    """
+    table = AutoMobileData.__table__
+    Base.metadata.create_all(engine)
+    table.drop(engine)
+    table.create(engine)
+    return _load(engine, table.name, auto_mobile_frames(rows, cardinalities, seed), replace=False)
+
+
+def load_fmcg(engine, rows: int, cardinalities=None, seed: int = 0):
+    """
+    Replaces table_fmcg with `rows` synthetic rows; like uploaded tables it
+    has no model, so its schema comes from the first chunk.
+    """
+    Base.metadata.create_all(engine)
+    return _load(engine, "table_fmcg", fmcg_frames(rows, cardinalities, seed), replace=True)
+
+
+def _load(engine, table_name: str, frames, replace: bool):
+    total = 0
+    for frame in frames:
+        frame.to_sql(table_name, engine, if_exists="replace" if replace and total == 0 else "append", index=False)
+        total += len(frame)
+    with engine.begin() as conn:
+        bump_data_version(conn, table_name, total)
+    return total
+
+
+def auto_mobile_csv(rows: int, cardinalities=None, seed: int = 0) -> bytes:
+    """
+    Synthetic auto_mobile upload as CSV bytes, the input process_data_dump
+    receives from /upload-raw-data/.
+    """
+    buffer = io.StringIO()
+    for i, frame in enumerate(auto_mobile_frames(rows, cardinalities, seed)):
+        frame.to_csv(buffer, header=i == 0, index=False)
+    return buffer.getvalue().encode("utf-8")
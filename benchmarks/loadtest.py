@@ -0,0 +1,212 @@
+"""
+Load test for the dashboard API: concurrent virtual users drive a weighted
+mix of /dashboard-tabs/, /dashboard-tab-kpis/... and raw data uploads, and
+throughput plus p50/p95/p99 latency are reported per route.
+
+    python -m benchmarks.loadtest --launch --users 32 --duration 60 --output load.json
+    python -m benchmarks.loadtest --url http://staging:8000 --users 8
+
+--launch starts `uvicorn app.api:app` locally with the current environment
+(set DATABASE_URL to a local database filled by benchmarks.run) and stops
+it after.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import httpx
+
+# Tabs requested by the mix; kept here so the harness does not import the app
+DASHBOARD_TABS = {
+    "auto_mobile": ["sales", "supply", "customer", "descriptive"],
+    "fmcg": [
+        "global_regional_sales", "supply_chain", "marketing_brand",
+        "financial_profitability", "consumer_insights", "sustainability_compliance",
+    ],
+}
+FILTER_VALUES = {
+    "auto_mobile": [{}, {"region": "Region 0"}, {"oem_name": "OEM 01"}, {"city": "City 02"}],
+    "fmcg": [{}, {"region": "Region 0"}, {"brand": "Brand 01"}],
+}
+
+# Relative weight of each kind of request in the mix (each user uploads to
+# its own table_loadtest_upload_<n>, so uploads neither touch the dashboard
+# tables nor replace a table another upload is still writing)
+DEFAULT_MIX = {"tabs": 2, "tab_kpis": 10, "upload": 1}
+
+UPLOAD_ROWS = 1000
+
+
+def percentile(sorted_values, p: float):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Recorder:
+    """
+    Latencies (ms) and status codes per route template.
+    """
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def add(self, route: str, status, ms: float):
+        self.latencies[route].append(ms)
+        self.statuses[route][str(status)] += 1
+
+    def summary(self, elapsed: float):
+        routes = {}
+        for route, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            routes[route] = {
+                "requests": len(values),
+                "throughput_rps": round(len(values) / elapsed, 2),
+                "p50_ms": round(percentile(values, 50), 2),
+                "p95_ms": round(percentile(values, 95), 2),
+                "p99_ms": round(percentile(values, 99), 2),
+                "max_ms": round(values[-1], 2),
+                "statuses": dict(self.statuses[route]),
+            }
+        total = sum(len(v) for v in self.latencies.values())
+        return {"requests": total, "throughput_rps": round(total / elapsed, 2), "routes": routes}
+
+
+def _next_request(rng: random.Random, mix, upload_payload, user: int):
+    """
+    (route template, method, path, request kwargs) for one request of the mix.
+    """
+    kind = rng.choices(list(mix), weights=list(mix.values()))[0]
+    dashboard_id = rng.choice(list(DASHBOARD_TABS))
+    if kind == "tabs":
+        return "GET /dashboard-tabs/", "GET", "/dashboard-tabs/", {"params": {"dashboard_id": dashboard_id}}
+    if kind == "upload":
+        files = {"file": (f"loadtest_upload_{user}.csv", upload_payload, "text/csv")}
+        return "POST /upload-data/upload-raw-data/", "POST", "/upload-data/upload-raw-data/", {"files": files}
+    tab = rng.choice(DASHBOARD_TABS[dashboard_id])
+    params = rng.choice(FILTER_VALUES[dashboard_id])
+    return f"GET /dashboard-tab-kpis/{dashboard_id}/{tab}", "GET", f"/dashboard-tab-kpis/{dashboard_id}/{tab}", {"params": params}
+
+
+async def _user(client, recorder, stop_at: float, mix, seed: int, upload_payload, think_ms: int):
+    rng = random.Random(seed)
+    while time.monotonic() < stop_at:
+        route, method, path, kwargs = _next_request(rng, mix, upload_payload, seed)
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, path, **kwargs)
+            await response.aread()
+            status = response.status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        recorder.add(route, status, (time.perf_counter() - start) * 1000)
+        if think_ms:
+            await asyncio.sleep(rng.uniform(0, 2 * think_ms) / 1000)
+
+
+async def run_load(base_url: str, users: int, duration: float, mix, think_ms: int = 0, timeout: float = 120.0):
+    recorder = Recorder()
+    upload_payload = b""
+    if mix.get("upload"):
+        from benchmarks.generators import auto_mobile_csv  # imports the app's models
+        upload_payload = auto_mobile_csv(UPLOAD_ROWS)
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        started = time.monotonic()
+        stop_at = started + duration
+        await asyncio.gather(*(
+            _user(client, recorder, stop_at, mix, seed, upload_payload, think_ms) for seed in range(users)
+        ))
+        elapsed = time.monotonic() - started
+    return {"elapsed_s": round(elapsed, 2), **recorder.summary(elapsed)}
+
+
+def _launch(host: str, port: int, workers: int):
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.api:app", "--host", host, "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=os.environ.copy(),
+    )
+    url = f"http://{host}:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+        try:
+            httpx.get(f"{url}/dashboard-tabs/", params={"dashboard_id": "fmcg"}, timeout=1)
+            return process, url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("uvicorn did not start within 60s")
+
+
+def _mix(value: str):
+    name, _, weight = value.partition("=")
+    if name not in DEFAULT_MIX or not weight.isdigit():
+        raise argparse.ArgumentTypeError(f"expected one of {sorted(DEFAULT_MIX)}=<weight>, got '{value}'")
+    return name, int(weight)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="base URL of a running app")
+    target.add_argument("--launch", action="store_true", help="start the app locally with uvicorn")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers when launching")
+    parser.add_argument("--users", type=int, default=16, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run")
+    parser.add_argument("--think-ms", type=int, default=0, help="mean pause between a user's requests")
+    parser.add_argument("--mix", type=_mix, action="append", default=[], help="e.g. upload=1 (weights of tabs/tab_kpis/upload)")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    mix = {**DEFAULT_MIX, **dict(args.mix)}
+    mix = {name: weight for name, weight in mix.items() if weight}
+    process = None
+    url = args.url
+    if args.launch:
+        process, url = _launch("127.0.0.1", args.port, args.workers)
+    try:
+        result = asyncio.run(run_load(url, args.users, args.duration, mix, args.think_ms))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "target": url,
+        "users": args.users,
+        "duration_s": args.duration,
+        "think_ms": args.think_ms,
+        "mix": mix,
+        **result,
+    }
+    print(f"{report['requests']} requests in {report['elapsed_s']} s ({report['throughput_rps']} req/s)")
+    for route, stats in report["routes"].items():
+        print(f"  {route:<60} {stats['throughput_rps']:>8} req/s  p50 {stats['p50_ms']:>9} ms  "
+              f"p95 {stats['p95_ms']:>9} ms  p99 {stats['p99_ms']:>9} ms  {stats['statuses']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Minimal OpenAI-compatible chat completions server for exercising the LLM
+extraction pipeline without a real model. Each non-empty line of the text
+chunk in the prompt becomes one extracted record; latency, error rate and
+malformed responses are configurable.
+
+    python -m benchmarks.mock_openai --port 8600 --latency-ms 800 --error-rate 0.05
+
+then run the extraction with DEEPSEEK_API_KEY=test and
+DEEPSEEK_BASE_URL=http://127.0.0.1:8600/v1; /stats reports the requests and
+the peak number in flight.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI()
+
+# Tuned from the command line
+config = {"latency_ms": 200.0, "jitter_ms": 100.0, "error_rate": 0.0, "bad_json_rate": 0.0}
+stats = {"requests": 0, "errors": 0, "in_flight": 0, "max_in_flight": 0}
+
+
+def _chunk_lines(prompt: str):
+    """
+    Lines between the '---' markers of the extraction prompt.
+    """
+    parts = prompt.split("---")
+    text = parts[1] if len(parts) >= 3 else prompt
+    return [line for line in text.splitlines() if line.strip()]
+
+
+@app.post("/v1/chat/completions")
+@app.post("/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+    stats["in_flight"] += 1
+    stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+    try:
+        await asyncio.sleep(max(0.0, random.gauss(config["latency_ms"], config["jitter_ms"])) / 1000)
+        if random.random() < config["error_rate"]:
+            stats["errors"] += 1
+            status = random.choice([429, 500, 503])
+            return JSONResponse({"error": {"message": "mock failure", "type": "server_error"}}, status_code=status,
+                                headers={"retry-after": "0.1"} if status == 429 else None)
+        prompt = body["messages"][-1]["content"]
+        lines = _chunk_lines(prompt)
+        if random.random() < config["bad_json_rate"]:
+            content = "Here are the records: [{"
+        else:
+            content = json.dumps([{"line": line.strip(), "sales_revenue": len(line)} for line in lines])
+        prompt_tokens = sum(len(m["content"]) for m in body["messages"]) // 4
+        completion_tokens = len(content) // 4
+        return {
+            "id": f"chatcmpl-mock-{stats['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+    finally:
+        stats["in_flight"] -= 1
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--latency-ms", type=float, default=config["latency_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=config["jitter_ms"])
+    parser.add_argument("--error-rate", type=float, default=config["error_rate"], help="fraction of 429/5xx responses")
+    parser.add_argument("--bad-json-rate", type=float, default=config["bad_json_rate"], help="fraction of unparsable answers")
+    args = parser.parse_args(argv)
+    config.update(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate, bad_json_rate=args.bad_json_rate)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
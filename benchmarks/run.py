@@ -0,0 +1,159 @@
+"""
+Benchmarks every dashboard tab (as served by dashboard_tab_kpis_dynamic),
+the batched /dashboard-kpis computation and process_data_dump against a
+local database filled with synthetic data.
+
+    python -m benchmarks.run --db sqlite:///benchmarks.db --rows 10000 100000 1000000 \
+        --cardinality dealer=2000 --output bench.json
+
+The app settings (.env) are loaded on import as usual; the benchmark itself
+only uses the database given with --db, so no SQL Server is needed when
+DATABASE_URL points at a local database (e.g. the same file).
+"""
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy.orm import sessionmaker
+
+from app.database import get_engine
+from app.routers.shared_dashboard import DASHBOARD_TABS, _batch_kpis, _tab_kpis
+from app.routers.upload_data import process_data_dump
+from benchmarks.generators import DEFAULT_CARDINALITIES, auto_mobile_csv, load_auto_mobile, load_fmcg
+
+LOADERS = {"auto_mobile": load_auto_mobile, "fmcg": load_fmcg}
+
+FILTER_NAMES = ("country", "region", "oem_name", "dealer_name", "city", "customer_type", "brand", "category")
+
+# One selective filter per dashboard, matching the generators' most common values
+FILTERED = {
+    "auto_mobile": {"region": "Region 0"},
+    "fmcg": {"region": "Region 0"},
+}
+
+
+def _filters(dashboard_id: str, filtered: bool):
+    filters = dict.fromkeys(FILTER_NAMES)
+    if filtered:
+        filters.update(FILTERED[dashboard_id])
+    return filters
+
+
+def _time(func, repeat: int, warmup: int = 1):
+    """
+    Runs `func` warmup + repeat times; summary of the timed runs in ms.
+    """
+    for _ in range(warmup):
+        func()
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        runs.append((time.perf_counter() - start) * 1000)
+    runs.sort()
+    return {
+        "min_ms": round(runs[0], 2),
+        "median_ms": round(statistics.median(runs), 2),
+        "mean_ms": round(statistics.fmean(runs), 2),
+        "max_ms": round(runs[-1], 2),
+        "runs": len(runs),
+    }
+
+
+def _report_line(result):
+    print(f"  {result['name']:<40} filtered={result['filtered']!s:<5} median {result['median_ms']:>10.2f} ms")
+
+
+def bench_tabs(Session, dashboard_id: str, rows: int, repeat: int):
+    limits = {"top_n": None, "max_points": None}
+    results = []
+    for filtered in (False, True):
+        filters = _filters(dashboard_id, filtered)
+        for tab in DASHBOARD_TABS[dashboard_id]:
+            def run():
+                with Session() as db:
+                    asyncio.run(_tab_kpis(dashboard_id, tab, db, filters, None, limits))
+            stats = _time(run, repeat)
+            results.append({"name": f"{dashboard_id}/{tab}", "filtered": filtered, "rows": rows, **stats,
+                            "rows_per_s": round(rows / (stats["median_ms"] / 1000)) if stats["median_ms"] else None})
+            _report_line(results[-1])
+
+        def run_batch():
+            with Session() as db:
+                asyncio.run(_batch_kpis(dashboard_id, DASHBOARD_TABS[dashboard_id], db, filters, None, limits))
+        stats = _time(run_batch, repeat)
+        results.append({"name": f"{dashboard_id}/all_tabs", "filtered": filtered, "rows": rows, **stats})
+        _report_line(results[-1])
+    return results
+
+
+def bench_ingestion(db_url: str, rows: int, cardinalities, repeat: int):
+    payload = auto_mobile_csv(rows, cardinalities)
+    stats = _time(lambda: process_data_dump(payload, "bench_upload.csv", db_url, "table_bench_upload"), repeat, warmup=0)
+    print(f"  process_data_dump {rows} rows ({len(payload) / 1e6:.1f} MB) median {stats['median_ms']:.2f} ms")
+    return {"name": "process_data_dump", "rows": rows, "bytes": len(payload), **stats,
+            "rows_per_s": round(rows / (stats["median_ms"] / 1000)) if stats["median_ms"] else None}
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _cardinality(value: str):
+    name, _, count = value.partition("=")
+    if name not in DEFAULT_CARDINALITIES or not count.isdigit():
+        raise argparse.ArgumentTypeError(f"expected one of {sorted(DEFAULT_CARDINALITIES)}=<count>, got '{value}'")
+    return name, int(count)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="sqlite:///benchmarks.db", help="database URL (SQLite or DuckDB file)")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000], help="table sizes to benchmark")
+    parser.add_argument("--cardinality", type=_cardinality, action="append", default=[], help="e.g. dealer=2000")
+    parser.add_argument("--dashboards", nargs="+", default=list(DASHBOARD_TABS), choices=list(DASHBOARD_TABS))
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark")
+    parser.add_argument("--ingest-rows", type=int, default=100_000,
+                        help="upper bound on rows sent through process_data_dump (0 to skip)")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    cardinalities = {**DEFAULT_CARDINALITIES, **dict(args.cardinality)}
+    engine = get_engine(args.db)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    results = []
+    for rows in args.rows:
+        print(f"{rows} rows")
+        for dashboard_id in args.dashboards:
+            start = time.perf_counter()
+            LOADERS[dashboard_id](engine, rows, cardinalities)
+            print(f"  loaded {dashboard_id} in {time.perf_counter() - start:.1f} s")
+            results.extend(bench_tabs(Session, dashboard_id, rows, args.repeat))
+        if args.ingest_rows:
+            results.append(bench_ingestion(args.db, min(rows, args.ingest_rows), cardinalities, min(args.repeat, 3)))
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "database": engine.dialect.name,
+        "cardinalities": cardinalities,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
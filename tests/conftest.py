@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# app.database builds its engine at import time from DATABASE_URL; point it
+# at a throwaway SQLite file before any test imports the app
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "tests.db"))
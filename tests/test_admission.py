@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.utils.admission import AdmissionController, AdmissionRejected
+
+
+def _controller(**options):
+    return AdmissionController(**{"max_running": 1, "max_heavy": 1, "max_queued": 4, "heavy_cost": 10, **options})
+
+
+def test_admits_right_away_when_a_slot_is_free():
+    async def run():
+        admission = _controller()
+        token = await admission.acquire(1)
+        assert admission.snapshot()["running"] == 1
+        admission.release(token)
+        assert admission.snapshot() == {"admitted": 1, "queued": 0, "rejected": 0, "running": 0, "running_heavy": 0, "waiting": 0}
+    asyncio.run(run())
+
+
+def test_rejects_with_retry_after_when_the_queue_is_full():
+    async def run():
+        admission = _controller(max_queued=1)
+        token = await admission.acquire(1)
+        waiter = asyncio.ensure_future(admission.acquire(1))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.acquire(1)
+        assert rejected.value.retry_after >= 1
+        assert admission.stats["rejected"] == 1
+        admission.release(token)
+        admission.release(await waiter)
+    asyncio.run(run())
+
+
+def test_cheap_jobs_go_before_heavy_ones():
+    async def run():
+        admission = _controller()
+        token = await admission.acquire(1)
+        order = []
+
+        async def job(name, cost):
+            held = await admission.acquire(cost)
+            order.append(name)
+            admission.release(held)
+
+        jobs = [asyncio.ensure_future(job("heavy", 50)), asyncio.ensure_future(job("cheap", 1))]
+        await asyncio.sleep(0)
+        admission.release(token)
+        await asyncio.gather(*jobs)
+        assert order == ["cheap", "heavy"]
+    asyncio.run(run())
+
+
+def test_heavy_cap_does_not_block_cheap_jobs():
+    async def run():
+        admission = _controller(max_running=2, max_heavy=1)
+        heavy = await admission.acquire(50)
+        blocked = asyncio.ensure_future(admission.acquire(50))
+        await asyncio.sleep(0)
+        cheap = await asyncio.wait_for(admission.acquire(1), 1)
+        assert not blocked.done()
+        admission.release(cheap)
+        admission.release(heavy)
+        admission.release(await blocked)
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def run():
+        admission = _controller()
+        token = await admission.acquire(1)
+        waiter = asyncio.ensure_future(admission.acquire(1))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert admission.snapshot()["waiting"] == 0
+        admission.release(token)
+        assert admission.snapshot()["running"] == 0
+    asyncio.run(run())
+
+
+def test_dashboard_answers_429_with_retry_after(monkeypatch):
+    from app.api import app
+    from app.routers import shared_dashboard
+
+    # Every slot is taken and nothing may queue
+    busy = _controller(max_queued=0)
+    busy.running = 1
+    monkeypatch.setattr(shared_dashboard, "dashboard_admission", busy)
+    tab = shared_dashboard.DASHBOARD_TABS["fmcg"][0]
+    with TestClient(app) as client:
+        response = client.get(f"/dashboard-tab-kpis/fmcg/{tab}", params={"top_n": 3})
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "1"
+    assert busy.stats["rejected"] == 1
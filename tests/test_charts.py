@@ -0,0 +1,101 @@
+from app.utils.charts import PointSample, fold_top_n, top_n_keys
+from app.utils.fmcg_charts import chart_product_performance, chart_return_rate_by_product
+
+
+def test_top_n_keys_none_when_everything_fits():
+    assert top_n_keys({"a": 1, "b": 2}, 2) is None
+    assert top_n_keys({"a": 1, "b": 2}, None) is None
+
+
+def test_top_n_keys_keeps_heaviest_and_first_seen_on_ties():
+    assert top_n_keys({"a": 1, "b": 5, "c": 3}, 2) == {"b", "c"}
+    assert top_n_keys({"a": 2, "b": 2, "c": 2}, 2) == {"a", "b"}
+
+
+def test_fold_top_n_sums_the_tail_last():
+    weights = {"a": 1, "b": 5, "c": 3, "d": 2}
+    totals = {"a": 10, "b": 50, "c": 30, "d": 20}
+    folded_weights, folded_totals = fold_top_n(2, weights, totals)
+    assert list(folded_weights.items()) == [("b", 5), ("c", 3), ("Other", 3)]
+    assert list(folded_totals.items()) == [("b", 50), ("c", 30), ("Other", 30)]
+    assert sum(folded_totals.values()) == sum(totals.values())
+
+
+def test_fold_top_n_unchanged_when_everything_fits():
+    weights, totals = {"a": 1}, {"a": 2}
+    assert fold_top_n(5, weights, totals) == (weights, totals)
+    assert fold_top_n(None, weights, totals) == (weights, totals)
+
+
+def test_fold_top_n_folds_tuple_keys_at_position():
+    weights = {"x": 5, "y": 1, "z": 1}
+    by_month = {("Jan", "x"): 3, ("Jan", "y"): 1, ("Feb", "x"): 2, ("Feb", "z"): 1, ("Feb", "y"): 4}
+    _, folded = fold_top_n(1, weights, by_month, at=1)
+    assert folded == {("Jan", "x"): 3, ("Feb", "x"): 2, ("Jan", "Other"): 1, ("Feb", "Other"): 5}
+
+
+def test_fold_top_n_merges_a_kept_real_other_category():
+    weights = {"Other": 10, "a": 5, "b": 1, "c": 1}
+    folded, = fold_top_n(2, weights)
+    assert folded == {"Other": 12, "a": 5}
+
+
+def test_fold_top_n_merges_a_folded_real_other_category():
+    weights = {"a": 10, "b": 5, "Other": 1, "c": 2}
+    folded, = fold_top_n(2, weights)
+    assert folded == {"a": 10, "b": 5, "Other": 3}
+
+
+def test_product_performance_lists_other_once_and_last():
+    chart = chart_product_performance()
+    chart.top_n = 2
+    for product, units in [("Other", 1), ("a", 9), ("b", 7), ("c", 2)]:
+        chart.add({"product_name": product, "units_sold": units})
+    names = [entry["product_name"] for entry in chart.result()["y-axis"]]
+    assert names == ["a", "b", "Other"]
+    assert chart.result()["y-axis"][-1]["units_sold"] == 3
+
+
+def test_return_rate_of_the_tail_is_a_ratio_of_sums():
+    chart = chart_return_rate_by_product()
+    chart.top_n = 1
+    rows = [("a", 100, 10), ("b", 10, 5), ("Other", 30, 0)]
+    for product, sold, returned in rows:
+        chart.add({"product_name": product, "units_sold": sold, "returned_units": returned})
+    y_axis = chart.result()["y-axis"]
+    assert y_axis == [
+        {"product_name": "a", "return_rate": 10.0},
+        {"product_name": "Other", "return_rate": 12.5},
+    ]
+
+
+def _sample(points, capacity, start=0):
+    sample = PointSample(capacity)
+    for position, point in enumerate(points, start):
+        sample.add(point, position)
+    return sample
+
+
+def test_point_sample_is_deterministic_and_bounded():
+    points = [(i % 7, i) for i in range(5000)]
+    first = _sample(points, 100).points()
+    assert len(first) == 100
+    assert first == _sample(points, 100).points()
+    assert len(_sample(points, 100).points(limit=10)) == 10
+
+
+def test_point_sample_merge_equals_single_pass():
+    points = [(i % 13, i % 5) for i in range(6000)]
+    single = _sample(points, 200)
+    merged = _sample(points[:2500], 200).merge(_sample(points[2500:], 200, start=2500))
+    assert merged.points() == single.points()
+    assert merged.seen == single.seen == len(points)
+
+
+def test_point_sample_keeps_identical_points_in_proportion():
+    # 90% of the rows are the same point; content-keyed sampling kept them
+    # all or none, position-keyed sampling keeps about 90% of the sample
+    points = [(1, 1) if i % 10 else (i, -i) for i in range(20000)]
+    kept = _sample(points, 500).points()
+    duplicates = sum(point == (1, 1) for point in kept)
+    assert 400 < duplicates < 490
@@ -0,0 +1,43 @@
+from datetime import datetime
+
+from app.utils.data_versions import cache_validators, is_not_modified
+
+VERSIONS = {
+    "table_a": (3, datetime(2026, 1, 2, 10, 0, 0), 100),
+    "table_b": (1, datetime(2026, 1, 5, 8, 30, 0), 10),
+}
+
+
+def test_validators_depend_on_versions_and_variant():
+    validators = cache_validators(VERSIONS, "q=1")
+    assert validators == cache_validators(dict(reversed(list(VERSIONS.items()))), "q=1")
+    assert validators["ETag"] != cache_validators(VERSIONS, "q=2")["ETag"]
+    bumped = {**VERSIONS, "table_a": (4,) + VERSIONS["table_a"][1:]}
+    assert validators["ETag"] != cache_validators(bumped, "q=1")["ETag"]
+    assert validators["Last-Modified"] == "Mon, 05 Jan 2026 08:30:00 GMT"
+
+
+def test_matching_etag_is_not_modified():
+    validators = cache_validators(VERSIONS)
+    etag = validators["ETag"]
+    assert is_not_modified({"if-none-match": etag}, validators)
+    assert is_not_modified({"if-none-match": f'"other", W/{etag}'}, validators)
+    assert is_not_modified({"if-none-match": "*"}, validators)
+    assert not is_not_modified({"if-none-match": '"other"'}, validators)
+
+
+def test_if_none_match_takes_precedence_over_if_modified_since():
+    validators = cache_validators(VERSIONS)
+    headers = {"if-none-match": '"other"', "if-modified-since": "Fri, 01 Jan 2100 00:00:00 GMT"}
+    assert not is_not_modified(headers, validators)
+    headers = {"if-none-match": validators["ETag"], "if-modified-since": "Thu, 01 Jan 1970 00:00:00 GMT"}
+    assert is_not_modified(headers, validators)
+
+
+def test_if_modified_since():
+    validators = cache_validators(VERSIONS)
+    assert is_not_modified({"if-modified-since": validators["Last-Modified"]}, validators)
+    assert is_not_modified({"if-modified-since": "Tue, 06 Jan 2026 00:00:00 GMT"}, validators)
+    assert not is_not_modified({"if-modified-since": "Sun, 04 Jan 2026 00:00:00 GMT"}, validators)
+    assert not is_not_modified({"if-modified-since": "not a date"}, validators)
+    assert not is_not_modified({}, validators)
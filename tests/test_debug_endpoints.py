@@ -0,0 +1,22 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import app
+from app.config import settings
+
+DEBUG_PATHS = ["/debug/chart-profiles", "/debug/db-pool", "/debug/slow-queries", "/debug/slow-queries/abc/plan"]
+
+
+@pytest.mark.parametrize("path", DEBUG_PATHS)
+def test_debug_endpoints_are_off_by_default(path):
+    assert not settings.DEBUG_ENDPOINTS
+    with TestClient(app) as client:
+        assert client.get(path).status_code == 404
+
+
+def test_debug_endpoints_when_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "DEBUG_ENDPOINTS", True)
+    with TestClient(app) as client:
+        assert client.get("/debug/db-pool").status_code == 200
+        assert client.get("/debug/slow-queries").status_code == 200
+        assert client.get("/debug/slow-queries/unknown/plan").status_code == 404
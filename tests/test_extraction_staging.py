@@ -0,0 +1,125 @@
+import pytest
+from sqlalchemy import create_engine, select, text
+
+from app import extractdata
+from app.config import settings
+from app.database import Base
+from app.models.datapoints import ExtractedRecord
+from app.routers import upload_data
+
+LINES = 60
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'staging.db'}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "notes.csv"
+    path.write_text("region,revenue,note\n" + "".join(f"R{i},{i}.5,market note {i}\n" for i in range(LINES)))
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(settings, "EXTRACTION_CHUNK_TOKENS", 40)
+    monkeypatch.setattr(settings, "EXTRACTION_FLUSH_ROWS", 5)
+    monkeypatch.setattr(settings, "EXTRACTION_MAX_IN_FLIGHT", 2)
+    monkeypatch.setattr(settings, "EXTRACTION_CACHE_DIR", "")
+
+
+class StubModel:
+    """
+    Stands in for ChunkExtractor.extract: one record per data line, and
+    `fail` decides per chunk whether the request fails (None) or raises.
+    """
+    def __init__(self, fail=None):
+        self.fail = fail
+        self.requests = []
+
+    def install(self, monkeypatch):
+        stub = self
+
+        async def extract(extractor, text_chunk):
+            stub.requests.append(text_chunk)
+            lines = [line for line in text_chunk.splitlines() if line and not line.startswith("region,")]
+            outcome = stub.fail(lines) if stub.fail else None
+            if outcome == "raise":
+                raise RuntimeError("model went away")
+            if outcome == "fail":
+                return None
+            return [{"sales_region": line.split(",")[0], "sales_revenue": line.split(",")[1]} for line in lines]
+
+        monkeypatch.setattr(extractdata.ChunkExtractor, "extract", extract)
+        return self
+
+
+def _staged_regions(engine, job_id):
+    staged = ExtractedRecord.__table__
+    with engine.connect() as conn:
+        return [r for r, in conn.execute(select(staged.c.sales_region).where(staged.c.job_id == job_id))]
+
+
+def test_resumes_after_a_partial_flush(engine, source, monkeypatch):
+    StubModel(lambda lines: "raise" if "R40" in [line.split(",")[0] for line in lines] else None).install(monkeypatch)
+    with pytest.raises(RuntimeError):
+        extractdata.extract_file_to_staging(source, job_id="job", bind=engine)
+    checkpoint = extractdata.extraction_checkpoint("job", bind=engine)
+    assert checkpoint["status"] == "failed"
+    assert 0 < checkpoint["records"] < LINES
+    assert sorted(_staged_regions(engine, "job")) == sorted(f"R{i}" for i in range(checkpoint["records"]))
+
+    resumed = StubModel().install(monkeypatch)
+    checkpoint = extractdata.extract_file_to_staging(source, job_id="job", bind=engine)
+    assert checkpoint["status"] == "completed"
+    assert checkpoint["records"] == LINES
+    assert sorted(_staged_regions(engine, "job")) == sorted(f"R{i}" for i in range(LINES))
+    # Only the chunks after the checkpoint were sent again
+    assert all("R0," not in chunk for chunk in resumed.requests)
+
+
+def test_failed_ranges_are_retried_with_the_same_chunks(engine, source, monkeypatch):
+    failing = {"R7", "R33"}
+    first = StubModel(lambda lines: "fail" if failing & {line.split(",")[0] for line in lines} else None).install(monkeypatch)
+    checkpoint = extractdata.extract_file_to_staging(source, job_id="job", bind=engine)
+    assert checkpoint["status"] == "completed"
+    assert len(checkpoint["failed_ranges"]) == 2
+    assert not failing & set(_staged_regions(engine, "job"))
+    failed_chunks = [chunk for chunk in first.requests if any(f"{region}," in chunk for region in failing)]
+
+    retry = StubModel().install(monkeypatch)
+    checkpoint = extractdata.extract_file_to_staging(source, job_id="job", bind=engine)
+    assert retry.requests == failed_chunks
+    assert checkpoint["failed_ranges"] == []
+    assert checkpoint["records"] == LINES
+    assert sorted(_staged_regions(engine, "job")) == sorted(f"R{i}" for i in range(LINES))
+
+    # Nothing left to do
+    again = StubModel().install(monkeypatch)
+    extractdata.extract_file_to_staging(source, job_id="job", bind=engine)
+    assert again.requests == []
+
+
+def test_failed_publish_keeps_the_previous_table(engine, source, tmp_path, monkeypatch):
+    StubModel().install(monkeypatch)
+    extractdata.extract_file_to_staging(source, job_id="old", bind=engine)
+    assert upload_data.publish_extracted_records(engine, "old", "table_notes") == LINES
+
+    other = tmp_path / "other.csv"
+    other.write_text("region,revenue,note\nX1,1,a\nX2,2,b\n")
+    extractdata.extract_file_to_staging(str(other), job_id="new", bind=engine)
+
+    def broken_bump(conn, table_name, row_count=None):
+        raise RuntimeError("lost the database mid-publish")
+
+    monkeypatch.setattr(upload_data, "bump_data_version", broken_bump)
+    with pytest.raises(RuntimeError):
+        upload_data.publish_extracted_records(engine, "new", "table_notes")
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM table_notes")).scalar() == LINES
+        assert conn.execute(text("SELECT version FROM data_versions WHERE table_name = 'table_notes'")).scalar() == 1